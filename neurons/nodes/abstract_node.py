@@ -15,6 +15,20 @@ class Node(ABC):
     def get_block_by_height(self, block_height):
         ...
 
+    def start(self):
+        """Start the node's background work, if it has any."""
+
+    def stop(self):
+        ...
+
+    def get_blocks(self, start_block_height, end_block_height):
+        """
+        (block_height, block) for every height in [start_block_height, end_block_height], in order.
+        Fetches one block at a time; nodes override it to fetch ahead while the caller processes a block.
+        """
+        for block_height in range(start_block_height, end_block_height + 1):
+            yield block_height, self.get_block_by_height(block_height)
+
     @abstractmethod
     def create_funds_flow_challenge(self, start_block_height, last_block_height):
         ...
@@ -22,3 +36,25 @@ class Node(ABC):
     @abstractmethod
     def create_balance_tracking_challenge(self, block_height):
         ...
+
+
+class AsyncNode(ABC):
+    def __init__(self):
+       pass
+
+
+    @abstractmethod
+    async def get_current_block_height(self):
+        ...
+
+    @abstractmethod
+    async def get_block_by_height(self, block_height):
+        ...
+
+    @abstractmethod
+    async def create_funds_flow_challenge(self, start_block_height, last_block_height):
+        ...
+
+    @abstractmethod
+    async def create_balance_tracking_challenge(self, block_height):
+        ...
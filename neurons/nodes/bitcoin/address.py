@@ -0,0 +1,160 @@
+import hashlib
+from typing import Iterable, List, Optional
+
+from Crypto.Hash import RIPEMD160
+
+from neurons.nodes.bitcoin.cache import LRUCache
+from neurons.nodes.bitcoin.script import OP_0, OP_1, get_script_type, script_to_asm
+
+# Output address derivation from scriptPubKey bytes, matching the addresses the rest of the node works with:
+# bitcoind's ExtractDestination for the standard types (mainnet), the P2PKH address of the key for P2PK
+# and the P2SH address of the asm text for bare multisig, as parse_block_data has always derived them.
+
+BECH32_CHARSET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+BECH32_CONST = 1
+BECH32M_CONST = 0x2bc830a3
+SEGWIT_HRP = "bc"
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+BASE58_PAIR_BASE = 58 * 58
+BASE58_PAIRS = [high + low for high in BASE58_ALPHABET for low in BASE58_ALPHABET] # two base58 digits per divmod
+ADDRESS_CACHE_SIZE = 1 << 18
+
+
+def double_sha256(data: bytes) -> bytes:
+    return hashlib.sha256(hashlib.sha256(data).digest()).digest()
+
+
+def hash160(data: bytes) -> bytes:
+    return RIPEMD160.new(hashlib.sha256(data).digest()).digest()
+
+
+def _get_bech32_polymod_table():
+    generator = [0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3]
+    table = []
+    for top in range(32):
+        value = 0
+        for i in range(5):
+            if (top >> i) & 1:
+                value ^= generator[i]
+        table.append(value)
+    return table
+
+
+BECH32_POLYMOD_TABLE = _get_bech32_polymod_table()
+
+
+def bech32_polymod(values, checksum: int = 1) -> int:
+    table = BECH32_POLYMOD_TABLE
+    for value in values:
+        checksum = ((checksum & 0x1ffffff) << 5 ^ value) ^ table[checksum >> 25]
+    return checksum
+
+
+SEGWIT_HRP_POLYMOD = bech32_polymod([ord(char) >> 5 for char in SEGWIT_HRP] + [0] + [ord(char) & 31 for char in SEGWIT_HRP])
+
+
+def encode_segwit_address(version: int, program: bytes) -> str:
+    num_groups = (len(program) * 8 + 4) // 5
+    value = int.from_bytes(program, "big") << (num_groups * 5 - len(program) * 8)
+    data = [version] + [(value >> (5 * i)) & 31 for i in range(num_groups - 1, -1, -1)]
+
+    const = BECH32_CONST if version == 0 else BECH32M_CONST
+    polymod = bech32_polymod(data + [0] * 6, SEGWIT_HRP_POLYMOD) ^ const
+    data += [(polymod >> 5 * (5 - i)) & 31 for i in range(6)]
+    return SEGWIT_HRP + "1" + "".join([BECH32_CHARSET[value] for value in data])
+
+
+def encode_base58_address(version: bytes, payload_hash: bytes) -> str:
+    payload = version + payload_hash
+    payload += double_sha256(payload)[:4]
+    value = int.from_bytes(payload, "big")
+    chars = []
+    while value:
+        value, pair = divmod(value, BASE58_PAIR_BASE)
+        chars.append(BASE58_PAIRS[pair])
+    encoded = "".join(reversed(chars)).lstrip("1")
+    num_leading_zeros = len(payload) - len(payload.lstrip(b"\x00"))
+    return "1" * num_leading_zeros + encoded
+
+
+def derive_script_address(script: bytes, script_type: str) -> Optional[str]:
+    """Address of a scriptPubKey of the given type (see get_script_type), None for nulldata and nonstandard scripts."""
+    if script_type == "pubkeyhash":
+        return encode_base58_address(b"\x00", script[3:23])
+    if script_type == "scripthash":
+        return encode_base58_address(b"\x05", script[2:22])
+    if script_type.startswith("witness_v") or script_type in ("witness_unknown", "anchor"):
+        version = 0 if script[0] == OP_0 else script[0] - OP_1 + 1
+        return encode_segwit_address(version, script[2:])
+    if script_type == "pubkey":
+        return encode_base58_address(b"\x00", hash160(script[1:-1]))
+    if script_type == "multisig":
+        # the asm of a bare multisig script is exactly the text construct_redeem_script builds from it
+        return encode_base58_address(b"\x05", hash160(script_to_asm(script).encode("utf-8")))
+    return None
+
+
+def derive_address_from_asm(script_pub_key_asm: str) -> Optional[str]:
+    """Address from the asm alone, for verbose scriptPubKeys that come without hex."""
+    try:
+        if "OP_CHECKSIG" in script_pub_key_asm:
+            return encode_base58_address(b"\x00", hash160(bytes.fromhex(script_pub_key_asm.split()[0])))
+        if "OP_CHECKMULTISIG" in script_pub_key_asm:
+            parts = script_pub_key_asm.split()
+            redeem_script = f"{int(parts[0])} " + " ".join(parts[1:-2]) + f" {len(parts[1:-2])} OP_CHECKMULTISIG"
+            return encode_base58_address(b"\x05", hash160(redeem_script.encode("utf-8")))
+    except (ValueError, IndexError):
+        pass
+    return None
+
+
+class AddressDeriver:
+    """
+    Derives output addresses from raw scriptPubKey bytes for every output type: P2PK, P2PKH, P2SH, bare multisig,
+    P2WPKH, P2WSH, P2TR and other witness versions. Nulldata and nonstandard scripts yield None instead of raising.
+    Derived addresses are memoized per script in a bounded LRU, so hot scripts like reused P2PK coinbase keys are hashed once.
+    """
+    def __init__(self, cache_size: int = ADDRESS_CACHE_SIZE):
+        self.cache = LRUCache(cache_size, sizeof=lambda address: 1)
+
+    def derive(self, script: bytes, script_type: str = None) -> Optional[str]:
+        address = self.cache.get(script)
+        if address is not None:
+            return address
+        try:
+            address = derive_script_address(script, script_type or get_script_type(script))
+        except Exception:
+            return None
+        if address is not None:
+            self.cache.put(script, address)
+        return address
+
+    def derive_many(self, scripts: Iterable[bytes]) -> List[Optional[str]]:
+        """Addresses of many scripts, e.g. all outputs of a block; each distinct script is derived once."""
+        scripts = list(scripts)
+        addresses = {}
+        for script in scripts:
+            if script not in addresses:
+                addresses[script] = self.derive(script)
+        return [addresses[script] for script in scripts]
+
+    def derive_from_script_pub_key(self, script_pub_key: dict) -> Optional[str]:
+        """Address of a verbose JSON scriptPubKey: the one bitcoind reports if any, otherwise derived from its hex."""
+        address = script_pub_key.get("address")
+        if address:
+            return address
+        addresses = script_pub_key.get("addresses")
+        if addresses:
+            return addresses[0]
+        script_hex = script_pub_key.get("hex")
+        if script_hex is None:
+            return derive_address_from_asm(script_pub_key.get("asm", ""))
+        try:
+            script = bytes.fromhex(script_hex)
+        except ValueError:
+            return None
+        return self.derive(script)
+
+
+# shared by parse_block_data, the block deserializer and BitcoinNode
+address_deriver = AddressDeriver()
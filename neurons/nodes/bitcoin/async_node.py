@@ -0,0 +1,43 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from insights.protocol import Challenge
+from neurons.nodes.abstract_node import AsyncNode
+from neurons.nodes.bitcoin.node import BitcoinNode
+
+
+class AsyncBitcoinNode(AsyncNode):
+    """
+    Asyncio front of a BitcoinNode for the validator's event loop.
+    Each call runs the node's blocking method on an executor thread, so RPC still goes through the node's
+    RpcConnectionPool or MultiBackendRpcPool and its adaptive concurrency limit, and the caches and tx_out tables
+    are the node's. There is one thread per request the limit lets through at most (rpc_max_in_flight),
+    more would only wait in the limiter.
+    """
+    def __init__(self, node: BitcoinNode = None, max_workers: int = None):
+        self.node = node or BitcoinNode()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or self.node.rpc_max_in_flight, thread_name_prefix="async-node")
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def get_current_block_height(self):
+        return await self._run(self.node.get_current_block_height)
+
+    async def get_block_by_height(self, block_height):
+        return await self._run(self.node.get_block_by_height, block_height)
+
+    async def get_txn_data_by_id(self, txn_id: str):
+        return await self._run(self.node.get_txn_data_by_id, txn_id)
+
+    async def create_funds_flow_challenge(self, start_block_height, last_block_height):
+        return await self._run(self.node.create_funds_flow_challenge, start_block_height, last_block_height)
+
+    async def validate_funds_flow_challenge_response_output(self, challenge: Challenge, response_output):
+        return await self._run(self.node.validate_funds_flow_challenge_response_output, challenge, response_output)
+
+    async def create_balance_tracking_challenge(self, block_height):
+        return await self._run(self.node.create_balance_tracking_challenge, block_height)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
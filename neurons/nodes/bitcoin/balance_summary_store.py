@@ -0,0 +1,151 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+from neurons.setup_logger import setup_logger
+from neurons.setup_logger import logger_extra_data
+
+indexlogger = setup_logger("BalanceSummaryStore")
+
+
+@dataclass
+class BlockBalanceSummary:
+    block_height: int
+    block_hash: str
+    total_balance_change: int
+    changed_addresses: int
+    deltas_digest: Optional[str] # sha256 of the sorted non-zero per-address deltas, see get_deltas_digest; None when not stored
+
+
+def get_deltas_digest(addresses: List[str], deltas: np.ndarray) -> str:
+    """Order independent digest of per-address balance changes; addresses whose changes cancel out are ignored."""
+    lines = sorted(f"{address}:{delta}" for address, delta in zip(addresses, deltas.tolist()) if delta != 0)
+    return hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()
+
+
+class BalanceSummaryStore:
+    """
+    SQLite file of per-block balance change summaries, keyed by height and holding the hash of the block they were
+    computed from. Readers compare it with the hash bitcoind currently reports, so summaries of reorged blocks are recomputed.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS block_balance_summaries ("
+                "block_height INTEGER PRIMARY KEY, block_hash TEXT NOT NULL, total_balance_change INTEGER NOT NULL, "
+                "changed_addresses INTEGER NOT NULL, deltas_digest TEXT NOT NULL)"
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM block_balance_summaries").fetchone()[0]
+
+    def get(self, block_height: int) -> Optional[BlockBalanceSummary]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT block_height, block_hash, total_balance_change, changed_addresses, deltas_digest "
+                "FROM block_balance_summaries WHERE block_height = ?",
+                (block_height,),
+            ).fetchone()
+        return BlockBalanceSummary(*row) if row is not None else None
+
+    def put(self, summary: BlockBalanceSummary):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO block_balance_summaries VALUES (?, ?, ?, ?, ?)",
+                (summary.block_height, summary.block_hash, summary.total_balance_change, summary.changed_addresses, summary.deltas_digest),
+            )
+
+    def get_height_range(self):
+        """(lowest, highest) stored block height, or (None, None) when empty."""
+        with self._lock:
+            return self._conn.execute("SELECT MIN(block_height), MAX(block_height) FROM block_balance_summaries").fetchone()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class BalanceSummaryBackfill:
+    """
+    BalanceSummaryBackfill fills the node's balance summary store in the background
+    Each round it first summarizes blocks that arrived since the highest stored one,
+    then walks down towards start_block_height by up to batch_size blocks, so new blocks never wait for the backfill
+    A block that fails is retried in the next round
+    """
+    def __init__(self, node, start_block_height: int, interval=30, confirmations=6, batch_size=100):
+        self.node = node # bitcoin node owning the balance summary store
+        self.start_block_height = start_block_height # lowest block to backfill
+        self.interval = interval # seconds to wait once the store is up to date
+        self.confirmations = confirmations # blocks to stay behind the tip
+        self.batch_size = batch_size # historical blocks per round
+        lowest, highest = node.balance_summary_store.get_height_range()
+        self.last_height = highest # highest summarized block of the forward cursor
+        self.backfill_height = lowest # lowest summarized block of the backward cursor
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.update, daemon=True)
+        self.thread.start()
+
+    def summarize(self, block_height: int, block_data=None):
+        self.node.store_block_balance_summary(block_height, block_data)
+
+    def catch_up(self) -> int:
+        """Summarize new blocks and one batch of historical ones; returns the number of blocks summarized."""
+        tip_height = self.node.get_current_block_height()
+        if tip_height is None:
+            return 0
+        tip_height -= self.confirmations
+        if self.last_height is None:
+            self.last_height = tip_height - 1
+            self.backfill_height = tip_height
+
+        summarized = 0
+        # blocks are fetched ahead of the one being summarized, in the order each cursor walks
+        fetch = self.node.get_block_data_by_height
+        for block_height, block_data in self.node.get_blocks(self.last_height + 1, tip_height, fetch=fetch):
+            if self.stop_event.is_set():
+                break
+            self.summarize(block_height, block_data)
+            self.last_height = block_height
+            summarized += 1
+
+        lowest_height = max(self.start_block_height, self.backfill_height - self.batch_size)
+        for block_height, block_data in self.node.get_blocks(lowest_height, self.backfill_height - 1, fetch=fetch, reverse=True):
+            if self.stop_event.is_set():
+                break
+            self.summarize(block_height, block_data)
+            self.backfill_height = block_height
+            summarized += 1
+        return summarized
+
+    def update(self):
+        while not self.stop_event.is_set():
+            try:
+                if self.catch_up():
+                    indexlogger.info(f"Backfilled balance summaries", extra = logger_extra_data(last_height = self.last_height, backfill_height = self.backfill_height))
+                    continue
+            except Exception as e:
+                indexlogger.error(f"Failed to backfill balance summaries", extra = logger_extra_data(last_height = self.last_height, backfill_height = self.backfill_height, error = {'exception_type': e.__class__.__name__,'exception_message': str(e),'exception_args': e.args}))
+            self.stop_event.wait(self.interval)  # Wait for the specified interval
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()  # Wait for the thread to finish
+            self.thread = None
@@ -0,0 +1,225 @@
+import argparse
+import multiprocessing
+import random
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from neurons.nodes.bitcoin.node_utils import VIN, VOUT, Transaction
+
+
+def get_balance_deltas(address_ids: np.ndarray, amounts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Net amount per address id in one grouped reduction: sort by id and add up each run with np.add.reduceat."""
+    if len(address_ids) == 0:
+        return np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.int64)
+    order = np.argsort(address_ids, kind="stable")
+    sorted_address_ids = address_ids[order]
+    run_starts = np.flatnonzero(np.concatenate(([True], sorted_address_ids[1:] != sorted_address_ids[:-1])))
+    return sorted_address_ids[run_starts], np.add.reduceat(amounts[order], run_starts)
+
+
+class BalanceDeltaAccumulator:
+    """
+    Collects the addresses and signed amounts (int64) of a block's inputs (negative) and outputs (positive)
+    and computes per-address balance changes with get_balance_deltas.
+    Amounts an address both spends and receives in one transaction net out in the sum, so the result matches
+    the per-transaction netting of process_in_memory_txn_for_indexing.
+    """
+    def __init__(self):
+        self._addresses = []
+        self._amounts = array("q")
+
+    def __len__(self):
+        return len(self._amounts)
+
+    def add(self, address: str, amount: int):
+        self._addresses.append(address)
+        self._amounts.append(amount)
+
+    def extend(self, addresses: List[str], amounts: Iterable[int]):
+        self._addresses.extend(addresses)
+        self._amounts.extend(amounts)
+
+    def add_transaction(self, tx: Transaction, tx_outs):
+        """Add a transaction given the (address, amount) of its inputs by (txid, vout_id), as for process_in_memory_txn_for_indexing."""
+        for vin in tx.vins:
+            if vin.tx_id == 0:
+                continue
+            address, amount = tx_outs[(vin.tx_id, str(vin.vout_id))]
+            self._addresses.append(address)
+            self._amounts.append(-amount)
+        for vout in tx.vouts:
+            self._addresses.append(vout.address or f"unknown-{tx.tx_id}")
+            self._amounts.append(vout.value_satoshi)
+
+    def get_address_deltas(self) -> Tuple[List[str], np.ndarray]:
+        """Distinct addresses and their net changes. Addresses are interned in bulk, ids follow first appearance."""
+        addresses = list(dict.fromkeys(self._addresses))
+        address_ids = dict(zip(addresses, range(len(addresses))))
+        unique_address_ids, deltas = get_balance_deltas(
+            np.fromiter(map(address_ids.__getitem__, self._addresses), dtype=np.uint32, count=len(self._addresses)),
+            np.frombuffer(self._amounts, dtype=np.int64),
+        )
+        return [addresses[address_id] for address_id in unique_address_ids.tolist()], deltas
+
+    def get_balance_changes_by_address(self) -> Dict[str, int]:
+        addresses, deltas = self.get_address_deltas()
+        return dict(zip(addresses, deltas.tolist()))
+
+    def get_total_balance_change(self) -> int:
+        return int(np.frombuffer(self._amounts, dtype=np.int64).sum())
+
+
+def merge_balance_deltas(partial_deltas: Iterable[Tuple[List[str], np.ndarray]]) -> Dict[str, int]:
+    """Combine (addresses, deltas) results of several sub-ranges, dropping addresses whose changes cancel out."""
+    merged = BalanceDeltaAccumulator()
+    for addresses, deltas in partial_deltas:
+        merged.extend(addresses, deltas.tolist())
+    return {address: delta for address, delta in merged.get_balance_changes_by_address().items() if delta != 0}
+
+
+def split_block_range(start_block_height: int, end_block_height: int, num_parts: int) -> List[Tuple[int, int]]:
+    """[start, end] as up to num_parts contiguous inclusive sub-ranges of near equal size."""
+    num_blocks = end_block_height - start_block_height + 1
+    if num_blocks <= 0:
+        return []
+    num_parts = max(1, min(num_parts, num_blocks))
+    bounds = [start_block_height + num_blocks * i // num_parts for i in range(num_parts + 1)]
+    return [(bounds[i], bounds[i + 1] - 1) for i in range(num_parts)]
+
+
+# node of a balance worker process, built from the parent's worker config
+_worker_node = None
+
+
+def _init_balance_worker(node_class, worker_config):
+    global _worker_node
+    _worker_node = node_class.create_worker(worker_config)
+
+
+def _get_block_range_deltas(start_block_height: int, end_block_height: int, node=None) -> Tuple[List[str], np.ndarray]:
+    node = node or _worker_node
+    balance_deltas = BalanceDeltaAccumulator()
+    for block_height, block_data in node.get_blocks(start_block_height, end_block_height, fetch=node.get_block_data_by_height):
+        node.add_block_balance_deltas(block_height, balance_deltas, block_data)
+    return balance_deltas.get_address_deltas()
+
+
+def get_worker_context():
+    """Start workers from a clean single-threaded server process, or from scratch where there is none."""
+    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(start_method)
+
+
+def get_balance_changes_by_block_range_parallel(node, start_block_height: int, end_block_height: int, max_workers: int, tasks_per_worker: int = 4) -> Dict[str, int]:
+    """
+    Net balance change per address over [start_block_height, end_block_height] computed with max_workers processes.
+    Each worker fetches, parses and reduces whole sub-ranges with node.add_block_balance_deltas and only the
+    per-address sums travel back. There are tasks_per_worker sub-ranges per worker to even out blocks of different sizes.
+    Workers are not forked from the node's process: its RPC executors, updater and backfill threads may hold locks
+    a forked child would inherit locked. They build their own node from node.get_worker_config, mapping the tx_out
+    index file and sharing the node's RPC budget. Without an index, or with one worker, it runs in-process.
+    """
+    if end_block_height < start_block_height:
+        return {}
+    sub_ranges = split_block_range(start_block_height, end_block_height, max_workers * tasks_per_worker)
+    num_workers = min(max_workers, len(sub_ranges))
+    worker_config = node.get_worker_config(num_workers) if num_workers > 1 else None
+    if worker_config is None:
+        return merge_balance_deltas([_get_block_range_deltas(start_block_height, end_block_height, node)])
+
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        mp_context=get_worker_context(),
+        initializer=_init_balance_worker,
+        initargs=(type(node), worker_config),
+    ) as executor:
+        partial_deltas = executor.map(_get_block_range_deltas, *zip(*sub_ranges))
+        return merge_balance_deltas(partial_deltas)
+
+
+def get_balance_changes_by_address_loop(transactions, tx_outs) -> Dict[str, int]:
+    """The per-transaction dict loop create_balance_tracking_challenge used before, kept as the benchmark baseline."""
+    balance_changes_by_address = {}
+    changed_addresses = []
+    for tx in transactions:
+        input_amounts = {}
+        output_amounts = {}
+        for vin in tx.vins:
+            if vin.tx_id == 0:
+                continue
+            address, amount = tx_outs[(vin.tx_id, str(vin.vout_id))]
+            input_amounts[address] = input_amounts.get(address, 0) + amount
+        for vout in tx.vouts:
+            address = vout.address or f"unknown-{tx.tx_id}"
+            output_amounts[address] = output_amounts.get(address, 0) + vout.value_satoshi
+        for address in input_amounts:
+            if address in output_amounts:
+                diff = input_amounts[address] - output_amounts[address]
+                input_amounts[address] = max(diff, 0)
+                output_amounts[address] = max(-diff, 0)
+        for address in [address for address, amount in input_amounts.items() if amount != 0]:
+            if not address in balance_changes_by_address:
+                balance_changes_by_address[address] = 0
+                changed_addresses.append(address)
+            balance_changes_by_address[address] -= input_amounts[address]
+        for address in [address for address, amount in output_amounts.items() if amount != 0]:
+            if not address in balance_changes_by_address:
+                balance_changes_by_address[address] = 0
+                changed_addresses.append(address)
+            balance_changes_by_address[address] += output_amounts[address]
+    return balance_changes_by_address
+
+
+def _generate_block(num_transactions: int, num_addresses: int, seed: int = 0):
+    rng = random.Random(seed)
+    transactions = []
+    tx_outs = {}
+    for i in range(num_transactions):
+        tx = Transaction(tx_id=f"{i:064x}", block_height=0, timestamp=0, fee_satoshi=0)
+        for n in range(rng.randint(1, 3)):
+            prev_tx_id = f"{rng.getrandbits(256):064x}"
+            tx_outs[(prev_tx_id, str(n))] = (f"1Address{rng.randrange(num_addresses)}", rng.randrange(1, 10 ** 9))
+            tx.vins.append(VIN(tx_id=prev_tx_id, vin_id=0, vout_id=n, script_sig=None, sequence=0))
+        for n in range(rng.randint(1, 3)):
+            tx.vouts.append(VOUT(vout_id=n, value_satoshi=rng.randrange(1, 10 ** 9), script_pub_key=None, is_spent=False, address=f"1Address{rng.randrange(num_addresses)}"))
+        transactions.append(tx)
+    return transactions, tx_outs
+
+
+def benchmark_balance_deltas(num_transactions: int = 4000, num_addresses: int = None, repeat: int = 5):
+    """Best-of-repeat seconds of the dict loop and of the vectorized accumulator on a synthetic block."""
+    num_addresses = num_addresses or num_transactions * 2
+    transactions, tx_outs = _generate_block(num_transactions, num_addresses)
+
+    def run_vectorized():
+        accumulator = BalanceDeltaAccumulator()
+        for tx in transactions:
+            accumulator.add_transaction(tx, tx_outs)
+        return accumulator.get_balance_changes_by_address()
+
+    results = {}
+    for name, run in [("loop", lambda: get_balance_changes_by_address_loop(transactions, tx_outs)), ("vectorized", run_vectorized)]:
+        timings = []
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            balance_changes = run()
+            timings.append(time.perf_counter() - start_time)
+        results[name] = (min(timings), sum(balance_changes.values()))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the dict loop and the vectorized balance delta computation on a synthetic block")
+    parser.add_argument("--transactions", type=int, default=4000, help="Number of synthetic transactions")
+    parser.add_argument("--addresses", type=int, default=None, help="Number of distinct addresses (default: transactions * 2)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per implementation, the best is reported")
+    args = parser.parse_args()
+
+    results = benchmark_balance_deltas(args.transactions, args.addresses, args.repeat)
+    for name, (seconds, total_balance_change) in results.items():
+        print(f"{name:>10}: {seconds * 1000:8.2f} ms  total balance change {total_balance_change}")
+    print(f"   speedup: {results['loop'][0] / results['vectorized'][0]:8.2f}x")
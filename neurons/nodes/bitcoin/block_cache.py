@@ -0,0 +1,128 @@
+import os
+import pickle
+import threading
+import zlib
+from collections import OrderedDict
+
+from neurons.setup_logger import setup_logger
+from neurons.setup_logger import logger_extra_data
+
+indexlogger = setup_logger("BlockCache")
+
+# the version changes whenever cached blocks would be read differently, e.g. v2 marks amounts as Satoshis
+BLOCK_CACHE_FILE_SUFFIX = ".v2.pkl.z"
+LEGACY_BLOCK_CACHE_FILE_SUFFIX = ".pkl.z"
+
+
+class BlockCache:
+    """
+    Persistent cache of verbose blocks on local disk, keyed by height and hash.
+    Blocks are stored as zlib-compressed pickles so a hit skips both the getblock RPC and the JSON decode.
+    The total file size is capped and the least recently used blocks are evicted first. Looking a block up
+    by the hash bitcoind currently reports for its height drops entries left behind by a reorg.
+    """
+    def __init__(self, directory: str, max_bytes: int, compression_level: int = 1):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.compression_level = compression_level
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict() # (block_height, block_hash) -> file size, least recently used first
+        self._hashes_by_height = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        files = []
+        for file_name in os.listdir(directory):
+            if not file_name.endswith(BLOCK_CACHE_FILE_SUFFIX):
+                if file_name.endswith(LEGACY_BLOCK_CACHE_FILE_SUFFIX):
+                    self._remove_file(os.path.join(directory, file_name))
+                continue
+            try:
+                block_height, block_hash = file_name[:-len(BLOCK_CACHE_FILE_SUFFIX)].split("-", 1)
+                stat = os.stat(os.path.join(directory, file_name))
+            except (ValueError, OSError):
+                continue
+            files.append((stat.st_mtime, int(block_height), block_hash, stat.st_size))
+        for _, block_height, block_hash, size in sorted(files):
+            self._add_entry(block_height, block_hash, size)
+        self._evict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove_file(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _path(self, block_height: int, block_hash: str) -> str:
+        return os.path.join(self.directory, f"{block_height}-{block_hash}{BLOCK_CACHE_FILE_SUFFIX}")
+
+    def _add_entry(self, block_height: int, block_hash: str, size: int):
+        self._entries[(block_height, block_hash)] = size
+        self._hashes_by_height.setdefault(block_height, set()).add(block_hash)
+        self.bytes += size
+
+    def _remove_entry(self, block_height: int, block_hash: str):
+        size = self._entries.pop((block_height, block_hash), None)
+        if size is None:
+            return
+        self.bytes -= size
+        hashes = self._hashes_by_height.get(block_height)
+        if hashes is not None:
+            hashes.discard(block_hash)
+            if not hashes:
+                del self._hashes_by_height[block_height]
+        self._remove_file(self._path(block_height, block_hash))
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and self._entries:
+            block_height, block_hash = next(iter(self._entries))
+            self._remove_entry(block_height, block_hash)
+
+    def get(self, block_height: int, block_hash: str):
+        with self._lock:
+            for stale_hash in self._hashes_by_height.get(block_height, set()) - {block_hash}:
+                indexlogger.info(f"Dropping reorged block from block cache", extra = logger_extra_data(block_height = block_height, block_hash = stale_hash))
+                self._remove_entry(block_height, stale_hash)
+
+            if (block_height, block_hash) not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((block_height, block_hash))
+
+        path = self._path(block_height, block_hash)
+        try:
+            with open(path, 'rb') as file:
+                block = pickle.loads(zlib.decompress(file.read()))
+            os.utime(path)
+        except Exception as e:
+            indexlogger.error(f"Failed to read block from block cache", extra = logger_extra_data(block_height = block_height, error = {'exception_type': e.__class__.__name__,'exception_message': str(e),'exception_args': e.args}))
+            with self._lock:
+                self._remove_entry(block_height, block_hash)
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return block
+
+    def put(self, block_height: int, block_hash: str, block):
+        data = zlib.compress(pickle.dumps(block, protocol=pickle.HIGHEST_PROTOCOL), self.compression_level)
+        if len(data) > self.max_bytes:
+            return
+
+        path = self._path(block_height, block_hash)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if (block_height, block_hash) in self._entries:
+                self.bytes -= self._entries.pop((block_height, block_hash))
+            self._add_entry(block_height, block_hash, len(data))
+            self._evict()
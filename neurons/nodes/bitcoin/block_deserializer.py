@@ -0,0 +1,191 @@
+import struct
+from decimal import Decimal
+from typing import Iterator, List, Tuple, Union
+
+from neurons.nodes.bitcoin.address import AddressDeriver, address_deriver, double_sha256
+from neurons.nodes.bitcoin.node_utils import Block, Transaction, VIN, VOUT
+from neurons.nodes.bitcoin.script import get_script_type, script_pub_key_to_asm, script_to_asm
+
+# Deserializes blocks and transactions in bitcoind's wire format (getblock verbosity 0, getrawtransaction verbose=0)
+# into the same Block / Transaction / VIN / VOUT objects parse_block_data builds from verbose JSON.
+# Script types and asm follow bitcoind (see script.py), addresses come from the shared AddressDeriver.
+# Fees need the spent outputs and are not part of the wire format, so fee_satoshi is always 0 here.
+
+UINT32 = struct.Struct("<I")
+INT64 = struct.Struct("<q")
+HEADER = struct.Struct("<i32s32sIII")
+HEADER_SIZE = 80
+
+
+def read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    value = data[offset]
+    if value < 0xfd:
+        return value, offset + 1
+    if value == 0xfd:
+        return int.from_bytes(data[offset + 1:offset + 3], "little"), offset + 3
+    if value == 0xfe:
+        return int.from_bytes(data[offset + 1:offset + 5], "little"), offset + 5
+    return int.from_bytes(data[offset + 1:offset + 9], "little"), offset + 9
+
+
+def deserialize_transaction_at(data: bytes, offset: int, block_height: int = 0, timestamp: int = 0, include_script_sig: bool = True, include_script_pub_key: bool = True) -> Tuple[Transaction, List[bytes], int]:
+    """
+    Deserialize the transaction starting at offset. Output addresses are left for set_output_addresses,
+    so returns the transaction, the scriptPubKeys of its vouts and the offset right after it.
+    Skipped asm is left as None, which saves most of the decoding work for callers that only need amounts and addresses.
+    """
+    start = offset
+    offset += 4 # version
+    is_segwit = data[offset] == 0 and data[offset + 1] != 0
+    if is_segwit:
+        offset += 2 # marker and flag
+    stripped_parts = [data[start:start + 4]]
+    body_start = offset
+
+    vins = []
+    num_vins, offset = read_varint(data, offset)
+    for _ in range(num_vins):
+        prev_txid = data[offset:offset + 32]
+        vout_id = UINT32.unpack_from(data, offset + 32)[0]
+        script_size, offset = read_varint(data, offset + 36)
+        script_sig = data[offset:offset + script_size]
+        offset += script_size
+        sequence = UINT32.unpack_from(data, offset)[0]
+        offset += 4
+        vins.append((prev_txid, vout_id, script_sig, sequence))
+
+    vouts = []
+    num_vouts, offset = read_varint(data, offset)
+    for n in range(num_vouts):
+        value_satoshi = INT64.unpack_from(data, offset)[0]
+        script_size, offset = read_varint(data, offset + 8)
+        vouts.append((n, value_satoshi, data[offset:offset + script_size]))
+        offset += script_size
+    body_end = offset
+
+    if is_segwit:
+        for _ in range(num_vins):
+            num_items, offset = read_varint(data, offset)
+            for _ in range(num_items):
+                item_size, offset = read_varint(data, offset)
+                offset += item_size
+    stripped_parts.append(data[body_start:body_end])
+    stripped_parts.append(data[offset:offset + 4]) # lock time
+    offset += 4
+
+    tx = Transaction(
+        tx_id=double_sha256(b"".join(stripped_parts))[::-1].hex(),
+        block_height=block_height,
+        timestamp=timestamp,
+        fee_satoshi=0,
+    )
+
+    is_coinbase = num_vins == 1 and vins[0][0] == bytes(32) and vins[0][1] == 0xffffffff
+    for prev_txid, vout_id, script_sig, sequence in vins:
+        if is_coinbase:
+            vin = VIN(tx_id=0, vin_id=sequence, vout_id=0, script_sig="" if include_script_sig else None, sequence=sequence)
+        else:
+            vin = VIN(
+                tx_id=prev_txid[::-1].hex(),
+                vin_id=sequence,
+                vout_id=vout_id,
+                script_sig=script_to_asm(script_sig, attempt_sighash_decode=True) if include_script_sig else None,
+                sequence=sequence,
+            )
+        tx.vins.append(vin)
+    tx.is_coinbase = is_coinbase
+
+    output_scripts = []
+    for n, value_satoshi, script_pub_key in vouts:
+        script_type = get_script_type(script_pub_key)
+        if script_type == "nonstandard" or script_type == "nulldata":
+            continue
+        tx.vouts.append(VOUT(
+            vout_id=n,
+            value_satoshi=value_satoshi,
+            script_pub_key=script_pub_key_to_asm(script_pub_key, script_type) if include_script_pub_key else None,
+            is_spent=False,
+            address=None,
+        ))
+        output_scripts.append(script_pub_key)
+
+    return tx, output_scripts, offset
+
+
+def set_output_addresses(transactions: List[Transaction], output_scripts: List[bytes], deriver: AddressDeriver):
+    """Fill in the vout addresses of deserialized transactions with one batch derivation; unattributable vouts get an unknown-<txid> placeholder."""
+    addresses = iter(deriver.derive_many(output_scripts))
+    for tx in transactions:
+        for vout in tx.vouts:
+            vout.address = next(addresses) or f"unknown-{tx.tx_id}"
+
+
+def deserialize_transaction(raw_transaction: Union[str, bytes], deriver: AddressDeriver = address_deriver) -> Transaction:
+    """Raw transaction (hex or bytes) to the Transaction create_in_memory_txn builds from verbose JSON."""
+    if isinstance(raw_transaction, str):
+        raw_transaction = bytes.fromhex(raw_transaction)
+    tx, output_scripts, _ = deserialize_transaction_at(raw_transaction, 0)
+    set_output_addresses([tx], output_scripts, deriver)
+    return tx
+
+
+def get_difficulty(bits: int) -> Decimal:
+    """bitcoind's GetDifficulty, rounded to the 16 significant digits its JSON output carries."""
+    shift = (bits >> 24) & 0xff
+    difficulty = 0x0000ffff / (bits & 0x00ffffff)
+    while shift < 29:
+        difficulty *= 256.0
+        shift += 1
+    while shift > 29:
+        difficulty /= 256.0
+        shift -= 1
+    return Decimal("%.16g" % difficulty)
+
+
+def deserialize_block_header(raw_block: bytes, block_height: int) -> Block:
+    _, previous_block_hash, _, timestamp, bits, nonce = HEADER.unpack_from(raw_block, 0)
+    return Block(
+        block_height=block_height,
+        block_hash=double_sha256(raw_block[:HEADER_SIZE])[::-1].hex(),
+        timestamp=timestamp,
+        previous_block_hash=previous_block_hash[::-1].hex() if any(previous_block_hash) else "",
+        nonce=nonce,
+        difficulty=get_difficulty(bits),
+    )
+
+
+def get_raw_block_hash(raw_block: Union[str, bytes]) -> str:
+    """Hash of a raw block, from its header alone."""
+    header = bytes.fromhex(raw_block[:HEADER_SIZE * 2]) if isinstance(raw_block, str) else raw_block[:HEADER_SIZE]
+    return double_sha256(header)[::-1].hex()
+
+
+def iter_raw_block_transactions(raw_block: Union[str, bytes], block_height: int, deriver: AddressDeriver = address_deriver, include_script_sig: bool = True, include_script_pub_key: bool = True) -> Iterator[Transaction]:
+    """Transactions of a raw block deserialized one at a time, the streaming counterpart of deserialize_block."""
+    if isinstance(raw_block, str):
+        raw_block = bytes.fromhex(raw_block)
+    timestamp = HEADER.unpack_from(raw_block, 0)[3]
+
+    num_transactions, offset = read_varint(raw_block, HEADER_SIZE)
+    for _ in range(num_transactions):
+        tx, output_scripts, offset = deserialize_transaction_at(raw_block, offset, block_height, timestamp, include_script_sig, include_script_pub_key)
+        set_output_addresses([tx], output_scripts, deriver)
+        yield tx
+
+
+def deserialize_block(raw_block: Union[str, bytes], block_height: int, deriver: AddressDeriver = address_deriver) -> Block:
+    """Raw block (getblock verbosity 0, hex or bytes) to the Block parse_block_data builds from getblock verbosity 2."""
+    if isinstance(raw_block, str):
+        raw_block = bytes.fromhex(raw_block)
+
+    block = deserialize_block_header(raw_block, block_height)
+
+    output_scripts = []
+    num_transactions, offset = read_varint(raw_block, HEADER_SIZE)
+    for _ in range(num_transactions):
+        tx, tx_output_scripts, offset = deserialize_transaction_at(raw_block, offset, block_height, block.timestamp)
+        block.transactions.append(tx)
+        output_scripts += tx_output_scripts
+    set_output_addresses(block.transactions, output_scripts, deriver)
+
+    return block
@@ -0,0 +1,81 @@
+import sys
+import threading
+from collections import OrderedDict
+
+# A decoded verbose transaction takes roughly this many bytes of memory per byte of serialized transaction
+TXN_DATA_MEMORY_FACTOR = 8
+
+
+def estimate_txn_data_size(txn_data) -> int:
+    """Estimated memory of a decoded getrawtransaction result, derived from its serialized size."""
+    serialized_size = txn_data.get("size") or len(txn_data.get("hex", "")) // 2
+    return 512 + serialized_size * TXN_DATA_MEMORY_FACTOR
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by the total estimated size of its values rather than by entry count.
+    Keeps hit, miss and eviction counters so its effectiveness can be logged.
+    """
+    def __init__(self, max_bytes: int, sizeof=sys.getsizeof):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def discard(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
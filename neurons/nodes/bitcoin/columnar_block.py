@@ -0,0 +1,217 @@
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+from neurons.nodes.bitcoin.address import address_deriver
+from neurons.nodes.bitcoin.node_utils import VIN, VOUT, Block, Transaction, to_difficulty, to_satoshi
+from neurons.nodes.bitcoin.tx_out_table import AddressInterner
+
+
+class ColumnarBlock:
+    """
+    Struct-of-arrays form of a parsed Block with the same block fields and a `transactions` accessor.
+    Per-transaction, per-input and per-output fields are NumPy columns, addresses are interned to uint32 ids
+    and each transaction's inputs and outputs are the [offsets[i], offsets[i + 1]) slices of the input and output columns.
+    A block of thousands of transactions is a few dozen arrays instead of tens of thousands of dataclass instances,
+    and consumers like balance tracking can work on whole columns at once.
+    String columns (txids, asm) are plain lists holding the strings the decoder already created.
+    """
+    def __init__(self, block_height: int, block_hash: str, timestamp: int, previous_block_hash: str, nonce: int, difficulty, addresses: AddressInterner = None):
+        self.block_height = block_height
+        self.block_hash = block_hash
+        self.timestamp = timestamp
+        self.previous_block_hash = previous_block_hash
+        self.nonce = nonce
+        self.difficulty = difficulty
+        self.addresses = addresses if addresses is not None else AddressInterner()
+
+        # per transaction
+        self.tx_ids: List[str] = []
+        self.tx_timestamps = np.empty(0, dtype=np.int64)
+        self.fee_satoshis = np.empty(0, dtype=np.int64)
+        self.is_coinbase = np.empty(0, dtype=bool)
+        self.vin_offsets = np.zeros(1, dtype=np.int64)
+        self.vout_offsets = np.zeros(1, dtype=np.int64)
+
+        # per input
+        self.vin_tx_ids: List = [] # 0 for coinbase inputs, as in VIN
+        self.vin_vout_ids = np.empty(0, dtype=np.uint32)
+        self.vin_sequences = np.empty(0, dtype=np.uint32)
+        self.vin_script_sigs: List[str] = []
+
+        # per output
+        self.vout_ids = np.empty(0, dtype=np.uint32)
+        self.vout_values = np.empty(0, dtype=np.int64)
+        self.vout_address_ids = np.empty(0, dtype=np.uint32)
+        self.vout_script_pub_keys: List[str] = []
+
+    def __len__(self):
+        return len(self.tx_ids)
+
+    @property
+    def num_vins(self) -> int:
+        return len(self.vin_vout_ids)
+
+    @property
+    def num_vouts(self) -> int:
+        return len(self.vout_ids)
+
+    @classmethod
+    def from_block_data(cls, block_data, addresses: AddressInterner = None) -> "ColumnarBlock":
+        """Columns straight from a getblock verbosity 2 result, with the output filtering of parse_block_data."""
+        timestamp = int(block_data["time"])
+        block = cls(
+            block_height=block_data["height"],
+            block_hash=block_data["hash"],
+            timestamp=timestamp,
+            previous_block_hash=block_data.get("previousblockhash", ""),
+            nonce=block_data.get("nonce", 0),
+            difficulty=to_difficulty(block_data.get("difficulty", 0)),
+            addresses=addresses,
+        )
+        intern = block.addresses.intern
+
+        tx_timestamps, fee_satoshis, is_coinbase, vin_offsets, vout_offsets = [], [], [], [0], [0]
+        vin_vout_ids, vin_sequences, vout_ids, vout_values, vout_address_ids = [], [], [], [], []
+        for tx_data in block_data["tx"]:
+            block.tx_ids.append(tx_data["txid"])
+            tx_timestamps.append(int(tx_data.get("time", timestamp)))
+            fee_satoshis.append(to_satoshi(tx_data.get("fee", 0)))
+
+            coinbase = False
+            for vin_data in tx_data["vin"]:
+                block.vin_tx_ids.append(vin_data.get("txid", 0))
+                vin_vout_ids.append(vin_data.get("vout", 0))
+                vin_sequences.append(vin_data.get("sequence", 0))
+                block.vin_script_sigs.append(vin_data.get("scriptSig", {}).get("asm", ""))
+                coinbase = "coinbase" in vin_data
+            is_coinbase.append(coinbase)
+            vin_offsets.append(len(vin_vout_ids))
+
+            for vout_data in tx_data["vout"]:
+                script_pub_key = vout_data["scriptPubKey"]
+                script_type = script_pub_key.get("type", "")
+                if "nonstandard" in script_type or script_type == "nulldata":
+                    continue
+                address = address_deriver.derive_from_script_pub_key(script_pub_key) or f"unknown-{tx_data['txid']}"
+                vout_ids.append(vout_data["n"])
+                vout_values.append(to_satoshi(vout_data["value"]))
+                vout_address_ids.append(intern(address))
+                block.vout_script_pub_keys.append(script_pub_key.get("asm", ""))
+            vout_offsets.append(len(vout_ids))
+
+        block._set_columns(tx_timestamps, fee_satoshis, is_coinbase, vin_offsets, vout_offsets, vin_vout_ids, vin_sequences, vout_ids, vout_values, vout_address_ids)
+        return block
+
+    @classmethod
+    def from_block(cls, block: Block, addresses: AddressInterner = None) -> "ColumnarBlock":
+        """Columns of an already parsed Block, e.g. one from the raw block deserializer."""
+        columnar_block = cls(block.block_height, block.block_hash, block.timestamp, block.previous_block_hash, block.nonce, block.difficulty, addresses)
+        intern = columnar_block.addresses.intern
+
+        tx_timestamps, fee_satoshis, is_coinbase, vin_offsets, vout_offsets = [], [], [], [0], [0]
+        vin_vout_ids, vin_sequences, vout_ids, vout_values, vout_address_ids = [], [], [], [], []
+        for tx in block.transactions:
+            columnar_block.tx_ids.append(tx.tx_id)
+            tx_timestamps.append(tx.timestamp)
+            fee_satoshis.append(tx.fee_satoshi)
+            is_coinbase.append(tx.is_coinbase)
+            for vin in tx.vins:
+                columnar_block.vin_tx_ids.append(vin.tx_id)
+                vin_vout_ids.append(vin.vout_id)
+                vin_sequences.append(vin.sequence)
+                columnar_block.vin_script_sigs.append(vin.script_sig)
+            vin_offsets.append(len(vin_vout_ids))
+            for vout in tx.vouts:
+                vout_ids.append(vout.vout_id)
+                vout_values.append(vout.value_satoshi)
+                vout_address_ids.append(intern(vout.address))
+                columnar_block.vout_script_pub_keys.append(vout.script_pub_key)
+            vout_offsets.append(len(vout_ids))
+
+        columnar_block._set_columns(tx_timestamps, fee_satoshis, is_coinbase, vin_offsets, vout_offsets, vin_vout_ids, vin_sequences, vout_ids, vout_values, vout_address_ids)
+        return columnar_block
+
+    def _set_columns(self, tx_timestamps, fee_satoshis, is_coinbase, vin_offsets, vout_offsets, vin_vout_ids, vin_sequences, vout_ids, vout_values, vout_address_ids):
+        self.tx_timestamps = np.array(tx_timestamps, dtype=np.int64)
+        self.fee_satoshis = np.array(fee_satoshis, dtype=np.int64)
+        self.is_coinbase = np.array(is_coinbase, dtype=bool)
+        self.vin_offsets = np.array(vin_offsets, dtype=np.int64)
+        self.vout_offsets = np.array(vout_offsets, dtype=np.int64)
+        self.vin_vout_ids = np.array(vin_vout_ids, dtype=np.uint32)
+        self.vin_sequences = np.array(vin_sequences, dtype=np.uint32)
+        self.vout_ids = np.array(vout_ids, dtype=np.uint32)
+        self.vout_values = np.array(vout_values, dtype=np.int64)
+        self.vout_address_ids = np.array(vout_address_ids, dtype=np.uint32)
+
+    @property
+    def vout_tx_indexes(self) -> np.ndarray:
+        """Index of the owning transaction for every output."""
+        return np.repeat(np.arange(len(self.tx_ids)), np.diff(self.vout_offsets))
+
+    @property
+    def vin_tx_indexes(self) -> np.ndarray:
+        """Index of the owning transaction for every input."""
+        return np.repeat(np.arange(len(self.tx_ids)), np.diff(self.vin_offsets))
+
+    def get_address(self, address_id: int) -> str:
+        return self.addresses.get(int(address_id))
+
+    def get_input_outpoints(self) -> List[Tuple[str, str]]:
+        """(txid, vout_id) of every non-coinbase input, in the key format of the tx_out tables."""
+        return [
+            (tx_id, str(vout_id))
+            for tx_id, vout_id in zip(self.vin_tx_ids, self.vin_vout_ids.tolist())
+            if tx_id != 0
+        ]
+
+    def iter_tx_outs(self) -> Iterator[Tuple[str, str, str, int]]:
+        """(txid, vout_id, address, amount) of every output, as inserted into the tx_out tables."""
+        tx_ids = self.tx_ids
+        get_address = self.addresses.get
+        for tx_index, vout_id, address_id, amount in zip(self.vout_tx_indexes.tolist(), self.vout_ids.tolist(), self.vout_address_ids.tolist(), self.vout_values.tolist()):
+            yield tx_ids[tx_index], str(vout_id), get_address(address_id), amount
+
+    def get_transaction(self, tx_index: int) -> Transaction:
+        """Materialize one transaction as the Transaction parse_block_data would build."""
+        tx = Transaction(
+            tx_id=self.tx_ids[tx_index],
+            block_height=self.block_height,
+            timestamp=int(self.tx_timestamps[tx_index]),
+            fee_satoshi=int(self.fee_satoshis[tx_index]),
+            is_coinbase=bool(self.is_coinbase[tx_index]),
+        )
+        for i in range(self.vin_offsets[tx_index], self.vin_offsets[tx_index + 1]):
+            sequence = int(self.vin_sequences[i])
+            tx.vins.append(VIN(
+                tx_id=self.vin_tx_ids[i],
+                vin_id=sequence,
+                vout_id=int(self.vin_vout_ids[i]),
+                script_sig=self.vin_script_sigs[i],
+                sequence=sequence,
+            ))
+        for i in range(self.vout_offsets[tx_index], self.vout_offsets[tx_index + 1]):
+            tx.vouts.append(VOUT(
+                vout_id=int(self.vout_ids[i]),
+                value_satoshi=int(self.vout_values[i]),
+                script_pub_key=self.vout_script_pub_keys[i],
+                is_spent=False,
+                address=self.get_address(self.vout_address_ids[i]),
+            ))
+        return tx
+
+    @property
+    def transactions(self) -> List[Transaction]:
+        """All transactions as dataclasses; prefer the columns in hot paths, this allocates the object graph."""
+        return [self.get_transaction(tx_index) for tx_index in range(len(self.tx_ids))]
+
+    def to_block(self) -> Block:
+        return Block(
+            block_height=self.block_height,
+            block_hash=self.block_hash,
+            timestamp=self.timestamp,
+            previous_block_hash=self.previous_block_hash,
+            nonce=self.nonce,
+            difficulty=self.difficulty,
+            transactions=self.transactions,
+        )
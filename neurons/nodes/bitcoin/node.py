@@ -1,26 +1,37 @@
-from decimal import Decimal
 import bittensor as bt
-from bitcoinrpc.authproxy import AuthServiceProxy
+from bitcoinrpc.authproxy import JSONRPCException
 from protocols.llm_engine import MODEL_TYPE_FUNDS_FLOW, MODEL_TYPE_BALANCE_TRACKING
 
 from insights.protocol import Challenge
-from neurons.nodes.bitcoin.node_utils import SATOSHI, VIN, VOUT, Transaction, parse_block_data
+from neurons.nodes.bitcoin.node_utils import VIN, VOUT, Transaction, iter_block_transactions, parse_block_data, to_satoshi
 
 
 from neurons.nodes.abstract_node import Node
-from neurons.nodes.bitcoin.node_utils import (
-    pubkey_to_address,
-    construct_redeem_script,
-    hash_redeem_script,
-    create_p2sh_address,
-    check_if_block_is_valid_for_challenge
-)
+from neurons.nodes.bitcoin.node_utils import check_if_block_is_valid_for_challenge
 from neurons.setup_logger import setup_logger
 from neurons.setup_logger import logger_extra_data
 
-from .node_utils import initialize_tx_out_hash_table, get_tx_out_hash_table_sub_keys
+from .address import address_deriver
+from .balance_summary_store import BalanceSummaryBackfill, BalanceSummaryStore, BlockBalanceSummary, get_deltas_digest
+from .balance_tracking import BalanceDeltaAccumulator, get_balance_changes_by_block_range_parallel
+from .block_cache import BlockCache
+from .columnar_block import ColumnarBlock
+from .block_deserializer import deserialize_block, get_raw_block_hash, iter_raw_block_transactions
+from .cache import LRUCache, estimate_txn_data_size
+from .rpc import create_rpc_pool, get_rpc_service_urls, is_missing_txn_error
+from .rpc_limiter import AdaptiveConcurrencyLimiter, ConcurrencyLimitedRpcPool
+from .tx_out_filter import TxOutFilter, tx_out_filter_path
+from .tx_out_index import TxOutIndex
+from .tx_out_loader import load_tx_out_shards
+from .tx_out_shared import shared_tx_out_index
+from .tx_out_updater import TxOutUpdater
+from .tx_out_table import create_tx_out_table, TX_OUT_TABLE_ENGINE_COMPACT, TX_OUT_TABLE_ENGINE_HASH
 
 import argparse
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pickle
 import time
 import os
@@ -31,18 +42,65 @@ bt.logging.add_args(parser)
 indexlogger = setup_logger("BitcoinNode")
 from neurons import logger
 
+# transactions resolved together while streaming a block for balance tracking
+BALANCE_TRACKING_CHUNK_SIZE = 500
+
+# settings a balance worker copies from the node that starts it, see BitcoinNode.get_worker_config
+WORKER_SETTINGS = (
+    "rpc_pool_size", "rpc_hedge_percentile", "rpc_eject_after_failures", "rpc_eject_seconds", "rpc_adaptive_concurrency",
+    "rpc_max_in_flight", "rpc_batch_size", "raw_blocks", "block_read_ahead", "missing_txn_cache_ttl",
+)
+# what a balance worker must not load or start again
+WORKER_DISABLED_ENVIRON = (
+    "BITCOIN_V2_TX_OUT_HASHMAP_PICKLES", "BITCOIN_V2_TX_OUT_SHARED_INDEX", "BITCOIN_V2_TX_OUT_UPDATER_START_HEIGHT",
+    "BITCOIN_NODE_BLOCK_CACHE_DIR", "BITCOIN_NODE_BALANCE_SUMMARY_DB",
+)
+
 class BitcoinNode(Node):
     def __init__(self, node_rpc_url: str = None):
-        self.tx_out_hash_table = initialize_tx_out_hash_table()
+        self.tx_out_table_engine = os.environ.get("BITCOIN_V2_TX_OUT_TABLE_ENGINE", TX_OUT_TABLE_ENGINE_HASH)
+        self.tx_out_table = create_tx_out_table(self.tx_out_table_engine)
         pickle_files_env = os.environ.get("BITCOIN_V2_TX_OUT_HASHMAP_PICKLES")
         pickle_files = []
         if pickle_files_env:
             pickle_files = pickle_files_env.split(',')
 
-        for pickle_file in pickle_files:
-            if pickle_file:
+        pickle_files = [pickle_file for pickle_file in pickle_files if pickle_file]
+
+        self.tx_out_index = None
+        self.tx_out_filter = None
+        # one read-only copy of the pickled tables per host, mapped by every process instead of loaded by each
+        shared_tx_out_index_path = os.environ.get("BITCOIN_V2_TX_OUT_SHARED_INDEX")
+        if shared_tx_out_index_path:
+            with shared_tx_out_index(pickle_files, shared_tx_out_index_path) as published:
+                if published:
+                    self.load_tx_out_index(shared_tx_out_index_path)
+                else:
+                    indexlogger.warning(f"No shared tx_out index published", extra = logger_extra_data(index_path = shared_tx_out_index_path))
+            pickle_files = []
+
+        loader_workers = int(os.environ.get("BITCOIN_V2_TX_OUT_LOADER_WORKERS", 1))
+        loader_memory_limit_mb = os.environ.get("BITCOIN_V2_TX_OUT_LOADER_MEMORY_LIMIT_MB")
+        parallel_load = loader_workers > 1 and len(pickle_files) > 1
+        if parallel_load and self.tx_out_table_engine != TX_OUT_TABLE_ENGINE_COMPACT:
+            # the hash engine's entries are Python objects the parent has to build itself, so workers would not help
+            indexlogger.warning(f"Parallel tx_out loading needs the compact tx_out table engine, loading serially", extra = logger_extra_data(engine = self.tx_out_table_engine))
+            parallel_load = False
+        if parallel_load:
+            load_tx_out_shards(
+                self.tx_out_table,
+                pickle_files,
+                max_workers=loader_workers,
+                memory_limit=int(loader_memory_limit_mb) * 1024 * 1024 if loader_memory_limit_mb else None,
+            )
+        else:
+            for pickle_file in pickle_files:
                 self.load_tx_out_hash_table(pickle_file)
-                
+
+        tx_out_index_path = os.environ.get("BITCOIN_V2_TX_OUT_INDEX")
+        if tx_out_index_path and not shared_tx_out_index_path:
+            self.load_tx_out_index(tx_out_index_path)
+
         if node_rpc_url is None:
             self.node_rpc_url = (
                 os.environ.get("BITCOIN_NODE_RPC_URL")
@@ -50,6 +108,60 @@ class BitcoinNode(Node):
             )
         else:
             self.node_rpc_url = node_rpc_url
+        self.rpc_pool_size = int(os.environ.get("BITCOIN_NODE_RPC_POOL_SIZE", 8))
+        # only used when BITCOIN_NODE_RPC_URL lists several comma separated endpoints, see MultiBackendRpcPool
+        self.rpc_hedge_percentile = float(os.environ.get("BITCOIN_NODE_RPC_HEDGE_PERCENTILE", 95))
+        self.rpc_eject_after_failures = int(os.environ.get("BITCOIN_NODE_RPC_EJECT_AFTER_FAILURES", 5))
+        self.rpc_eject_seconds = float(os.environ.get("BITCOIN_NODE_RPC_EJECT_SECONDS", 30))
+        # AIMD limit on requests in flight across all backends, backing off when bitcoind's rpcworkqueue fills up
+        self.rpc_adaptive_concurrency = os.environ.get("BITCOIN_NODE_RPC_ADAPTIVE_CONCURRENCY", 'True') == 'True'
+        self.rpc_max_in_flight = int(os.environ.get("BITCOIN_NODE_RPC_MAX_IN_FLIGHT", self.rpc_pool_size * len(get_rpc_service_urls(self.node_rpc_url))))
+        self.rpc_pool = self.create_rpc_pool()
+        self.rpc_batch_size = int(os.environ.get("BITCOIN_NODE_RPC_BATCH_SIZE", 100))
+        self.raw_blocks = os.environ.get("BITCOIN_NODE_RAW_BLOCKS", 'False') == 'True'
+        self.balance_workers = int(os.environ.get("BITCOIN_NODE_BALANCE_WORKERS", os.cpu_count() or 1))
+        self.balance_workers_fallback_logged = False # the in-process fallback is logged once, not per challenge
+        # blocks get_blocks fetches ahead of the one being processed
+        self.block_read_ahead = int(os.environ.get("BITCOIN_NODE_BLOCK_READ_AHEAD", 4))
+        self.txn_cache = LRUCache(int(os.environ.get("BITCOIN_NODE_TXN_CACHE_MAX_MB", 256)) * 1024 * 1024, sizeof=estimate_txn_data_size)
+        # transactions bitcoind reported as missing, bounded by entry count and kept for a limited time
+        self.missing_txn_cache = LRUCache(int(os.environ.get("BITCOIN_NODE_MISSING_TXN_CACHE_SIZE", 100000)), sizeof=lambda entry: 1)
+        self.missing_txn_cache_ttl = int(os.environ.get("BITCOIN_NODE_MISSING_TXN_CACHE_TTL", 3600))
+
+        self.block_cache = None
+        block_cache_dir = os.environ.get("BITCOIN_NODE_BLOCK_CACHE_DIR")
+        if block_cache_dir:
+            self.block_cache = BlockCache(block_cache_dir, int(os.environ.get("BITCOIN_NODE_BLOCK_CACHE_MAX_MB", 4096)) * 1024 * 1024)
+
+        self.tx_out_hits = 0
+        self.tx_out_misses = 0
+        self.tx_out_filter_skips = 0
+        self.tx_out_updater = None
+        updater_start_height = os.environ.get("BITCOIN_V2_TX_OUT_UPDATER_START_HEIGHT")
+        if updater_start_height:
+            self.tx_out_updater = TxOutUpdater(self, int(updater_start_height))
+
+        self.balance_summary_store = None
+        self.balance_summary_backfill = None
+        balance_summary_db = os.environ.get("BITCOIN_NODE_BALANCE_SUMMARY_DB")
+        if balance_summary_db:
+            self.balance_summary_store = BalanceSummaryStore(balance_summary_db)
+            backfill_start_height = os.environ.get("BITCOIN_NODE_BALANCE_SUMMARY_BACKFILL_START_HEIGHT")
+            if backfill_start_height:
+                self.balance_summary_backfill = BalanceSummaryBackfill(self, int(backfill_start_height))
+
+    def start(self):
+        """Start the configured background threads; building a node only prepares them."""
+        if self.tx_out_updater is not None:
+            self.tx_out_updater.start()
+        if self.balance_summary_backfill is not None:
+            self.balance_summary_backfill.start()
+
+    def stop(self):
+        if self.tx_out_updater is not None:
+            self.tx_out_updater.stop()
+        if self.balance_summary_backfill is not None:
+            self.balance_summary_backfill.stop()
 
     def load_tx_out_hash_table(self, pickle_path: str, reset: bool = False):
         indexlogger.info(f"Loading tx_out hash table", extra = logger_extra_data(pickle_path = pickle_path))
@@ -57,74 +169,275 @@ class BitcoinNode(Node):
             start_time = time.time()
             hash_table = pickle.load(file)
             if reset:
-                self.tx_out_hash_table = hash_table
-            else:
-                sub_keys = get_tx_out_hash_table_sub_keys()
-                for sub_key in sub_keys:
-                    self.tx_out_hash_table[sub_key].update(hash_table[sub_key])
+                self.tx_out_table = create_tx_out_table(self.tx_out_table_engine)
+            self.tx_out_table.update(hash_table)
             end_time = time.time()
             indexlogger.info(f"Successfully loaded tx_out hash table", extra = logger_extra_data(pickle_path = pickle_path, time_taken = end_time - start_time))
 
+    def load_tx_out_index(self, index_path: str):
+        start_time = time.time()
+        if self.tx_out_index is not None:
+            self.tx_out_index.close()
+        self.tx_out_index = TxOutIndex.open(index_path)
+        indexlogger.info(f"Successfully opened tx_out index", extra = logger_extra_data(index_path = index_path, record_count = len(self.tx_out_index), time_taken = time.time() - start_time))
+
+        if self.tx_out_filter is not None:
+            self.tx_out_filter.close()
+            self.tx_out_filter = None
+        filter_path = tx_out_filter_path(index_path)
+        if os.path.exists(filter_path):
+            self.tx_out_filter = TxOutFilter.open(filter_path)
+            indexlogger.info(f"Successfully opened tx_out filter", extra = logger_extra_data(filter_path = filter_path, num_bits = self.tx_out_filter.num_bits, num_hashes = self.tx_out_filter.num_hashes))
+
+    def get_tx_out_from_tables(self, txn_id: str, vout_id: str):
+        tx_out = self.tx_out_table.get(txn_id, vout_id)
+        if tx_out is None and self.tx_out_index is not None:
+            # the filter only answers for the snapshot, outputs added since live in tx_out_table
+            if self.tx_out_filter is None or (txn_id, vout_id) in self.tx_out_filter:
+                tx_out = self.tx_out_index.get(txn_id, vout_id)
+            else:
+                self.tx_out_filter_skips += 1
+        if tx_out is None:
+            self.tx_out_misses += 1
+        else:
+            self.tx_out_hits += 1
+        return tx_out
+
+    def get_tx_out_hit_ratio(self):
+        lookups = self.tx_out_hits + self.tx_out_misses
+        return self.tx_out_hits / lookups if lookups else 1.0
+
     def get_current_block_height(self):
-        rpc_connection = AuthServiceProxy(self.node_rpc_url)
         try:
-            return rpc_connection.getblockcount()
+            return self.rpc_pool.call("getblockcount")
+        except Exception as e:
+            indexlogger.error(f"RPC Provider with Error", extra = logger_extra_data(error = {'exception_type': e.__class__.__name__,'exception_message': str(e),'exception_args': e.args}))
+
+    def get_block_hash(self, block_height):
+        try:
+            return self.rpc_pool.call("getblockhash", block_height)
         except Exception as e:
             indexlogger.error(f"RPC Provider with Error", extra = logger_extra_data(error = {'exception_type': e.__class__.__name__,'exception_message': str(e),'exception_args': e.args}))
-        finally:
-            rpc_connection._AuthServiceProxy__conn.close()  # Close the connection
 
     def get_block_by_height(self, block_height):
-        rpc_connection = AuthServiceProxy(self.node_rpc_url)
         try:
-            block_hash = rpc_connection.getblockhash(block_height)
-            return rpc_connection.getblock(block_hash, 2)
+            block_hash = self.rpc_pool.call("getblockhash", block_height)
+            if self.block_cache is not None:
+                block = self.block_cache.get(block_height, block_hash)
+                if block is not None:
+                    return block
+
+            block = self.rpc_pool.call("getblock", block_hash, 2)
+            if self.block_cache is not None:
+                self.block_cache.put(block_height, block_hash, block)
+            return block
+        except Exception as e:
+            indexlogger.error(f"RPC Provider with Error", extra = logger_extra_data(error = {'exception_type': e.__class__.__name__,'exception_message': str(e),'exception_args': e.args}))
+
+    def get_parsed_block_by_height(self, block_height):
+        """
+        Parsed Block for a height. With BITCOIN_NODE_RAW_BLOCKS the block is fetched with getblock verbosity 0
+        and deserialized from bytes, which leaves fee_satoshi at 0; otherwise it is parse_block_data of the verbose block.
+        """
+        if not self.raw_blocks:
+            block = self.get_block_by_height(block_height)
+            return parse_block_data(block) if block is not None else None
+        try:
+            block_hash = self.rpc_pool.call("getblockhash", block_height)
+            return deserialize_block(self.rpc_pool.call("getblock", block_hash, 0), block_height)
         except Exception as e:
             indexlogger.error(f"RPC Provider with Error", extra = logger_extra_data(error = {'exception_type': e.__class__.__name__,'exception_message': str(e),'exception_args': e.args}))
+
+    def get_block_data_by_height(self, block_height):
+        """
+        The block iter_block_transactions_by_height streams from: the raw block hex with BITCOIN_NODE_RAW_BLOCKS,
+        otherwise the verbose block. None if it could not be fetched.
+        """
+        if not self.raw_blocks:
+            return self.get_block_by_height(block_height)
+        try:
+            block_hash = self.rpc_pool.call("getblockhash", block_height)
+            return self.rpc_pool.call("getblock", block_hash, 0)
+        except Exception as e:
+            indexlogger.error(f"RPC Provider with Error", extra = logger_extra_data(error = {'exception_type': e.__class__.__name__,'exception_message': str(e),'exception_args': e.args}))
+
+    def get_block_data_hash(self, block_data):
+        """Hash of a get_block_data_by_height result, taken from the block itself."""
+        if not self.raw_blocks:
+            return block_data["hash"]
+        return get_raw_block_hash(block_data)
+
+    def iter_block_data_transactions(self, block_data, block_height, include_script_sig=True, include_script_pub_key=True):
+        """Transactions of a get_block_data_by_height result built lazily one at a time, see iter_block_transactions for the include flags."""
+        if not self.raw_blocks:
+            return iter_block_transactions(block_data, include_script_sig, include_script_pub_key)
+        return iter_raw_block_transactions(block_data, block_height, include_script_sig=include_script_sig, include_script_pub_key=include_script_pub_key)
+
+    def iter_block_transactions_by_height(self, block_height, include_script_sig=True, include_script_pub_key=True):
+        """
+        Transactions of a block built lazily one at a time, from the same source get_parsed_block_by_height uses,
+        or None if the block could not be fetched. See iter_block_transactions for the include flags.
+        """
+        block_data = self.get_block_data_by_height(block_height)
+        if block_data is None:
+            return None
+        return self.iter_block_data_transactions(block_data, block_height, include_script_sig, include_script_pub_key)
+
+    def get_blocks(self, start_block_height, end_block_height, fetch=None, read_ahead=None, reverse=False):
+        """
+        (block_height, block) for every height in [start_block_height, end_block_height], in order (descending with
+        reverse). Blocks are fetched with fetch (get_block_by_height by default, or e.g. get_columnar_block_by_height)
+        on up to read_ahead threads, so RPC waits overlap with the caller's processing while at most read_ahead blocks
+        are held ahead of it. A None block means the fetch failed. Fetches still running when the caller stops iterating
+        are waited for, queued ones are cancelled.
+        """
+        fetch = fetch or self.get_block_by_height
+        read_ahead = read_ahead or self.block_read_ahead
+        block_heights = range(start_block_height, end_block_height + 1)
+        block_heights = iter(reversed(block_heights) if reverse else block_heights)
+        if read_ahead <= 1:
+            for block_height in block_heights:
+                yield block_height, fetch(block_height)
+            return
+
+        executor = ThreadPoolExecutor(max_workers=read_ahead, thread_name_prefix="block-read-ahead")
+        pending = deque((block_height, executor.submit(fetch, block_height)) for block_height in itertools.islice(block_heights, read_ahead))
+        try:
+            while pending:
+                block_height, future = pending.popleft()
+                next_block_height = next(block_heights, None)
+                if next_block_height is not None:
+                    pending.append((next_block_height, executor.submit(fetch, next_block_height)))
+                yield block_height, future.result()
         finally:
-            rpc_connection._AuthServiceProxy__conn.close()  # Close the connection
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def get_columnar_block_by_height(self, block_height):
+        """ColumnarBlock for a height, from the same source get_parsed_block_by_height uses."""
+        if not self.raw_blocks:
+            block = self.get_block_by_height(block_height)
+            return ColumnarBlock.from_block_data(block) if block is not None else None
+        block = self.get_parsed_block_by_height(block_height)
+        return ColumnarBlock.from_block(block) if block is not None else None
 
     def get_transaction_by_hash(self, tx_hash):
         indexlogger.error(f"get_transaction_by_hash not implemented for BitcoinNode")
         raise NotImplementedError()
     
+    def get_tx_out_from_txn_data(self, txn_id: str, vout_id: str, txn_data):
+        try:
+            if isinstance(txn_data, Exception):
+                raise txn_data
+            vout = next((x for x in txn_data['vout'] if str(x['n']) == vout_id), None)
+            amount = to_satoshi(vout['value'])
+            address = address_deriver.derive_from_script_pub_key(vout["scriptPubKey"]) or f"unknown-{txn_id}"
+            return address, amount
+        except Exception as e:
+            address = f"unknown-{txn_id}"
+            return address, 0
+
     def get_address_and_amount_by_txn_id_and_vout_id(self, txn_id: str, vout_id: str):
-        # call rpc if not in hash table
-        if (txn_id, vout_id) not in self.tx_out_hash_table[txn_id[:3]]:
+        # call rpc if not in hash table or tx_out index
+        tx_out = self.get_tx_out_from_tables(txn_id, vout_id)
+        if tx_out is None:
             # indexlogger.info(f"No entry is found in tx_out hash table: (tx_id, vout_id): ({txn_id}, {vout_id})")
-            rpc_connection = AuthServiceProxy(self.node_rpc_url)
             try:
-                txn_data = rpc_connection.getrawtransaction(str(txn_id), 1)
-                vout = next((x for x in txn_data['vout'] if str(x['n']) == vout_id), None)
-                amount = int(vout['value'] * 100000000)
-                address = vout["scriptPubKey"].get("address", "")
-                script_pub_key_asm = vout["scriptPubKey"].get("asm", "")
-                if not address:
-                    addresses = vout["scriptPubKey"].get("addresses", [])
-                    if addresses:
-                        address = addresses[0]
-                    elif "OP_CHECKSIG" in script_pub_key_asm:
-                        pubkey = script_pub_key_asm.split()[0]
-                        address = pubkey_to_address(pubkey)
-                    elif "OP_CHECKMULTISIG" in script_pub_key_asm:
-                        pubkeys = script_pub_key_asm.split()[1:-2]
-                        m = int(script_pub_key_asm.split()[0])
-                        redeem_script = construct_redeem_script(pubkeys, m)
-                        hashed_script = hash_redeem_script(redeem_script)
-                        address = create_p2sh_address(hashed_script)
-                    else:
-                        address = f"unknown-{txn_id}"
-                return address, amount
+                txn_data = self.fetch_txn_data(str(txn_id))
             except Exception as e:
-                address = f"unknown-{txn_id}"
-                return address, 0
-            finally:
-                rpc_connection._AuthServiceProxy__conn.close()  # Close the connection
-        else: # get from hash table if exists
-            address, amount = self.tx_out_hash_table[txn_id[:3]][(txn_id, vout_id)]
+                txn_data = e
+            return self.get_tx_out_from_txn_data(txn_id, vout_id, txn_data)
+        else: # get from hash table or tx_out index if exists
+            address, amount = tx_out
             return address, int(amount)
 
+    def get_addresses_and_amounts_by_outpoints(self, outpoints, tx_outs=None):
+        """
+        Resolve (txn_id, vout_id) pairs to (address, amount) like get_address_and_amount_by_txn_id_and_vout_id.
+        Table misses are deduplicated by txid and fetched with batched getrawtransaction calls.
+        Entries already present in tx_outs (e.g. outputs of the same block) are reused and no lookup is made for them.
+        """
+        tx_outs = dict(tx_outs) if tx_outs else {}
+        vout_ids_by_missing_txn_id = {}
+        for outpoint in outpoints:
+            if outpoint in tx_outs:
+                continue
+            txn_id, vout_id = outpoint
+            tx_out = self.get_tx_out_from_tables(txn_id, vout_id)
+            if tx_out is None:
+                vout_ids_by_missing_txn_id.setdefault(txn_id, set()).add(vout_id)
+            else:
+                address, amount = tx_out
+                tx_outs[outpoint] = (address, int(amount))
+
+        txns_data = self.fetch_txns_data(list(vout_ids_by_missing_txn_id))
+        for txn_id, txn_data in txns_data.items():
+            for vout_id in vout_ids_by_missing_txn_id[txn_id]:
+                tx_outs[(txn_id, vout_id)] = self.get_tx_out_from_txn_data(txn_id, vout_id, txn_data)
+
+        return tx_outs
+
+    def get_cached_txn_data(self, txn_id: str):
+        """Cached decoded transaction, a JSONRPCException if bitcoind recently reported it as missing, or None."""
+        txn_data = self.txn_cache.get(txn_id)
+        if txn_data is not None:
+            return txn_data
+        missing_txn = self.missing_txn_cache.get(txn_id)
+        if missing_txn is not None:
+            rpc_error, cached_at = missing_txn
+            if time.monotonic() - cached_at < self.missing_txn_cache_ttl:
+                return JSONRPCException(rpc_error)
+            self.missing_txn_cache.discard(txn_id)
+        return None
+
+    def cache_txn_data(self, txn_id: str, txn_data):
+        """Cache a getrawtransaction result; errors are only cached when bitcoind answered that the transaction is missing."""
+        if is_missing_txn_error(txn_data):
+            self.missing_txn_cache.put(txn_id, (txn_data.error, time.monotonic()))
+        elif not isinstance(txn_data, Exception):
+            self.txn_cache.put(txn_id, txn_data)
+
+    def fetch_txn_data(self, txn_id: str):
+        txn_data = self.get_cached_txn_data(txn_id)
+        if txn_data is None:
+            try:
+                txn_data = self.rpc_pool.call("getrawtransaction", txn_id, 1)
+            except JSONRPCException as e:
+                self.cache_txn_data(txn_id, e)
+                raise
+            self.cache_txn_data(txn_id, txn_data)
+        elif isinstance(txn_data, Exception):
+            raise txn_data
+        return txn_data
+
+    def fetch_txns_data(self, txn_ids):
+        """Decoded transactions by txid, from the cache or from batched getrawtransaction calls; failed fetches map to their exception."""
+        txns_data = {}
+        missing_txn_ids = []
+        for txn_id in txn_ids:
+            txn_data = self.get_cached_txn_data(str(txn_id))
+            if txn_data is None:
+                missing_txn_ids.append(txn_id)
+            else:
+                txns_data[txn_id] = txn_data
+
+        for i in range(0, len(missing_txn_ids), self.rpc_batch_size):
+            chunk = missing_txn_ids[i:i + self.rpc_batch_size]
+            try:
+                results = self.rpc_pool.batch([("getrawtransaction", str(txn_id), 1) for txn_id in chunk])
+            except Exception as e:
+                results = [e] * len(chunk)
+            for txn_id, txn_data in zip(chunk, results):
+                self.cache_txn_data(str(txn_id), txn_data)
+                txns_data[txn_id] = txn_data
+
+        return txns_data
+
     def create_funds_flow_challenge(self, start_block_height, last_block_height):
+        challenge, txn_id, *_ = self.create_funds_flow_challenge_with_block(start_block_height, last_block_height)
+        return challenge, txn_id
+
+    def create_funds_flow_challenge_with_block(self, start_block_height, last_block_height):
+        """create_funds_flow_challenge that also returns the height and hash of the block the transaction was picked from."""
         num_retries = 10 # to prevent infinite loop
         is_valid_block = False
         while num_retries and not is_valid_block:
@@ -152,7 +465,7 @@ class BitcoinNode(Node):
             *_, in_total_amount, out_total_amount = self.process_in_memory_txn_for_indexing(tx)
             
         challenge = Challenge(model_type=MODEL_TYPE_FUNDS_FLOW, in_total_amount=in_total_amount, out_total_amount=out_total_amount, tx_id_last_6_chars=txn_id[-6:])
-        return challenge, txn_id
+        return challenge, txn_id, block_to_check, block_data["hash"]
 
     def validate_funds_flow_challenge_response_output(self, challenge: Challenge, response_output):
         if response_output[-6:] != challenge.tx_id_last_6_chars:
@@ -171,38 +484,148 @@ class BitcoinNode(Node):
 
         logger.info(f"Creating balance tracking challenge", block_height=block_height)
 
-        block = self.get_block_by_height(block_height)
-        block_data = parse_block_data(block)
-        transactions = block_data.transactions
-        
-        balance_changes_by_address = {}
-        changed_addresses = []
-        
-        for tx in transactions:
-            in_amount_by_address, out_amount_by_address, input_addresses, output_addresses, in_total_amount, out_total_amount = self.process_in_memory_txn_for_indexing(tx)
-            
-            for address in input_addresses:
-                if not address in balance_changes_by_address:
-                    balance_changes_by_address[address] = 0
-                    changed_addresses.append(address)
-                balance_changes_by_address[address] -= in_amount_by_address[address]
-            
-            for address in output_addresses:
-                if not address in balance_changes_by_address:
-                    balance_changes_by_address[address] = 0
-                    changed_addresses.append(address)
-                balance_changes_by_address[address] += out_amount_by_address[address]
-                
+        summary = self.get_block_balance_summary(block_height)
+
         challenge = Challenge(model_type=MODEL_TYPE_BALANCE_TRACKING, block_height=block_height)
-        total_balance_change = sum(balance_changes_by_address.values())
-        logger.info(f"Created balance tracking challenge", block_height=block_height)
+        total_balance_change = summary.total_balance_change
+        logger.info(f"Created balance tracking challenge", block_height=block_height, changed_addresses=summary.changed_addresses)
 
         return challenge, total_balance_change
 
+    def compute_block_balance_summary(self, block_height, block_data=None) -> BlockBalanceSummary:
+        """Summary of a block's balance changes; the deltas digest is only computed when there is a store to keep it in."""
+        if block_data is None:
+            block_data = self.get_block_data_by_height(block_height)
+            if block_data is None:
+                raise Exception(f"Failed to fetch block {block_height}")
+
+        balance_deltas = BalanceDeltaAccumulator()
+        self.add_block_balance_deltas(block_height, balance_deltas, block_data)
+        addresses, deltas = balance_deltas.get_address_deltas()
+        return BlockBalanceSummary(
+            block_height=block_height,
+            block_hash=self.get_block_data_hash(block_data),
+            total_balance_change=int(deltas.sum()),
+            changed_addresses=int(np.count_nonzero(deltas)),
+            deltas_digest=get_deltas_digest(addresses, deltas) if self.balance_summary_store is not None else None,
+        )
+
+    def store_block_balance_summary(self, block_height, block_data=None) -> BlockBalanceSummary:
+        summary = self.compute_block_balance_summary(block_height, block_data)
+        if self.balance_summary_store is not None:
+            self.balance_summary_store.put(summary)
+        return summary
+
+    def get_block_balance_summary(self, block_height) -> BlockBalanceSummary:
+        """
+        Balance change summary of a block. A stored summary is used when it was computed from the block
+        bitcoind currently has at that height, otherwise the block is summarized and the result stored.
+        """
+        if self.balance_summary_store is not None:
+            summary = self.balance_summary_store.get(block_height)
+            if summary is not None and summary.block_hash == self.get_block_hash(block_height):
+                return summary
+        return self.store_block_balance_summary(block_height)
+
+    def add_block_balance_deltas(self, block_height, balance_deltas: BalanceDeltaAccumulator, block_data=None):
+        """Add a block's balance changes; block_data is a get_block_data_by_height result fetched ahead, e.g. by get_blocks."""
+        if block_data is None:
+            block_data = self.get_block_data_by_height(block_height)
+            if block_data is None:
+                raise Exception(f"Failed to fetch block {block_height}")
+        transactions = self.iter_block_data_transactions(block_data, block_height, include_script_sig=False, include_script_pub_key=False)
+
+        # outputs created earlier in this block, inputs spending them need no lookup
+        block_tx_outs = {}
+        for tx, tx_outs in self.iter_transactions_with_tx_outs(transactions, block_tx_outs):
+            balance_deltas.add_transaction(tx, tx_outs)
+
+    def get_balance_changes_by_block_range(self, start_block_height, end_block_height, max_workers=None):
+        """
+        Net balance change per address over the blocks [start_block_height, end_block_height] and their total.
+        The range is split into contiguous sub-ranges reduced in parallel by worker processes,
+        see get_balance_changes_by_block_range_parallel. Addresses whose changes cancel out are left out.
+        """
+        max_workers = max_workers or self.balance_workers
+        start_time = time.time()
+        balance_changes_by_address = get_balance_changes_by_block_range_parallel(self, start_block_height, end_block_height, max_workers)
+        total_balance_change = sum(balance_changes_by_address.values())
+        logger.info(f"Computed balance changes for block range", start_block_height=start_block_height, end_block_height=end_block_height, changed_addresses=len(balance_changes_by_address), workers=max_workers, time_taken=time.time() - start_time)
+        return balance_changes_by_address, total_balance_change
+
+    def create_rpc_pool(self):
+        rpc_pool = create_rpc_pool(
+            self.node_rpc_url,
+            size=self.rpc_pool_size,
+            hedge_percentile=self.rpc_hedge_percentile,
+            failure_threshold=self.rpc_eject_after_failures,
+            ejection_time=self.rpc_eject_seconds,
+        )
+        if self.rpc_adaptive_concurrency:
+            rpc_pool = ConcurrencyLimitedRpcPool(rpc_pool, AdaptiveConcurrencyLimiter(self.rpc_max_in_flight))
+        return rpc_pool
+
+    def get_rpc_stats(self):
+        """Concurrency limit, queue wait and rejection counters of the RPC pool, plus per backend health when there are several."""
+        return self.rpc_pool.get_stats() if hasattr(self.rpc_pool, "get_stats") else {}
+
+    def get_worker_config(self, num_workers: int):
+        """
+        What a balance worker process needs to build its own node with create_worker, or None without a tx_out index.
+        Workers are started fresh rather than forked, so they map the index file instead of sharing the in-memory
+        tx_out tables; outputs only in those tables (e.g. added by the TxOutUpdater) are fetched from bitcoind.
+        The RPC pool size and in-flight limit are split between num_workers so together they stay within this node's.
+        """
+        if self.tx_out_index is None or self.tx_out_index.path is None:
+            if not self.balance_workers_fallback_logged:
+                indexlogger.warning(f"Balance workers need BITCOIN_V2_TX_OUT_INDEX or BITCOIN_V2_TX_OUT_SHARED_INDEX, computing balance changes in-process", extra = logger_extra_data(balance_workers = num_workers))
+                self.balance_workers_fallback_logged = True
+            return None
+        settings = {name: getattr(self, name) for name in WORKER_SETTINGS}
+        settings["rpc_pool_size"] = max(1, self.rpc_pool_size // num_workers)
+        settings["rpc_max_in_flight"] = max(1, self.rpc_max_in_flight // num_workers)
+        return {"node_rpc_url": self.node_rpc_url, "tx_out_index_path": self.tx_out_index.path, "settings": settings}
+
+    @classmethod
+    def create_worker(cls, worker_config):
+        """
+        Node of a balance worker process from get_worker_config: it maps the tx_out index read-only,
+        loads no pickles, keeps no cache on disk and runs no background threads.
+        """
+        for name in WORKER_DISABLED_ENVIRON:
+            os.environ.pop(name, None)
+        os.environ["BITCOIN_V2_TX_OUT_INDEX"] = worker_config["tx_out_index_path"]
+        node = cls(worker_config["node_rpc_url"])
+        for name, value in worker_config["settings"].items():
+            setattr(node, name, value)
+        node.rpc_pool.close()
+        node.rpc_pool = node.create_rpc_pool()
+        return node
+
+    def iter_transactions_with_tx_outs(self, transactions, block_tx_outs, chunk_size=None):
+        """
+        Pair streamed transactions with the resolved (address, amount) of their inputs.
+        Transactions are taken chunk_size at a time so table misses are still fetched in batches,
+        while only one chunk of transactions is alive at once. block_tx_outs collects the outputs seen so far.
+        """
+        chunk_size = chunk_size or BALANCE_TRACKING_CHUNK_SIZE
+        while True:
+            chunk = list(itertools.islice(transactions, chunk_size))
+            if not chunk:
+                return
+            outpoints = []
+            for tx in chunk:
+                for vout in tx.vouts:
+                    block_tx_outs[(tx.tx_id, str(vout.vout_id))] = (vout.address, vout.value_satoshi)
+                outpoints.extend((vin.tx_id, str(vin.vout_id)) for vin in tx.vins if vin.tx_id != 0)
+            known_tx_outs = {outpoint: block_tx_outs[outpoint] for outpoint in outpoints if outpoint in block_tx_outs}
+            tx_outs = self.get_addresses_and_amounts_by_outpoints(outpoints, known_tx_outs)
+            for tx in chunk:
+                yield tx, tx_outs
+
     def get_txn_data_by_id(self, txn_id: str):
         try:
-            rpc_connection = AuthServiceProxy(self.node_rpc_url)
-            return rpc_connection.getrawtransaction(txn_id, 1)
+            return self.fetch_txn_data(txn_id)
         except Exception as e:
             logger.error(f"Failed to get transaction data by id", error={'exception_type': e.__class__.__name__, 'exception_message': str(e), 'exception_args': e.args})
             return None
@@ -231,29 +654,12 @@ class BitcoinNode(Node):
             if "nonstandard" in script_type or script_type == "nulldata":
                 continue
 
-            value_satoshi = int(Decimal(vout_data["value"]) * SATOSHI)
+            address = address_deriver.derive_from_script_pub_key(vout_data["scriptPubKey"]) or f"unknown-{tx.tx_id}"
+
+            value_satoshi = to_satoshi(vout_data["value"])
             n = vout_data["n"]
             script_pub_key_asm = vout_data["scriptPubKey"].get("asm", "")
 
-            address = vout_data["scriptPubKey"].get("address", "")
-            if not address:
-                addresses = vout_data["scriptPubKey"].get("addresses", [])
-                if addresses:
-                    address = addresses[0]
-                elif "OP_CHECKSIG" in script_pub_key_asm:
-                    pubkey = script_pub_key_asm.split()[0]
-                    address = pubkey_to_address(pubkey)
-                elif "OP_CHECKMULTISIG" in script_pub_key_asm:
-                    pubkeys = script_pub_key_asm.split()[1:-2]
-                    m = int(script_pub_key_asm.split()[0])
-                    redeem_script = construct_redeem_script(pubkeys, m)
-                    hashed_script = hash_redeem_script(redeem_script)
-                    address = create_p2sh_address(hashed_script)
-                else:
-                    raise Exception(
-                        f"Unknown address type: {vout_data['scriptPubKey']}"
-                    )
-
             vout = VOUT(
                 vout_id=n,
                 value_satoshi=value_satoshi,
@@ -265,14 +671,16 @@ class BitcoinNode(Node):
             
         return tx
     
-    def process_in_memory_txn_for_indexing(self, tx):
+    def process_in_memory_txn_for_indexing(self, tx, tx_outs=None):
         input_amounts = {} # input amounts by address in satoshi
         output_amounts = {} # output amounts by address in satoshi
 
-        for vin in tx.vins:
-            if vin.tx_id == 0:
-                continue
-            address, amount = self.get_address_and_amount_by_txn_id_and_vout_id(vin.tx_id, str(vin.vout_id))
+        outpoints = [(vin.tx_id, str(vin.vout_id)) for vin in tx.vins if vin.tx_id != 0]
+        if tx_outs is None or any(outpoint not in tx_outs for outpoint in outpoints):
+            tx_outs = self.get_addresses_and_amounts_by_outpoints(outpoints, tx_outs)
+
+        for outpoint in outpoints:
+            address, amount = tx_outs[outpoint]
             input_amounts[address] = input_amounts.get(address, 0) + amount
 
         for vout in tx.vouts:
@@ -1,9 +1,11 @@
 from Crypto.Hash import SHA256, RIPEMD160
 import base58
 from dataclasses import dataclass, field
-from typing import List, Optional
+from typing import Iterator, List, Optional
 from decimal import Decimal, getcontext
 
+from neurons.nodes.bitcoin.address import address_deriver
+
 
 def pubkey_to_address(pubkey: str) -> str:
     # Step 1: SHA-256 hashing on the public key
@@ -104,27 +106,65 @@ class VIN:
 
 getcontext().prec = 28
 SATOSHI = Decimal("100000000")
+SATOSHIS_PER_BTC = 100000000
+
+
+class Satoshis(int):
+    """An amount decode_rpc_response already converted to satoshis, which to_satoshi passes through."""
+    __slots__ = ()
+
+    def __reduce__(self):
+        # cheaper to unpickle than the generic reconstructor of int subclasses
+        return Satoshis, (int(self),)
+
+
+def to_satoshi(value) -> int:
+    """
+    BTC amount of an RPC result in satoshis. Only Satoshis, as produced by decode_rpc_response, are taken to be
+    satoshis already; every other value is BTC, including a plain int such as the 50 of "value": 50 decoded elsewhere.
+    Floats are exact after rounding, as every amount below 21M BTC with 8 decimals is within 0.5 sat of its nearest
+    double. Decimals and strings come from blocks decoded elsewhere.
+    """
+    if isinstance(value, Satoshis):
+        return value
+    if isinstance(value, float):
+        return round(value * SATOSHIS_PER_BTC)
+    if isinstance(value, int):
+        return value * SATOSHIS_PER_BTC
+    return int(Decimal(value) * SATOSHI)
+
+
+def to_difficulty(value) -> Decimal:
+    """Block difficulty as the Decimal of the 16 significant digits bitcoind prints, whether decoded as float or Decimal."""
+    if isinstance(value, float):
+        return Decimal("%.16g" % value)
+    return Decimal(value)
+
+
+def parse_block_header(block_data) -> Block:
+    """The Block of a getblock result without its transactions."""
+    return Block(
+        block_height=block_data["height"],
+        block_hash=block_data["hash"],
+        timestamp=int(block_data["time"]),
+        previous_block_hash=block_data.get("previousblockhash", ""),
+        nonce=block_data.get("nonce", 0),
+        difficulty=to_difficulty(block_data.get("difficulty", 0)),
+    )
 
 
-def parse_block_data(block_data):
+def iter_block_transactions(block_data, include_script_sig: bool = True, include_script_pub_key: bool = True) -> Iterator[Transaction]:
+    """
+    Transactions of a getblock verbosity 2 result, built one at a time as the caller consumes them.
+    Single pass consumers keep at most one Transaction alive instead of the whole block.
+    Asm the caller does not need can be skipped, leaving script_sig / script_pub_key as None.
+    """
     block_height = block_data["height"]
-    block_hash = block_data["hash"]
-    block_previous_hash = block_data.get("previousblockhash", "")
     timestamp = int(block_data["time"])
 
-    block = Block(
-        block_height=block_height,
-        block_hash=block_hash,
-        timestamp=timestamp,
-        previous_block_hash=block_previous_hash,
-        nonce=block_data.get("nonce", 0),
-        difficulty=block_data.get("difficulty", 0),
-    )
-
     for tx_data in block_data["tx"]:
         tx_id = tx_data["txid"]
-        fee = Decimal(tx_data.get("fee", 0))
-        fee_satoshi = int(fee * SATOSHI)
+        fee_satoshi = to_satoshi(tx_data.get("fee", 0))
         tx_timestamp = int(tx_data.get("time", timestamp))
 
         tx = Transaction(
@@ -139,7 +179,7 @@ def parse_block_data(block_data):
                 tx_id=vin_data.get("txid", 0),
                 vin_id=vin_data.get("sequence", 0),
                 vout_id=vin_data.get("vout", 0),
-                script_sig=vin_data.get("scriptSig", {}).get("asm", ""),
+                script_sig=vin_data.get("scriptSig", {}).get("asm", "") if include_script_sig else None,
                 sequence=vin_data.get("sequence", 0),
             )
             tx.vins.append(vin)
@@ -150,28 +190,12 @@ def parse_block_data(block_data):
             if "nonstandard" in script_type or script_type == "nulldata":
                 continue
 
-            value_satoshi = int(Decimal(vout_data["value"]) * SATOSHI)
+            # outputs without a derivable address keep their amount under a per transaction placeholder
+            address = address_deriver.derive_from_script_pub_key(vout_data["scriptPubKey"]) or f"unknown-{tx.tx_id}"
+
+            value_satoshi = to_satoshi(vout_data["value"])
             n = vout_data["n"]
-            script_pub_key_asm = vout_data["scriptPubKey"].get("asm", "")
-
-            address = vout_data["scriptPubKey"].get("address", "")
-            if not address:
-                addresses = vout_data["scriptPubKey"].get("addresses", [])
-                if addresses:
-                    address = addresses[0]
-                elif "OP_CHECKSIG" in script_pub_key_asm:
-                    pubkey = script_pub_key_asm.split()[0]
-                    address = pubkey_to_address(pubkey)
-                elif "OP_CHECKMULTISIG" in script_pub_key_asm:
-                    pubkeys = script_pub_key_asm.split()[1:-2]
-                    m = int(script_pub_key_asm.split()[0])
-                    redeem_script = construct_redeem_script(pubkeys, m)
-                    hashed_script = hash_redeem_script(redeem_script)
-                    address = create_p2sh_address(hashed_script)
-                else:
-                    raise Exception(
-                        f"Unknown address type: {vout_data['scriptPubKey']}"
-                    )
+            script_pub_key_asm = vout_data["scriptPubKey"].get("asm", "") if include_script_pub_key else None
 
             vout = VOUT(
                 vout_id=n,
@@ -182,6 +206,10 @@ def parse_block_data(block_data):
             )
             tx.vouts.append(vout)
 
-        block.transactions.append(tx)
+        yield tx
 
+
+def parse_block_data(block_data):
+    block = parse_block_header(block_data)
+    block.transactions.extend(iter_block_transactions(block_data))
     return block
\ No newline at end of file
@@ -0,0 +1,556 @@
+import argparse
+import base64
+import functools
+import http.client
+import itertools
+import json
+import queue
+import random
+import threading
+import time
+import urllib.parse
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from decimal import Decimal
+
+from bitcoinrpc.authproxy import JSONRPCException, EncodeDecimal
+
+from neurons.nodes.bitcoin.node_utils import Satoshis, to_satoshi
+from neurons.setup_logger import setup_logger
+from neurons.setup_logger import logger_extra_data
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+HTTP_TIMEOUT = 30
+USER_AGENT = "BitcoinNode/0.1"
+
+# errors after which the socket can no longer be trusted and the connection is discarded
+TRANSPORT_ERRORS = (OSError, http.client.HTTPException)
+# errors worth retrying on a fresh connection, e.g. bitcoind closing an idle keep-alive socket
+RECONNECT_ERRORS = (ConnectionError, http.client.HTTPException)
+
+# bitcoind error code for unknown transactions, e.g. pruned or never confirmed ones
+RPC_INVALID_ADDRESS_OR_KEY = -5
+# codes of JSONRPCExceptions raised for unusable HTTP responses rather than by bitcoind itself
+RPC_NON_JSON_RESPONSE = -342
+RPC_MISSING_RESULT = -343
+RPC_WORK_QUEUE_FULL = -344 # HTTP 503, bitcoind's rpcworkqueue is full ("Work queue depth exceeded")
+
+# calls that do not change bitcoind state, so they can fail over or be hedged on another backend
+READ_ONLY_METHODS = frozenset({
+    "getbestblockhash", "getblock", "getblockchaininfo", "getblockcount", "getblockhash", "getblockheader", "getrawtransaction",
+})
+# latency samples required before a method is hedged
+MIN_HEDGE_SAMPLES = 20
+
+rpclogger = setup_logger("RpcBackends")
+
+_request_ids = itertools.count(1)
+
+
+def get_rpc_headers(service_url: str):
+    url = urllib.parse.urlparse(service_url)
+    auth_pair = f"{urllib.parse.unquote(url.username or '')}:{urllib.parse.unquote(url.password or '')}".encode("utf8")
+    return {
+        'Host': url.hostname,
+        'User-Agent': USER_AGENT,
+        'Authorization': 'Basic ' + base64.b64encode(auth_pair).decode("ascii"),
+        'Content-type': 'application/json',
+    }
+
+
+def strip_rpc_credentials(service_url: str) -> str:
+    url = urllib.parse.urlparse(service_url)
+    netloc = url.hostname if url.port is None else f"{url.hostname}:{url.port}"
+    return urllib.parse.urlunparse(url._replace(netloc=netloc))
+
+
+def encode_rpc_request(payload) -> str:
+    return json.dumps(payload, default=EncodeDecimal)
+
+
+def set_satoshi_amounts(result):
+    """Replace the fee and vout values of a getblock / getrawtransaction result with integer satoshis, in place."""
+    if not isinstance(result, dict):
+        return
+    transactions = result.get("tx")
+    if not isinstance(transactions, list):
+        transactions = [result]
+    for tx in transactions:
+        if not isinstance(tx, dict):
+            continue
+        if "fee" in tx:
+            tx["fee"] = Satoshis(to_satoshi(tx["fee"]))
+        for vout in tx.get("vout", ()):
+            if "value" in vout:
+                vout["value"] = Satoshis(to_satoshi(vout["value"]))
+
+
+def decode_rpc_response(data: bytes, content_type: str, status: int, reason: str):
+    """
+    Decoded JSON-RPC response, with orjson when it is installed. JSON numbers with a fraction are still parsed,
+    but as floats rather than Decimals; the fee and vout values of blocks and transactions are then rounded to
+    integer satoshis, and other numbers such as difficulty stay floats.
+    """
+    if status == 503:
+        raise JSONRPCException({
+            'code': RPC_WORK_QUEUE_FULL, 'message': data.decode('utf8', 'replace').strip() or 'work queue depth exceeded'})
+    if content_type != 'application/json':
+        raise JSONRPCException({
+            'code': RPC_NON_JSON_RESPONSE, 'message': 'non-JSON HTTP response with \'%i %s\' from server' % (status, reason)})
+    response = orjson.loads(data) if orjson is not None else json.loads(data)
+    for single_response in response if isinstance(response, list) else [response]:
+        if isinstance(single_response, dict):
+            set_satoshi_amounts(single_response.get('result'))
+    return response
+
+
+def build_call_payload(method: str, params):
+    return {'version': '1.1', 'method': method, 'params': list(params), 'id': next(_request_ids)}
+
+
+def get_call_result(response):
+    if response.get('error') is not None:
+        raise JSONRPCException(response['error'])
+    elif 'result' not in response:
+        raise JSONRPCException({
+            'code': RPC_MISSING_RESULT, 'message': 'missing JSON-RPC result'})
+    return response['result']
+
+
+def build_batch_payload(calls):
+    return [
+        {'jsonrpc': '2.0', 'method': method, 'params': list(params), 'id': next(_request_ids)}
+        for method, *params in calls
+    ]
+
+
+def get_batch_results(payload, responses):
+    """Results in request order; a failed call yields a JSONRPCException in its place instead of failing the batch."""
+    if not isinstance(responses, list):
+        raise JSONRPCException(responses.get('error') or {'code': RPC_MISSING_RESULT, 'message': 'missing JSON-RPC batch result'})
+
+    responses_by_id = {response.get('id'): response for response in responses}
+    results = []
+    for request in payload:
+        response = responses_by_id.get(request['id'])
+        if response is None or ('result' not in response and response.get('error') is None):
+            results.append(JSONRPCException({'code': RPC_MISSING_RESULT, 'message': 'missing JSON-RPC result'}))
+        elif response.get('error') is not None:
+            results.append(JSONRPCException(response['error']))
+        else:
+            results.append(response['result'])
+    return results
+
+
+def is_missing_txn_error(error) -> bool:
+    """Whether bitcoind answered that a transaction does not exist, as opposed to failing to answer at all."""
+    return isinstance(error, JSONRPCException) and error.code == RPC_INVALID_ADDRESS_OR_KEY
+
+
+def is_backend_error(error) -> bool:
+    """Whether a call failed because of the backend (network, HTTP or a broken response) rather than bitcoind answering with an error."""
+    if isinstance(error, JSONRPCException):
+        return error.code in (RPC_NON_JSON_RESPONSE, RPC_MISSING_RESULT, RPC_WORK_QUEUE_FULL)
+    return isinstance(error, TRANSPORT_ERRORS + (ValueError,))
+
+
+def get_batch_method(calls) -> str:
+    """
+    Name a batch is tracked under in latency statistics: "batch-write" unless all its calls are read-only, otherwise
+    its method ("mixed" for several) and size rounded up to a power of two, e.g. "batch:getrawtransaction:128",
+    so batches are only hedged against the latency of batches of similar work.
+    """
+    if not all(call[0] in READ_ONLY_METHODS for call in calls):
+        return "batch-write"
+    methods = {call[0] for call in calls}
+    method = methods.pop() if len(methods) == 1 else "mixed"
+    return f"batch:{method}:{1 << (max(1, len(calls)) - 1).bit_length()}"
+
+
+def is_read_only(method: str) -> bool:
+    return method in READ_ONLY_METHODS or method.startswith("batch:")
+
+
+def is_work_queue_full_error(error) -> bool:
+    """Whether bitcoind rejected a request because its RPC work queue is full."""
+    return isinstance(error, JSONRPCException) and error.code == RPC_WORK_QUEUE_FULL
+
+
+def get_rpc_service_urls(service_url: str):
+    """The bitcoind RPC endpoints of a comma separated BITCOIN_NODE_RPC_URL."""
+    return [url.strip() for url in service_url.split(",") if url.strip()]
+
+
+class RpcConnection:
+    """A single persistent HTTP/1.1 JSON-RPC connection to bitcoind, speaking the same protocol as AuthServiceProxy."""
+    def __init__(self, service_url: str, timeout: float = HTTP_TIMEOUT):
+        url = urllib.parse.urlparse(service_url)
+        self.path = url.path or "/"
+        self.headers = get_rpc_headers(service_url)
+        if url.scheme == 'https':
+            self.conn = http.client.HTTPSConnection(url.hostname, url.port or 443, timeout=timeout)
+        else:
+            self.conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=timeout)
+        self.last_used = time.monotonic()
+
+    def _post(self, payload):
+        self.conn.request('POST', self.path, encode_rpc_request(payload), self.headers)
+        http_response = self.conn.getresponse()
+        data = http_response.read()
+        self.last_used = time.monotonic()
+        return decode_rpc_response(data, http_response.getheader('Content-Type'), http_response.status, http_response.reason)
+
+    def call(self, method: str, *params):
+        return get_call_result(self._post(build_call_payload(method, params)))
+
+    def batch(self, calls):
+        """Send [(method, *params), ...] as one JSON-RPC batch request, see get_batch_results."""
+        if not calls:
+            return []
+        payload = build_batch_payload(calls)
+        return get_batch_results(payload, self._post(payload))
+
+    def close(self):
+        self.conn.close()
+
+
+class RpcConnectionPool:
+    """
+    Thread-safe pool of persistent RpcConnections shared by all node methods.
+    At most `size` connections are in use at once. Connections idle for longer than health_check_interval
+    are probed before reuse, and calls that hit a dropped connection are retried on a fresh one.
+    """
+    def __init__(self, service_url: str, size: int = 8, timeout: float = HTTP_TIMEOUT, health_check_interval: float = 60, max_retries: int = 2):
+        self.service_url = service_url
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.max_retries = max_retries
+        self._idle = queue.LifoQueue()  # most recently used first, so warm connections are reused
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _new_connection(self) -> RpcConnection:
+        return RpcConnection(self.service_url, self.timeout)
+
+    def _is_healthy(self, connection: RpcConnection) -> bool:
+        try:
+            connection.call("getblockcount")
+            return True
+        except Exception:
+            return False
+
+    def _checkout(self) -> RpcConnection:
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            return self._new_connection()
+
+        if time.monotonic() - connection.last_used > self.health_check_interval and not self._is_healthy(connection):
+            connection.close()
+            return self._new_connection()
+        return connection
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        connection = None
+        try:
+            connection = self._checkout()
+            yield connection
+        except TRANSPORT_ERRORS:
+            if connection is not None:
+                connection.close()
+                connection = None
+            raise
+        finally:
+            if connection is not None:
+                self._idle.put(connection)
+            self._slots.release()
+
+    def _request(self, request):
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.connection() as connection:
+                    return request(connection)
+            except RECONNECT_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+
+    def call(self, method: str, *params):
+        return self._request(lambda connection: connection.call(method, *params))
+
+    def batch(self, calls):
+        return self._request(lambda connection: connection.batch(calls))
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class RpcBackend:
+    """One bitcoind endpoint of a MultiBackendRpcPool with its health: latency average, requests in flight and failures."""
+    def __init__(self, service_url: str, pool: RpcConnectionPool):
+        self.service_url = service_url
+        self.name = strip_rpc_credentials(service_url)
+        self.pool = pool
+        self.latency = None # exponentially weighted average of successful calls, in seconds
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.ejections = 0 # ejections since the last success, doubles the ejection time each time
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def is_ejected(self, now: float) -> bool:
+        return now < self.ejected_until
+
+    def get_score(self) -> float:
+        """Expected wait for a new request; backends without measurements are tried first."""
+        return (self.latency or 0.0) * (self.in_flight + 1)
+
+
+class MultiBackendRpcPool:
+    """
+    Spreads calls over several bitcoind endpoints, each with its own RpcConnectionPool, and exposes the same call / batch
+    interface. Each call goes to the healthy backend with the lowest expected wait (latency average times requests in flight).
+    Read-only calls fail over to another backend on transport errors, and when the first attempt is still running after
+    the hedge_percentile latency of its method a hedged copy is sent to a second backend; the first answer wins.
+    A backend failing failure_threshold calls in a row is ejected for ejection_time seconds, doubling up to
+    max_ejection_time while it keeps failing after it comes back.
+    """
+    def __init__(self, service_urls, size: int = 8, timeout: float = HTTP_TIMEOUT, hedge_percentile: float = 95,
+                 min_hedge_delay: float = 0.01, failure_threshold: int = 5, ejection_time: float = 30,
+                 max_ejection_time: float = 600, latency_window: int = 256, latency_decay: float = 0.2):
+        self.backends = [RpcBackend(url, RpcConnectionPool(url, size=size, timeout=timeout)) for url in service_urls]
+        if not self.backends:
+            raise ValueError("MultiBackendRpcPool needs at least one service url")
+        self.size = size
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay
+        self.failure_threshold = failure_threshold
+        self.ejection_time = ejection_time
+        self.max_ejection_time = max_ejection_time
+        self.latency_window = latency_window
+        self.latency_decay = latency_decay
+        self.hedged_requests = 0
+        self.hedge_wins = 0
+        self.hedges_skipped = 0 # slow calls not hedged because the limiter had no free slot
+        # AdaptiveConcurrencyLimiter a hedged copy needs a slot of, set by the ConcurrencyLimitedRpcPool wrapping this pool
+        self.limiter = None
+        self._latencies = {} # method -> recent successful latencies
+        self._hedge_delays = {} # method -> cached hedge_percentile of _latencies
+        self._lock = threading.Lock()
+        # one thread per connection slot, so hedged attempts never queue behind each other
+        self._executor = ThreadPoolExecutor(max_workers=size * len(self.backends), thread_name_prefix="rpc-backend")
+
+    def _pick(self, exclude=()):
+        """Healthy backend with the lowest score; when all are ejected, the one coming back first."""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [backend for backend in self.backends if backend not in exclude]
+            healthy = [backend for backend in candidates if not backend.is_ejected(now)]
+            if healthy:
+                backend = min(healthy, key=lambda backend: (backend.get_score(), random.random()))
+            else:
+                backend = min(candidates, key=lambda backend: backend.ejected_until)
+            backend.in_flight += 1
+            return backend
+
+    def _record_success(self, backend: RpcBackend, method: str, latency: float):
+        with self._lock:
+            backend.in_flight -= 1
+            backend.requests += 1
+            backend.consecutive_failures = 0
+            backend.ejections = 0
+            backend.latency = latency if backend.latency is None else backend.latency + self.latency_decay * (latency - backend.latency)
+            latencies = self._latencies.setdefault(method, deque(maxlen=self.latency_window))
+            latencies.append(latency)
+            if len(latencies) >= MIN_HEDGE_SAMPLES and (method not in self._hedge_delays or len(latencies) % 16 == 0):
+                ordered = sorted(latencies)
+                percentile = ordered[min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile / 100))]
+                self._hedge_delays[method] = max(self.min_hedge_delay, percentile)
+
+    def _record_failure(self, backend: RpcBackend, error: Exception):
+        now = time.monotonic()
+        with self._lock:
+            backend.in_flight -= 1
+            backend.requests += 1
+            backend.failures += 1
+            backend.consecutive_failures += 1
+            if backend.consecutive_failures < self.failure_threshold or backend.is_ejected(now):
+                return
+            ejection_time = min(self.ejection_time * 2 ** backend.ejections, self.max_ejection_time)
+            backend.ejected_until = now + ejection_time
+            backend.ejections += 1
+        rpclogger.warning(f"Ejected RPC backend", extra = logger_extra_data(backend = backend.name, ejection_time = ejection_time, consecutive_failures = backend.consecutive_failures, error = {'exception_type': error.__class__.__name__,'exception_message': str(error),'exception_args': error.args}))
+
+    def _attempt(self, backend: RpcBackend, method: str, request):
+        start_time = time.monotonic()
+        try:
+            result = request(backend.pool)
+        except Exception as e:
+            if is_backend_error(e):
+                self._record_failure(backend, e)
+            else:
+                # bitcoind answered, e.g. with an unknown transaction error, so the backend is healthy
+                self._record_success(backend, method, time.monotonic() - start_time)
+            raise
+        self._record_success(backend, method, time.monotonic() - start_time)
+        return result
+
+    def _hedge(self, backend: RpcBackend, method: str, request, start_time: float):
+        """A hedged copy of a call, holding the limiter slot taken for it until it is answered."""
+        try:
+            result = self._attempt(backend, method, request)
+        except Exception as e:
+            self.limiter.release(method, start_time, e)
+            raise
+        self.limiter.release(method, start_time)
+        return result
+
+    def get_hedge_delay(self, method: str):
+        """Seconds to wait for a read-only call before hedging it, None until the method has enough samples."""
+        with self._lock:
+            return self._hedge_delays.get(method)
+
+    def _request(self, method: str, request):
+        if not is_read_only(method):
+            return self._attempt(self._pick(), method, request)
+
+        hedge_delay = self.get_hedge_delay(method) if len(self.backends) > 1 else None
+        tried = [self._pick()]
+        primary = self._executor.submit(self._attempt, tried[0], method, request)
+        pending = {primary}
+        hedged = False
+        error = None
+        while pending:
+            can_hedge = not hedged and hedge_delay is not None and len(tried) < len(self.backends)
+            done, pending = wait(pending, timeout=hedge_delay if can_hedge else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if not is_backend_error(e):
+                        raise
+                    error = e
+                    continue
+                if future is not primary and hedged:
+                    with self._lock:
+                        self.hedge_wins += 1
+                return result
+
+            # slow first attempt: hedge it; failed attempt with nothing else running: fail over
+            if len(tried) < len(self.backends) and ((not done and can_hedge) or (done and not pending)):
+                attempt = self._attempt
+                if not done:
+                    # the copy is a second request in flight, so it needs a slot of its own
+                    start_time = self.limiter.try_acquire() if self.limiter is not None else None
+                    if self.limiter is not None and start_time is None:
+                        hedge_delay = None
+                        with self._lock:
+                            self.hedges_skipped += 1
+                        continue
+                    if start_time is not None:
+                        attempt = functools.partial(self._hedge, start_time=start_time)
+                    hedged = True
+                    with self._lock:
+                        self.hedged_requests += 1
+                tried.append(self._pick(tried))
+                pending.add(self._executor.submit(attempt, tried[-1], method, request))
+        raise error
+
+    def call(self, method: str, *params):
+        return self._request(method, lambda pool: pool.call(method, *params))
+
+    def batch(self, calls):
+        """Batches of read-only calls are hedged as a whole, against the latency of earlier batches like them, see get_batch_method."""
+        if not calls:
+            return []
+        return self._request(get_batch_method(calls), lambda pool: pool.batch(calls))
+
+    def get_stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "hedged_requests": self.hedged_requests,
+                "hedge_wins": self.hedge_wins,
+                "hedges_skipped": self.hedges_skipped,
+                "backends": [
+                    {
+                        "backend": backend.name,
+                        "latency": backend.latency,
+                        "in_flight": backend.in_flight,
+                        "requests": backend.requests,
+                        "failures": backend.failures,
+                        "ejected": backend.is_ejected(now),
+                    }
+                    for backend in self.backends
+                ],
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        for backend in self.backends:
+            backend.pool.close()
+
+
+def create_rpc_pool(service_url: str, size: int = 8, **kwargs):
+    """RpcConnectionPool for one endpoint, MultiBackendRpcPool when service_url lists several separated by commas."""
+    service_urls = get_rpc_service_urls(service_url)
+    if len(service_urls) == 1:
+        return RpcConnectionPool(service_urls[0], size=size)
+    return MultiBackendRpcPool(service_urls, size=size, **kwargs)
+
+
+def _generate_block_response(num_transactions: int, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    transactions = []
+    for i in range(num_transactions):
+        vouts = [
+            {"value": float("%d.%08d" % divmod(rng.randrange(1, 10 ** 10), 100000000)), "n": n, "scriptPubKey": {"type": "witness_v0_keyhash"}}
+            for n in range(rng.randint(1, 3))
+        ]
+        transactions.append({"txid": f"{i:064x}", "fee": rng.randrange(1000, 100000) / 100000000, "vin": [{"txid": f"{rng.getrandbits(256):064x}", "vout": 0}], "vout": vouts})
+    block = {"hash": "00" * 32, "height": 800000, "difficulty": 86388558925171.02, "tx": transactions}
+    return json.dumps({"result": block, "error": None, "id": 1}).encode("utf8")
+
+
+def benchmark_decode_rpc_response(num_transactions: int = 4000, repeat: int = 30):
+    """Best-of-repeat seconds to decode a synthetic getblock response and convert its amounts to satoshis, per JSON decoder."""
+    data = _generate_block_response(num_transactions)
+    decoders = [
+        ("json", json.loads),
+        # what bitcoinrpc's AuthServiceProxy does, exact without rounding but one Decimal per number
+        ("json_decimal", functools.partial(json.loads, parse_float=Decimal)),
+    ]
+    if orjson is not None:
+        decoders.insert(0, ("orjson", orjson.loads))
+
+    results = {}
+    for name, loads in decoders:
+        timings = []
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            response = loads(data)
+            set_satoshi_amounts(response["result"])
+            timings.append(time.perf_counter() - start_time)
+        results[name] = (min(timings), sum(vout["value"] for tx in response["result"]["tx"] for vout in tx["vout"]))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the JSON decoders for a synthetic getblock verbosity 2 response")
+    parser.add_argument("--transactions", type=int, default=4000, help="Number of synthetic transactions")
+    parser.add_argument("--repeat", type=int, default=30, help="Runs per decoder, the best is reported")
+    args = parser.parse_args()
+
+    for name, (seconds, total_value) in benchmark_decode_rpc_response(args.transactions, args.repeat).items():
+        print(f"{name:>12}: {seconds * 1000:8.2f} ms  total output value {total_value} sat")
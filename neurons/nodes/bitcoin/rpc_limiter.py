@@ -0,0 +1,160 @@
+import threading
+import time
+
+from neurons.nodes.bitcoin.rpc import MultiBackendRpcPool, get_batch_method, is_backend_error, is_read_only, is_work_queue_full_error
+from neurons.setup_logger import setup_logger
+from neurons.setup_logger import logger_extra_data
+
+limiterlogger = setup_logger("RpcConcurrencyLimiter")
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD limit on the number of RPC requests in flight.
+    While the limit is in use and latency stays within latency_tolerance times its long term average, each successful
+    request adds 1 / limit, i.e. the limit grows steadily by a fraction of a slot per round of requests. Errors and queue-full answers cut
+    it by backoff_ratio, rising latency by latency_backoff_ratio. Requests sent before the last cut do not cut it again,
+    so one overload episode shrinks the limit once rather than once per request that was already in flight.
+    Latency averages are kept per method, because a getblock and a getblockhash take very different times.
+    """
+    def __init__(self, max_limit: int, min_limit: int = 1, initial_limit: int = None, backoff_ratio: float = 0.5,
+                 latency_backoff_ratio: float = 0.9, latency_tolerance: float = 2.0, short_decay: float = 0.2, long_decay: float = 0.01):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(initial_limit or max_limit)
+        self.backoff_ratio = backoff_ratio
+        self.latency_backoff_ratio = latency_backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.short_decay = short_decay
+        self.long_decay = long_decay
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.rejections = 0 # requests bitcoind answered with "work queue depth exceeded"
+        self.increases = 0
+        self.decreases = 0
+        self.queue_wait_seconds = 0.0
+        self.max_queue_wait_seconds = 0.0
+        self._latencies = {} # method -> [short average, long average]
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> float:
+        """Wait for a free slot; returns the start time to pass to release."""
+        wait_start = time.monotonic()
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+            start_time = time.monotonic()
+            queue_wait = start_time - wait_start
+            self.queue_wait_seconds += queue_wait
+            self.max_queue_wait_seconds = max(self.max_queue_wait_seconds, queue_wait)
+        return start_time
+
+    def try_acquire(self):
+        """Take a free slot without waiting; the start time to pass to release, None when all slots are in use."""
+        with self._condition:
+            if self.in_flight >= int(self.limit):
+                return None
+            self.in_flight += 1
+            return time.monotonic()
+
+    def _decrease(self, start_time: float, ratio: float) -> bool:
+        if start_time < self._last_decrease:
+            return False
+        self.limit = max(float(self.min_limit), self.limit * ratio)
+        self._last_decrease = time.monotonic()
+        self.decreases += 1
+        return True
+
+    def release(self, method: str, start_time: float, error: Exception = None):
+        latency = time.monotonic() - start_time
+        queue_full = is_work_queue_full_error(error)
+        with self._condition:
+            # the limit is only raised while at least half of it is used
+            saturated = self.in_flight * 2 >= int(self.limit)
+            self.in_flight -= 1
+            self.requests += 1
+            if queue_full or is_backend_error(error):
+                if queue_full:
+                    self.rejections += 1
+                else:
+                    self.errors += 1
+                decreased = self._decrease(start_time, self.backoff_ratio)
+            else:
+                decreased = False
+                averages = self._latencies.get(method)
+                if averages is None:
+                    averages = self._latencies[method] = [latency, latency]
+                averages[0] += self.short_decay * (latency - averages[0])
+                averages[1] += self.long_decay * (latency - averages[1])
+                if averages[0] > averages[1] * self.latency_tolerance:
+                    self._decrease(start_time, self.latency_backoff_ratio)
+                elif saturated and self.limit < self.max_limit:
+                    self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+                    self.increases += 1
+            self._condition.notify_all()
+            limit = self.limit
+        if decreased:
+            limiterlogger.warning(f"Reduced RPC concurrency", extra = logger_extra_data(limit = int(limit), queue_full = queue_full, error = {'exception_type': error.__class__.__name__,'exception_message': str(error),'exception_args': error.args}))
+
+    def get_stats(self):
+        with self._condition:
+            return {
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "requests": self.requests,
+                "errors": self.errors,
+                "rejections": self.rejections,
+                "increases": self.increases,
+                "decreases": self.decreases,
+                "queue_wait_seconds": self.queue_wait_seconds,
+                "avg_queue_wait_seconds": self.queue_wait_seconds / self.requests if self.requests else 0.0,
+                "max_queue_wait_seconds": self.max_queue_wait_seconds,
+            }
+
+
+class ConcurrencyLimitedRpcPool:
+    """
+    Passes the calls of an RpcConnectionPool or MultiBackendRpcPool through an AdaptiveConcurrencyLimiter.
+    Read-only requests bitcoind rejected with a full work queue are retried up to max_retries times,
+    after waiting for a slot under the reduced limit. A MultiBackendRpcPool only hedges a call when the limiter
+    has a free slot for the copy, so hedging never puts more requests on the backends than the limit.
+    """
+    def __init__(self, pool, limiter: AdaptiveConcurrencyLimiter, max_retries: int = 2):
+        self.pool = pool
+        self.limiter = limiter
+        self.max_retries = max_retries
+        if isinstance(pool, MultiBackendRpcPool):
+            pool.limiter = limiter
+
+    def _request(self, method: str, request):
+        for attempt in range(self.max_retries + 1):
+            start_time = self.limiter.acquire()
+            try:
+                result = request()
+            except Exception as e:
+                self.limiter.release(method, start_time, e)
+                if not is_work_queue_full_error(e) or not is_read_only(method) or attempt == self.max_retries:
+                    raise
+                continue
+            self.limiter.release(method, start_time)
+            return result
+
+    def call(self, method: str, *params):
+        return self._request(method, lambda: self.pool.call(method, *params))
+
+    def batch(self, calls):
+        if not calls:
+            return []
+        return self._request(get_batch_method(calls), lambda: self.pool.batch(calls))
+
+    def get_stats(self):
+        stats = self.limiter.get_stats()
+        if hasattr(self.pool, "get_stats"):
+            stats["pool"] = self.pool.get_stats()
+        return stats
+
+    def close(self):
+        self.pool.close()
@@ -0,0 +1,246 @@
+from typing import Optional
+
+# Script parsing following bitcoind: GetScriptOp, ScriptToAsmStr and the output types of Solver.
+
+OP_0 = 0x00
+OP_PUSHDATA1 = 0x4c
+OP_PUSHDATA2 = 0x4d
+OP_PUSHDATA4 = 0x4e
+OP_1NEGATE = 0x4f
+OP_1 = 0x51
+OP_16 = 0x60
+OP_RETURN = 0x6a
+OP_DUP = 0x76
+OP_EQUAL = 0x87
+OP_EQUALVERIFY = 0x88
+OP_HASH160 = 0xa9
+OP_CHECKSIG = 0xac
+OP_CHECKMULTISIG = 0xae
+
+MAX_SCRIPT_SIZE = 10000
+MAX_PUBKEYS_PER_MULTISIG = 20
+
+OPCODE_NAMES = {
+    OP_0: "0", OP_PUSHDATA1: "OP_PUSHDATA1", OP_PUSHDATA2: "OP_PUSHDATA2", OP_PUSHDATA4: "OP_PUSHDATA4", OP_1NEGATE: "-1",
+    0x50: "OP_RESERVED", 0x61: "OP_NOP", 0x62: "OP_VER", 0x63: "OP_IF", 0x64: "OP_NOTIF", 0x65: "OP_VERIF", 0x66: "OP_VERNOTIF",
+    0x67: "OP_ELSE", 0x68: "OP_ENDIF", 0x69: "OP_VERIFY", 0x6a: "OP_RETURN", 0x6b: "OP_TOALTSTACK", 0x6c: "OP_FROMALTSTACK",
+    0x6d: "OP_2DROP", 0x6e: "OP_2DUP", 0x6f: "OP_3DUP", 0x70: "OP_2OVER", 0x71: "OP_2ROT", 0x72: "OP_2SWAP", 0x73: "OP_IFDUP",
+    0x74: "OP_DEPTH", 0x75: "OP_DROP", 0x76: "OP_DUP", 0x77: "OP_NIP", 0x78: "OP_OVER", 0x79: "OP_PICK", 0x7a: "OP_ROLL",
+    0x7b: "OP_ROT", 0x7c: "OP_SWAP", 0x7d: "OP_TUCK", 0x7e: "OP_CAT", 0x7f: "OP_SUBSTR", 0x80: "OP_LEFT", 0x81: "OP_RIGHT",
+    0x82: "OP_SIZE", 0x83: "OP_INVERT", 0x84: "OP_AND", 0x85: "OP_OR", 0x86: "OP_XOR", 0x87: "OP_EQUAL", 0x88: "OP_EQUALVERIFY",
+    0x89: "OP_RESERVED1", 0x8a: "OP_RESERVED2", 0x8b: "OP_1ADD", 0x8c: "OP_1SUB", 0x8d: "OP_2MUL", 0x8e: "OP_2DIV",
+    0x8f: "OP_NEGATE", 0x90: "OP_ABS", 0x91: "OP_NOT", 0x92: "OP_0NOTEQUAL", 0x93: "OP_ADD", 0x94: "OP_SUB", 0x95: "OP_MUL",
+    0x96: "OP_DIV", 0x97: "OP_MOD", 0x98: "OP_LSHIFT", 0x99: "OP_RSHIFT", 0x9a: "OP_BOOLAND", 0x9b: "OP_BOOLOR",
+    0x9c: "OP_NUMEQUAL", 0x9d: "OP_NUMEQUALVERIFY", 0x9e: "OP_NUMNOTEQUAL", 0x9f: "OP_LESSTHAN", 0xa0: "OP_GREATERTHAN",
+    0xa1: "OP_LESSTHANOREQUAL", 0xa2: "OP_GREATERTHANOREQUAL", 0xa3: "OP_MIN", 0xa4: "OP_MAX", 0xa5: "OP_WITHIN",
+    0xa6: "OP_RIPEMD160", 0xa7: "OP_SHA1", 0xa8: "OP_SHA256", 0xa9: "OP_HASH160", 0xaa: "OP_HASH256", 0xab: "OP_CODESEPARATOR",
+    0xac: "OP_CHECKSIG", 0xad: "OP_CHECKSIGVERIFY", 0xae: "OP_CHECKMULTISIG", 0xaf: "OP_CHECKMULTISIGVERIFY", 0xb0: "OP_NOP1",
+    0xb1: "OP_CHECKLOCKTIMEVERIFY", 0xb2: "OP_CHECKSEQUENCEVERIFY", 0xb3: "OP_NOP4", 0xb4: "OP_NOP5", 0xb5: "OP_NOP6",
+    0xb6: "OP_NOP7", 0xb7: "OP_NOP8", 0xb8: "OP_NOP9", 0xb9: "OP_NOP10", 0xba: "OP_CHECKSIGADD", 0xff: "OP_INVALIDOPCODE",
+}
+OPCODE_NAMES.update({opcode: str(opcode - OP_1 + 1) for opcode in range(OP_1, OP_16 + 1)})
+
+SIGHASH_TYPE_NAMES = {
+    0x01: "ALL", 0x81: "ALL|ANYONECANPAY",
+    0x02: "NONE", 0x82: "NONE|ANYONECANPAY",
+    0x03: "SINGLE", 0x83: "SINGLE|ANYONECANPAY",
+}
+
+
+def get_script_op(script: bytes, offset: int):
+    """bitcoind's GetScriptOp: (opcode, pushed data or None, next offset), or None for a truncated push."""
+    opcode = script[offset]
+    offset += 1
+    if opcode > OP_PUSHDATA4:
+        return opcode, None, offset
+    if opcode < OP_PUSHDATA1:
+        size = opcode
+    elif opcode == OP_PUSHDATA1:
+        if offset + 1 > len(script):
+            return None
+        size = script[offset]
+        offset += 1
+    elif opcode == OP_PUSHDATA2:
+        if offset + 2 > len(script):
+            return None
+        size = int.from_bytes(script[offset:offset + 2], "little")
+        offset += 2
+    else:
+        if offset + 4 > len(script):
+            return None
+        size = int.from_bytes(script[offset:offset + 4], "little")
+        offset += 4
+    if offset + size > len(script):
+        return None
+    return opcode, script[offset:offset + size], offset + size
+
+
+def decode_script_num(data: bytes) -> int:
+    if not data:
+        return 0
+    value = int.from_bytes(data, "little")
+    if data[-1] & 0x80:
+        return -(value & ~(0x80 << (8 * (len(data) - 1))))
+    return value
+
+
+def is_valid_signature_encoding(sig: bytes) -> bool:
+    """Strict DER check of a signature with its trailing sighash byte, as in bitcoind's IsValidSignatureEncoding."""
+    size = len(sig)
+    if size < 9 or size > 73 or sig[0] != 0x30 or sig[1] != size - 3:
+        return False
+    len_r = sig[3]
+    if 5 + len_r >= size:
+        return False
+    len_s = sig[5 + len_r]
+    if len_r + len_s + 7 != size:
+        return False
+    if sig[2] != 0x02 or len_r == 0 or sig[4] & 0x80:
+        return False
+    if len_r > 1 and sig[4] == 0x00 and not sig[5] & 0x80:
+        return False
+    if sig[len_r + 4] != 0x02 or len_s == 0 or sig[len_r + 6] & 0x80:
+        return False
+    if len_s > 1 and sig[len_r + 6] == 0x00 and not sig[len_r + 7] & 0x80:
+        return False
+    return True
+
+
+def script_to_asm(script: bytes, attempt_sighash_decode: bool = False) -> str:
+    """bitcoind's ScriptToAsmStr; scriptSig asm is rendered with attempt_sighash_decode, scriptPubKey asm without."""
+    parts = []
+    offset = 0
+    is_unspendable = (len(script) > 0 and script[0] == OP_RETURN) or len(script) > MAX_SCRIPT_SIZE
+    while offset < len(script):
+        op = get_script_op(script, offset)
+        if op is None:
+            parts.append("[error]")
+            break
+        opcode, data, offset = op
+        if data is None:
+            parts.append(OPCODE_NAMES.get(opcode, "OP_UNKNOWN"))
+        elif len(data) <= 4:
+            parts.append(str(decode_script_num(data)))
+        elif attempt_sighash_decode and not is_unspendable and is_valid_signature_encoding(data) and data[-1] in SIGHASH_TYPE_NAMES:
+            parts.append(data[:-1].hex() + "[" + SIGHASH_TYPE_NAMES[data[-1]] + "]")
+        else:
+            parts.append(data.hex())
+    return " ".join(parts)
+
+
+def script_pub_key_to_asm(script: bytes, script_type: str) -> str:
+    """script_to_asm with the fixed layouts of the common output types filled in directly."""
+    if script_type == "pubkeyhash":
+        return "OP_DUP OP_HASH160 " + script[3:23].hex() + " OP_EQUALVERIFY OP_CHECKSIG"
+    if script_type == "scripthash":
+        return "OP_HASH160 " + script[2:22].hex() + " OP_EQUAL"
+    if script_type in ("witness_v0_keyhash", "witness_v0_scripthash", "witness_v1_taproot"):
+        return ("0 " if script[0] == OP_0 else "1 ") + script[2:].hex()
+    return script_to_asm(script)
+
+
+def is_valid_pubkey_size(data: bytes) -> bool:
+    if not data:
+        return False
+    if data[0] in (2, 3):
+        return len(data) == 33
+    if data[0] in (4, 6, 7):
+        return len(data) == 65
+    return False
+
+
+def is_minimal_push(data: bytes, opcode: int) -> bool:
+    if len(data) == 0:
+        return opcode == OP_0
+    if len(data) == 1 and 1 <= data[0] <= 16:
+        return False
+    if len(data) == 1 and data[0] == 0x81:
+        return False
+    if len(data) <= 75:
+        return opcode == len(data)
+    if len(data) <= 255:
+        return opcode == OP_PUSHDATA1
+    if len(data) <= 65535:
+        return opcode == OP_PUSHDATA2
+    return True
+
+
+def get_multisig_number(opcode: int, data: Optional[bytes], min_value: int, max_value: int) -> Optional[int]:
+    if OP_1 <= opcode <= OP_16:
+        value = opcode - OP_1 + 1
+    elif data is not None:
+        if not is_minimal_push(data, opcode) or len(data) > 4:
+            return None
+        if data and not data[-1] & 0x7f and (len(data) <= 1 or not data[-2] & 0x80):
+            return None
+        value = decode_script_num(data)
+    else:
+        return None
+    return value if min_value <= value <= max_value else None
+
+
+def is_multisig(script: bytes) -> bool:
+    if not script or script[-1] != OP_CHECKMULTISIG:
+        return False
+    op = get_script_op(script, 0)
+    if op is None:
+        return False
+    opcode, data, offset = op
+    required_sigs = get_multisig_number(opcode, data, 1, MAX_PUBKEYS_PER_MULTISIG)
+    if required_sigs is None:
+        return False
+
+    num_pubkeys = 0
+    while offset < len(script):
+        op = get_script_op(script, offset)
+        if op is None:
+            return False
+        opcode, data, offset = op
+        if data is None or not is_valid_pubkey_size(data):
+            break
+        num_pubkeys += 1
+    else:
+        return False
+
+    num_keys = get_multisig_number(opcode, data, required_sigs, MAX_PUBKEYS_PER_MULTISIG)
+    return num_keys is not None and num_keys == num_pubkeys and offset + 1 == len(script)
+
+
+def is_push_only(script: bytes, offset: int = 0) -> bool:
+    while offset < len(script):
+        op = get_script_op(script, offset)
+        if op is None or op[0] > OP_16:
+            return False
+        offset = op[2]
+    return True
+
+
+def get_script_type(script: bytes) -> str:
+    """The scriptPubKey type bitcoind reports, e.g. pubkeyhash, witness_v1_taproot, nulldata or nonstandard."""
+    size = len(script)
+    if size == 23 and script[0] == OP_HASH160 and script[1] == 0x14 and script[22] == OP_EQUAL:
+        return "scripthash"
+    if 4 <= size <= 42 and (script[0] == OP_0 or OP_1 <= script[0] <= OP_16) and script[1] + 2 == size:
+        version = 0 if script[0] == OP_0 else script[0] - OP_1 + 1
+        program_size = size - 2
+        if version == 0 and program_size == 20:
+            return "witness_v0_keyhash"
+        if version == 0 and program_size == 32:
+            return "witness_v0_scripthash"
+        if version == 1 and program_size == 32:
+            return "witness_v1_taproot"
+        if version == 1 and script[2:] == b"\x4e\x73":
+            return "anchor"
+        if version != 0:
+            return "witness_unknown"
+        return "nonstandard"
+    if size >= 1 and script[0] == OP_RETURN and is_push_only(script, 1):
+        return "nulldata"
+    if (size == 35 and script[0] == 33 and script[34] == OP_CHECKSIG and is_valid_pubkey_size(script[1:34])) or \
+            (size == 67 and script[0] == 65 and script[66] == OP_CHECKSIG and is_valid_pubkey_size(script[1:66])):
+        return "pubkey"
+    if size == 25 and script[0] == OP_DUP and script[1] == OP_HASH160 and script[2] == 0x14 and script[23] == OP_EQUALVERIFY and script[24] == OP_CHECKSIG:
+        return "pubkeyhash"
+    if is_multisig(script):
+        return "multisig"
+    return "nonstandard"
@@ -0,0 +1,104 @@
+import math
+import mmap
+import os
+import struct
+from typing import Tuple
+
+import numpy as np
+
+# File layout: header (magic, bit count, hash count, entry count) followed by the bit array.
+# Positions use double hashing over the txid bytes, which are already uniformly distributed,
+# so the filter can be filled with vectorized numpy arithmetic straight from the index records.
+TX_OUT_FILTER_MAGIC = b"TXOFLT01"
+TX_OUT_FILTER_SUFFIX = ".filter"
+HEADER = struct.Struct("<8sQQQ")
+DEFAULT_FALSE_POSITIVE_RATE = 0.01
+VOUT_MULTIPLIER = 0x9E3779B97F4A7C15
+UINT64_MASK = (1 << 64) - 1
+
+
+def tx_out_filter_path(index_path: str) -> str:
+    return index_path + TX_OUT_FILTER_SUFFIX
+
+
+def get_filter_size(count: int, false_positive_rate: float) -> Tuple[int, int]:
+    """Bit and hash counts of a Bloom filter holding `count` entries at the given false positive rate."""
+    count = max(count, 1)
+    num_bits = math.ceil(-count * math.log(false_positive_rate) / math.log(2) ** 2)
+    num_bits = max(64, (num_bits + 7) // 8 * 8)
+    num_hashes = max(1, round(num_bits / count * math.log(2)))
+    return num_bits, num_hashes
+
+
+def get_key_hashes(key: bytes) -> Tuple[int, int]:
+    """Double hashing seeds of a tx_out key (txid bytes + big-endian vout), see TxOutFilter.add_hashes."""
+    h1 = int.from_bytes(key[0:8], "little") ^ ((int.from_bytes(key[32:36], "big") * VOUT_MULTIPLIER) & UINT64_MASK)
+    h2 = int.from_bytes(key[8:16], "little") | 1
+    return h1, h2
+
+
+class TxOutFilter:
+    """
+    Bloom filter over the outpoints of a tx_out snapshot.
+    A negative answer is definite, so lookups for outputs the snapshot does not hold can skip probing it.
+    """
+    def __init__(self, buffer, path: str = None):
+        self.path = path
+        self._buffer = buffer
+        magic, self.num_bits, self.num_hashes, self.count = HEADER.unpack_from(buffer, 0)
+        if magic != TX_OUT_FILTER_MAGIC:
+            raise ValueError(f"Invalid tx_out filter: {path}")
+
+    @classmethod
+    def create(cls, count: int, false_positive_rate: float = DEFAULT_FALSE_POSITIVE_RATE) -> "TxOutFilter":
+        num_bits, num_hashes = get_filter_size(count, false_positive_rate)
+        buffer = bytearray(HEADER.size + num_bits // 8)
+        HEADER.pack_into(buffer, 0, TX_OUT_FILTER_MAGIC, num_bits, num_hashes, 0)
+        return cls(buffer)
+
+    @classmethod
+    def open(cls, path: str) -> "TxOutFilter":
+        with open(path, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer, path)
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, key: Tuple[str, str]):
+        txn_id, vout_id = key
+        try:
+            key = bytes.fromhex(txn_id) + int(vout_id).to_bytes(4, "big")
+        except (ValueError, TypeError):
+            return False
+        return self.may_contain_key(key)
+
+    def may_contain_key(self, key: bytes) -> bool:
+        h1, h2 = get_key_hashes(key)
+        buffer = self._buffer
+        for i in range(self.num_hashes):
+            position = ((h1 + i * h2) & UINT64_MASK) % self.num_bits
+            if not buffer[HEADER.size + (position >> 3)] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add_hashes(self, h1: np.ndarray, h2: np.ndarray):
+        """Add entries given their uint64 hash seeds, as computed by get_key_hashes."""
+        bits = np.frombuffer(self._buffer, dtype=np.uint8, offset=HEADER.size, count=self.num_bits // 8)
+        num_bits = np.uint64(self.num_bits)
+        for i in range(self.num_hashes):
+            positions = (h1 + np.uint64(i) * h2) % num_bits
+            np.bitwise_or.at(bits, positions >> np.uint64(3), np.left_shift(1, positions & np.uint64(7)).astype(np.uint8))
+        self.count += len(h1)
+        HEADER.pack_into(self._buffer, 0, TX_OUT_FILTER_MAGIC, self.num_bits, self.num_hashes, self.count)
+
+    def save(self, path: str):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(self._buffer)
+        os.replace(tmp_path, path)
+        self.path = path
+
+    def close(self):
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
@@ -0,0 +1,198 @@
+import argparse
+import mmap
+import os
+import pickle
+import struct
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+from neurons.nodes.bitcoin.node_utils import get_tx_out_hash_table_sub_keys, initialize_tx_out_hash_table
+from neurons.setup_logger import setup_logger
+from neurons.setup_logger import logger_extra_data
+from neurons.nodes.bitcoin.tx_out_filter import DEFAULT_FALSE_POSITIVE_RATE, VOUT_MULTIPLIER, TxOutFilter, tx_out_filter_path
+
+indexlogger = setup_logger("TxOutIndex")
+
+# File layout (all integers little-endian unless noted):
+#   header        magic, record count, address count, address offsets offset, address blob offset
+#   fanout        65536 x uint64, number of records whose key starts with a 2-byte prefix <= i
+#   records       record count x (txid[32] + vout uint32 big-endian + address id uint32 + amount int64)
+#   addresses     (address count + 1) x uint64 offsets into the address blob, then the utf-8 blob
+# Records are sorted by key so that lookups are a fanout probe followed by a binary search.
+TX_OUT_INDEX_MAGIC = b"TXOIDX01"
+HEADER = struct.Struct("<8sQQQQ")
+FANOUT_SIZE = 1 << 16
+FANOUT_OFFSET = HEADER.size
+RECORDS_OFFSET = FANOUT_OFFSET + FANOUT_SIZE * 8
+KEY_SIZE = 36
+VALUE = struct.Struct("<Iq")
+RECORD_SIZE = KEY_SIZE + VALUE.size
+UINT64 = struct.Struct("<Q")
+ADDRESS_SPAN = struct.Struct("<QQ")
+# records viewed as the filter hash seeds: first and second 8 txid bytes, the vout, and the rest ignored
+RECORD_HASH_DTYPE = np.dtype({'names': ['h1', 'h2', 'vout'], 'formats': ['<u8', '<u8', '>u4'], 'offsets': [0, 8, 32], 'itemsize': RECORD_SIZE})
+
+
+def tx_out_key(txn_id: str, vout_id) -> bytes:
+    return bytes.fromhex(txn_id) + int(vout_id).to_bytes(4, "big")
+
+
+class TxOutIndex:
+    """
+    Read-only tx_out lookup table backed by a sorted, fixed-width index file.
+    The file is memory mapped, so opening it is instant and resident memory follows the OS page cache.
+    """
+    def __init__(self, buffer, path: str = None):
+        self.path = path
+        self._buffer = buffer
+        magic, self.record_count, self.address_count, self._address_offsets_offset, self._address_blob_offset = HEADER.unpack_from(buffer, 0)
+        if magic != TX_OUT_INDEX_MAGIC:
+            raise ValueError(f"Invalid tx_out index: {path}")
+
+    @classmethod
+    def open(cls, path: str) -> "TxOutIndex":
+        with open(path, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(buffer, "madvise"):
+            buffer.madvise(mmap.MADV_RANDOM)
+        return cls(buffer, path)
+
+    def __len__(self):
+        return self.record_count
+
+    def __contains__(self, key: Tuple[str, str]):
+        return self._find(tx_out_key(*key)) >= 0
+
+    def close(self):
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+    def _find(self, key: bytes) -> int:
+        buffer = self._buffer
+        prefix = (key[0] << 8) | key[1]
+        lo = UINT64.unpack_from(buffer, FANOUT_OFFSET + (prefix - 1) * 8)[0] if prefix else 0
+        hi = UINT64.unpack_from(buffer, FANOUT_OFFSET + prefix * 8)[0]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = RECORDS_OFFSET + mid * RECORD_SIZE
+            mid_key = buffer[offset:offset + KEY_SIZE]
+            if mid_key < key:
+                lo = mid + 1
+            elif mid_key > key:
+                hi = mid
+            else:
+                return offset
+        return -1
+
+    def get_address(self, address_id: int) -> str:
+        start, end = ADDRESS_SPAN.unpack_from(self._buffer, self._address_offsets_offset + address_id * 8)
+        start += self._address_blob_offset
+        end += self._address_blob_offset
+        return self._buffer[start:end].decode("utf-8")
+
+    def get(self, txn_id: str, vout_id: str) -> Optional[Tuple[str, int]]:
+        try:
+            key = tx_out_key(txn_id, vout_id)
+        except (ValueError, TypeError):
+            return None
+        offset = self._find(key)
+        if offset < 0:
+            return None
+        address_id, amount = VALUE.unpack_from(self._buffer, offset + KEY_SIZE)
+        return self.get_address(address_id), amount
+
+
+def write_tx_out_index(hash_table, path: str) -> int:
+    """
+    Write a tx_out hash table (as returned by initialize_tx_out_hash_table) to an index file.
+    Sub-keys are txid prefixes, so walking them in order only needs one sub-table sorted in memory at a time.
+    """
+    fanout = [0] * FANOUT_SIZE
+    address_ids = {}
+    address_blob_size = 0
+    record_count = 0
+    tmp_path = f"{path}.tmp"
+
+    with open(tmp_path, "wb") as file:
+        file.write(b"\x00" * RECORDS_OFFSET)
+        for sub_key in sorted(get_tx_out_hash_table_sub_keys()):
+            records = []
+            for (txn_id, vout_id), (address, amount) in hash_table[sub_key].items():
+                address_id = address_ids.get(address)
+                if address_id is None:
+                    address_id = address_ids[address] = len(address_ids)
+                records.append(tx_out_key(txn_id, vout_id) + VALUE.pack(address_id, int(amount)))
+            records.sort()
+            for record in records:
+                fanout[(record[0] << 8) | record[1]] += 1
+            file.write(b"".join(records))
+            record_count += len(records)
+
+        address_offsets_offset = file.tell()
+        encoded_addresses = [address.encode("utf-8") for address in address_ids]
+        offsets = [0]
+        for encoded_address in encoded_addresses:
+            address_blob_size += len(encoded_address)
+            offsets.append(address_blob_size)
+        file.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+        address_blob_offset = file.tell()
+        file.write(b"".join(encoded_addresses))
+
+        total = 0
+        for prefix in range(FANOUT_SIZE):
+            total += fanout[prefix]
+            fanout[prefix] = total
+        file.seek(0)
+        file.write(HEADER.pack(TX_OUT_INDEX_MAGIC, record_count, len(address_ids), address_offsets_offset, address_blob_offset))
+        file.write(struct.pack(f"<{FANOUT_SIZE}Q", *fanout))
+
+    os.replace(tmp_path, path)
+    return record_count
+
+
+def build_tx_out_filter(index: TxOutIndex, path: str, false_positive_rate: float = DEFAULT_FALSE_POSITIVE_RATE, chunk_size: int = 1 << 20) -> TxOutFilter:
+    """Build the Bloom filter of an index's outpoints, reading its records in chunks straight from the mapped file."""
+    tx_out_filter = TxOutFilter.create(len(index), false_positive_rate)
+    for start in range(0, len(index), chunk_size):
+        count = min(chunk_size, len(index) - start)
+        records = np.frombuffer(index._buffer, dtype=RECORD_HASH_DTYPE, count=count, offset=RECORDS_OFFSET + start * RECORD_SIZE)
+        h1 = records['h1'] ^ (records['vout'].astype(np.uint64) * np.uint64(VOUT_MULTIPLIER))
+        tx_out_filter.add_hashes(h1, records['h2'] | np.uint64(1))
+    tx_out_filter.save(path)
+    return tx_out_filter
+
+
+def build_tx_out_index_from_pickles(pickle_paths, path: str, false_positive_rate: float = DEFAULT_FALSE_POSITIVE_RATE) -> int:
+    hash_table = initialize_tx_out_hash_table()
+    for pickle_path in pickle_paths:
+        indexlogger.info(f"Loading tx_out hash table", extra = logger_extra_data(pickle_path = pickle_path))
+        with open(pickle_path, 'rb') as file:
+            pickled_hash_table = pickle.load(file)
+        for sub_key in get_tx_out_hash_table_sub_keys():
+            hash_table[sub_key].update(pickled_hash_table[sub_key])
+        del pickled_hash_table
+
+    start_time = time.time()
+    record_count = write_tx_out_index(hash_table, path)
+    indexlogger.info(f"Successfully built tx_out index", extra = logger_extra_data(index_path = path, record_count = record_count, time_taken = time.time() - start_time))
+
+    start_time = time.time()
+    index = TxOutIndex.open(path)
+    try:
+        tx_out_filter = build_tx_out_filter(index, tx_out_filter_path(path), false_positive_rate)
+    finally:
+        index.close()
+    indexlogger.info(f"Successfully built tx_out filter", extra = logger_extra_data(filter_path = tx_out_filter.path, num_bits = tx_out_filter.num_bits, num_hashes = tx_out_filter.num_hashes, time_taken = time.time() - start_time))
+    return record_count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert pickled tx_out hash tables into a memory-mapped tx_out index")
+    parser.add_argument("--pickles", required=True, help="Comma separated list of tx_out hash table pickles")
+    parser.add_argument("--output", required=True, help="Path of the tx_out index file to write")
+    parser.add_argument("--false-positive-rate", type=float, default=DEFAULT_FALSE_POSITIVE_RATE, help="False positive rate of the tx_out filter written beside the index")
+    args = parser.parse_args()
+
+    build_tx_out_index_from_pickles([pickle_path for pickle_path in args.pickles.split(',') if pickle_path], args.output, args.false_positive_rate)
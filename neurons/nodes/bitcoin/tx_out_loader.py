@@ -0,0 +1,166 @@
+import multiprocessing
+import os
+import pickle
+import queue
+import time
+from typing import List
+
+import numpy as np
+
+from neurons.nodes.bitcoin.node_utils import get_tx_out_hash_table_sub_keys
+from neurons.nodes.bitcoin.tx_out_table import AddressInterner, build_tx_out_columns
+from neurons.setup_logger import setup_logger
+from neurons.setup_logger import logger_extra_data
+
+indexlogger = setup_logger("TxOutLoader")
+
+# An unpickled tx_out hash table takes roughly this many times its pickle size in memory
+SHARD_MEMORY_FACTOR = 4
+PROGRESS_LOG_INTERVAL = 10  # seconds between per-shard progress logs
+# bytes of one entry in a chunk on its way to the parent: the four columns plus a share of the new addresses
+CHUNK_ENTRY_BYTES = 48 + 64
+# an address string interned by the parent, with its dict and list slots
+INTERNED_ADDRESS_BYTES = 150
+
+
+def estimate_shard_memory(pickle_path: str) -> int:
+    return os.path.getsize(pickle_path) * SHARD_MEMORY_FACTOR
+
+
+def _load_shard(pickle_path: str, chunk_queue, chunk_size: int):
+    try:
+        start_time = time.time()
+        with open(pickle_path, 'rb') as file:
+            hash_table = pickle.load(file)
+        chunk_queue.put(("loaded", pickle_path, time.time() - start_time))
+
+        # the worker does the per-entry work (hex decoding, address interning, column building) and sends finished
+        # columns; its address ids are local, each chunk carries the addresses it introduced
+        addresses = AddressInterner()
+        sent_addresses = 0
+        count = 0
+
+        def send(chunk):
+            nonlocal sent_addresses
+            columns = build_tx_out_columns(chunk, addresses)
+            new_addresses = [addresses.get(address_id) for address_id in range(sent_addresses, len(addresses))]
+            sent_addresses = len(addresses)
+            chunk_queue.put(("chunk", pickle_path, (columns, new_addresses)))
+
+        chunk = []
+        for sub_key in get_tx_out_hash_table_sub_keys():
+            # release each sub table once it is queued so the worker shrinks while it streams
+            for (txn_id, vout_id), (address, amount) in hash_table.pop(sub_key).items():
+                chunk.append((txn_id, vout_id, address, amount))
+                if len(chunk) >= chunk_size:
+                    send(chunk)
+                    count += len(chunk)
+                    chunk = []
+        if chunk:
+            send(chunk)
+            count += len(chunk)
+        chunk_queue.put(("done", pickle_path, count))
+    except Exception as e:
+        chunk_queue.put(("error", pickle_path, f"{e.__class__.__name__}: {e}"))
+
+
+class _ShardProgress:
+    def __init__(self, pickle_path: str, estimated_memory: int):
+        self.pickle_path = pickle_path
+        self.estimated_memory = estimated_memory
+        self.start_time = time.time()
+        self.last_log_time = self.start_time
+        self.entries = 0
+        self.address_ids = np.empty(1024, dtype=np.uint32) # worker address id -> table address id
+        self.address_count = 0
+
+    def add_addresses(self, address_ids: np.ndarray):
+        end = self.address_count + len(address_ids)
+        if end > len(self.address_ids):
+            address_ids_grown = np.empty(max(end, 2 * len(self.address_ids)), dtype=np.uint32)
+            address_ids_grown[:self.address_count] = self.address_ids[:self.address_count]
+            self.address_ids = address_ids_grown
+        self.address_ids[self.address_count:end] = address_ids
+        self.address_count = end
+
+
+def load_tx_out_shards(tx_out_table, pickle_paths: List[str], max_workers: int = None, memory_limit: int = None, chunk_size: int = 100000, max_queued_chunks: int = 8):
+    """
+    Load tx_out hash table pickles in parallel worker processes into a CompactTxOutTable.
+
+    Each worker unpickles one shard and turns it into finished table columns, chunk_size entries at a time, so the
+    parent only interns addresses it has not seen from that worker, remaps address ids and merges all chunks once
+    at the end. At most max_queued_chunks chunks wait in the queue.
+    A new shard is only started while the estimate of the peak memory stays under memory_limit bytes: the parent's
+    columns twice (the final merge copies them) and its addresses, the queued chunks and the shards being loaded.
+    One shard is always allowed so loading makes progress.
+    """
+    if not hasattr(tx_out_table, "insert_columns"):
+        raise ValueError(f"Parallel tx_out loading needs a compact tx_out table, not {tx_out_table.__class__.__name__}")
+    max_workers = max_workers or os.cpu_count() or 1
+    pending = list(pickle_paths)
+    running = {}
+    chunk_queue = multiprocessing.Queue(maxsize=max_queued_chunks)
+    total_entries = 0
+    start_time = time.time()
+
+    def estimated_memory():
+        worker_memory = sum(progress.estimated_memory for _, progress in running.values())
+        parent_memory = 2 * tx_out_table.nbytes + len(tx_out_table.addresses) * INTERNED_ADDRESS_BYTES
+        return parent_memory + max_queued_chunks * chunk_size * CHUNK_ENTRY_BYTES + worker_memory
+
+    def start_shards():
+        while pending and len(running) < max_workers:
+            shard_memory = estimate_shard_memory(pending[0])
+            if running and memory_limit and estimated_memory() + shard_memory > memory_limit:
+                break
+            pickle_path = pending.pop(0)
+            process = multiprocessing.Process(target=_load_shard, args=(pickle_path, chunk_queue, chunk_size), daemon=True)
+            process.start()
+            running[pickle_path] = (process, _ShardProgress(pickle_path, shard_memory))
+            indexlogger.info(f"Loading tx_out shard", extra = logger_extra_data(pickle_path = pickle_path, estimated_memory = shard_memory, running_shards = len(running)))
+
+    try:
+        with tx_out_table.bulk_load():
+            start_shards()
+            while running:
+                try:
+                    message, pickle_path, payload = chunk_queue.get(timeout=1)
+                except queue.Empty:
+                    for pickle_path, (process, _) in running.items():
+                        # a worker flushes its queue before exiting, so a dead worker with nothing queued has crashed
+                        if not process.is_alive() and chunk_queue.empty():
+                            raise Exception(f"tx_out shard loader exited unexpectedly: {pickle_path} (exit code {process.exitcode})")
+                    continue
+
+                process, progress = running[pickle_path]
+                if message == "loaded":
+                    indexlogger.info(f"Unpickled tx_out shard", extra = logger_extra_data(pickle_path = pickle_path, time_taken = payload))
+                elif message == "chunk":
+                    (txids, vout_ids, address_ids, amounts), new_addresses = payload
+                    progress.add_addresses(tx_out_table.intern_addresses(new_addresses))
+                    tx_out_table.insert_columns(txids, vout_ids, progress.address_ids[address_ids], amounts)
+                    progress.entries += len(txids)
+                    now = time.time()
+                    if now - progress.last_log_time >= PROGRESS_LOG_INTERVAL:
+                        progress.last_log_time = now
+                        indexlogger.info(f"Loading tx_out shard progress", extra = logger_extra_data(pickle_path = pickle_path, entries = progress.entries, entries_per_second = progress.entries / (now - progress.start_time)))
+                elif message == "done":
+                    process.join()
+                    del running[pickle_path]
+                    total_entries += progress.entries
+                    time_taken = time.time() - progress.start_time
+                    indexlogger.info(f"Successfully loaded tx_out shard", extra = logger_extra_data(pickle_path = pickle_path, entries = progress.entries, time_taken = time_taken, entries_per_second = progress.entries / max(time_taken, 1e-9)))
+                    start_shards()
+                elif message == "error":
+                    raise Exception(f"Failed to load tx_out shard {pickle_path}: {payload}")
+    finally:
+        for process, _ in running.values():
+            process.terminate()
+        for process, _ in running.values():
+            process.join()
+        chunk_queue.close()
+
+    time_taken = time.time() - start_time
+    indexlogger.info(f"Successfully loaded tx_out shards", extra = logger_extra_data(shards = len(pickle_paths), entries = total_entries, time_taken = time_taken, entries_per_second = total_entries / max(time_taken, 1e-9)))
+    return total_entries
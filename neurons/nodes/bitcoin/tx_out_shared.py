@@ -0,0 +1,95 @@
+import fcntl
+import json
+import os
+import time
+from contextlib import contextmanager
+
+from neurons.nodes.bitcoin.tx_out_filter import DEFAULT_FALSE_POSITIVE_RATE, tx_out_filter_path
+from neurons.nodes.bitcoin.tx_out_index import build_tx_out_index_from_pickles
+from neurons.setup_logger import setup_logger
+from neurons.setup_logger import logger_extra_data
+
+indexlogger = setup_logger("SharedTxOutIndex")
+
+DEFAULT_SHARED_TX_OUT_INDEX_PATH = "/dev/shm/bitcoin_tx_out.idx"
+
+
+def shared_tx_out_manifest_path(index_path: str) -> str:
+    return f"{index_path}.manifest"
+
+
+def get_pickles_fingerprint(pickle_paths):
+    """Identity of the pickles an index is built from, so an index built from other or since modified pickles is rebuilt."""
+    fingerprint = []
+    for pickle_path in pickle_paths:
+        stat = os.stat(pickle_path)
+        fingerprint.append({"path": os.path.abspath(pickle_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns})
+    return fingerprint
+
+
+def is_published(index_path: str, fingerprint=None) -> bool:
+    """Whether a complete index (manifest, index and filter) is published; with a fingerprint, built from those pickles."""
+    try:
+        with open(shared_tx_out_manifest_path(index_path)) as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return False
+    if fingerprint is not None and manifest.get("pickles") != fingerprint:
+        return False
+    return os.path.exists(index_path) and os.path.exists(tx_out_filter_path(index_path))
+
+
+def publish_tx_out_index(pickle_paths, index_path: str, fingerprint, false_positive_rate: float = DEFAULT_FALSE_POSITIVE_RATE):
+    """Build the index and filter, then write the manifest last: readers only trust an index once its manifest matches."""
+    start_time = time.time()
+    manifest_path = shared_tx_out_manifest_path(index_path)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    record_count = build_tx_out_index_from_pickles(pickle_paths, index_path, false_positive_rate)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump({"pickles": fingerprint, "record_count": record_count, "built_at": time.time(), "pid": os.getpid()}, file)
+    os.replace(tmp_path, manifest_path)
+    indexlogger.info(f"Published shared tx_out index", extra = logger_extra_data(index_path = index_path, record_count = record_count, time_taken = time.time() - start_time))
+
+
+@contextmanager
+def shared_tx_out_index(pickle_paths, index_path: str = DEFAULT_SHARED_TX_OUT_INDEX_PATH, false_positive_rate: float = DEFAULT_FALSE_POSITIVE_RATE):
+    """
+    Make sure the tx_out pickles are published once per host as a TxOutIndex (and its filter) at index_path,
+    and yield whether an index is available there.
+    Every BitcoinNode on the host calls this with the same path, usually on /dev/shm: the first to take the exclusive
+    lock on index_path.lock builds the index while the others wait on a shared lock, then all of them map the same
+    file read-only, so N processes share one copy of the table through the page cache.
+    Without pickle_paths nothing is built and whatever index another process published is used.
+    The shared lock is held inside the with block so the files are not replaced while they are being opened;
+    a rebuild later only swaps in new files, mappings opened before keep the old ones.
+    """
+    directory = os.path.dirname(index_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fingerprint = get_pickles_fingerprint(pickle_paths) if pickle_paths else None
+    with open(f"{index_path}.lock", "a") as lock_file:
+        while True:
+            fcntl.flock(lock_file, fcntl.LOCK_SH)
+            if is_published(index_path, fingerprint) or not pickle_paths:
+                try:
+                    yield is_published(index_path, fingerprint)
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                return
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # another process is building it, or briefly holds the shared lock to check; the shared lock
+                # taken next blocks until a loader is done
+                indexlogger.info(f"Waiting for another process to publish the shared tx_out index", extra = logger_extra_data(index_path = index_path))
+                time.sleep(0.1)
+                continue
+            try:
+                if not is_published(index_path, fingerprint):
+                    publish_tx_out_index(pickle_paths, index_path, fingerprint, false_positive_rate)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,336 @@
+import argparse
+import contextlib
+import gc
+import threading
+import tracemalloc
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+from neurons.nodes.bitcoin.node_utils import get_tx_out_hash_table_sub_keys, initialize_tx_out_hash_table
+
+TX_OUT_TABLE_ENGINE_HASH = "hash"
+TX_OUT_TABLE_ENGINE_COMPACT = "compact"
+
+
+class AddressInterner:
+    """Stores each distinct address once and hands out dense uint32 ids for it."""
+    def __init__(self):
+        self._ids = {}
+        self._addresses = []
+
+    def __len__(self):
+        return len(self._addresses)
+
+    def intern(self, address: str) -> int:
+        address_id = self._ids.get(address)
+        if address_id is None:
+            address_id = len(self._addresses)
+            self._addresses.append(address)
+            self._ids[address] = address_id
+        return address_id
+
+    def get(self, address_id: int) -> str:
+        return self._addresses[address_id]
+
+
+class HashTxOutTable:
+    """The original tx_out hash table: 4096 dicts keyed by (txid, vout_id) and split on the txid prefix."""
+    def __init__(self, hash_table=None):
+        self.hash_table = hash_table if hash_table is not None else initialize_tx_out_hash_table()
+
+    def __len__(self):
+        return sum(len(sub_table) for sub_table in self.hash_table.values())
+
+    def get(self, txn_id: str, vout_id: str) -> Optional[Tuple[str, int]]:
+        sub_table = self.hash_table.get(txn_id[:3])
+        if sub_table is None:
+            return None
+        return sub_table.get((txn_id, vout_id))
+
+    def insert(self, txn_id: str, vout_id: str, address: str, amount: int):
+        self.hash_table[txn_id[:3]][(txn_id, vout_id)] = (address, amount)
+
+    def insert_many(self, entries: Iterable[Tuple[str, str, str, int]]):
+        for txn_id, vout_id, address, amount in entries:
+            self.hash_table[txn_id[:3]][(txn_id, vout_id)] = (address, amount)
+
+    def update(self, hash_table):
+        for sub_key in get_tx_out_hash_table_sub_keys():
+            self.hash_table[sub_key].update(hash_table[sub_key])
+
+    @contextlib.contextmanager
+    def bulk_load(self):
+        yield self
+
+
+class _CompactSegment:
+    """Immutable sorted arrays; replaced as a whole on compaction so readers never see a partial merge."""
+    def __init__(self, txids, vout_ids, address_ids, amounts):
+        self.txids = txids
+        self.vout_ids = vout_ids
+        self.address_ids = address_ids
+        self.amounts = amounts
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty(0, dtype="S32"), np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.int64))
+
+    def __len__(self):
+        return len(self.txids)
+
+    @property
+    def nbytes(self):
+        return self.txids.nbytes + self.vout_ids.nbytes + self.address_ids.nbytes + self.amounts.nbytes
+
+    def find(self, txid: bytes, vout_id: int) -> int:
+        lo = int(np.searchsorted(self.txids, txid, side="left"))
+        hi = int(np.searchsorted(self.txids, txid, side="right"))
+        for row in range(lo, hi):
+            if self.vout_ids[row] == vout_id:
+                return row
+        return -1
+
+
+def build_tx_out_columns(entries, addresses: AddressInterner):
+    """
+    CompactTxOutTable columns (binary txids, vout ids, address ids, amounts) for (txn_id, vout_id, address, amount)
+    entries, with the address ids handed out by addresses.
+    """
+    count = len(entries)
+    if not count:
+        segment = _CompactSegment.empty()
+        return segment.txids, segment.vout_ids, segment.address_ids, segment.amounts
+    txn_ids, vout_ids, entry_addresses, amounts = zip(*entries)
+    # one hex decode for the whole chunk instead of one per entry
+    txids = bytes.fromhex("".join(txn_ids))
+    if len(txids) != 32 * count:
+        raise ValueError("tx_out txids must be 64 hex characters")
+    return (
+        np.frombuffer(txids, dtype="S32"),
+        np.fromiter(map(int, vout_ids), dtype=np.uint32, count=count),
+        np.fromiter(map(addresses.intern, entry_addresses), dtype=np.uint32, count=count),
+        np.fromiter(map(int, amounts), dtype=np.int64, count=count),
+    )
+
+
+class CompactTxOutTable:
+    """
+    Array-backed tx_out table with the same lookup API as HashTxOutTable.
+    Entries live in sorted NumPy columns (32-byte binary txid, uint32 vout id, uint32 address id, int64 amount)
+    and addresses are interned, so there are no per-entry Python objects. Inserts go to a small dict that is
+    merged into the sorted columns once it reaches delta_limit entries.
+    """
+    def __init__(self, delta_limit: int = 100000):
+        self.delta_limit = delta_limit
+        self.addresses = AddressInterner()
+        self._segment = _CompactSegment.empty()
+        self._delta = {}
+        self._delta_overlap = 0 # delta entries that replace a row of the segment
+        self._bulk_segments = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._segment) + len(self._delta) - self._delta_overlap
+
+    @property
+    def nbytes(self):
+        """Bytes of the column arrays, including chunks collected by bulk_load and not merged yet."""
+        return self._segment.nbytes + sum(segment.nbytes for segment in self._bulk_segments or ())
+
+    def get(self, txn_id: str, vout_id: str) -> Optional[Tuple[str, int]]:
+        try:
+            txid = bytes.fromhex(txn_id)
+            vout = int(vout_id)
+        except (ValueError, TypeError):
+            return None
+        if len(txid) != 32:
+            return None
+
+        entry = self._delta.get((txid, vout))
+        if entry is not None:
+            address_id, amount = entry
+            return self.addresses.get(address_id), amount
+
+        segment = self._segment
+        row = segment.find(txid, vout)
+        if row < 0:
+            return None
+        return self.addresses.get(int(segment.address_ids[row])), int(segment.amounts[row])
+
+    def insert(self, txn_id: str, vout_id: str, address: str, amount: int):
+        with self._lock:
+            self._put(bytes.fromhex(txn_id), int(vout_id), self.addresses.intern(address), int(amount))
+
+    def insert_many(self, entries: Iterable[Tuple[str, str, str, int]]):
+        with self._lock:
+            if self._bulk_segments is not None:
+                self._bulk_segments.append(self._build_segment(list(entries)))
+                return
+            for txn_id, vout_id, address, amount in entries:
+                self._put(bytes.fromhex(txn_id), int(vout_id), self.addresses.intern(address), int(amount))
+
+    def _put(self, txid: bytes, vout: int, address_id: int, amount: int):
+        key = (txid, vout)
+        if key not in self._delta and self._segment.find(txid, vout) >= 0:
+            self._delta_overlap += 1
+        self._delta[key] = (address_id, amount)
+        if len(self._delta) >= self.delta_limit:
+            self._compact()
+
+    @contextlib.contextmanager
+    def bulk_load(self):
+        """Collect insert_many chunks unsorted and merge them once on exit instead of once per delta_limit entries."""
+        with self._lock:
+            self._bulk_segments = []
+        try:
+            yield self
+        finally:
+            with self._lock:
+                segments, self._bulk_segments = self._bulk_segments, None
+                if segments:
+                    self._compact()
+                    self._merge(_CompactSegment(
+                        np.concatenate([segment.txids for segment in segments]),
+                        np.concatenate([segment.vout_ids for segment in segments]),
+                        np.concatenate([segment.address_ids for segment in segments]),
+                        np.concatenate([segment.amounts for segment in segments]),
+                    ))
+
+    def _build_segment(self, entries) -> _CompactSegment:
+        return _CompactSegment(*build_tx_out_columns(entries, self.addresses))
+
+    def intern_addresses(self, addresses) -> np.ndarray:
+        """Table address ids of addresses, interning the new ones."""
+        with self._lock:
+            return np.fromiter((self.addresses.intern(address) for address in addresses), dtype=np.uint32, count=len(addresses))
+
+    def insert_columns(self, txids, vout_ids, address_ids, amounts):
+        """Insert entries given as build_tx_out_columns arrays whose address ids are already this table's."""
+        segment = _CompactSegment(txids, vout_ids, address_ids, amounts)
+        with self._lock:
+            if self._bulk_segments is not None:
+                self._bulk_segments.append(segment)
+            else:
+                self._compact()
+                self._merge(segment)
+
+    def update(self, hash_table):
+        count = sum(len(hash_table[sub_key]) for sub_key in get_tx_out_hash_table_sub_keys())
+        txids = np.empty(count, dtype="S32")
+        vout_ids = np.empty(count, dtype=np.uint32)
+        address_ids = np.empty(count, dtype=np.uint32)
+        amounts = np.empty(count, dtype=np.int64)
+
+        with self._lock:
+            row = 0
+            for sub_key in get_tx_out_hash_table_sub_keys():
+                for (txn_id, vout_id), (address, amount) in hash_table[sub_key].items():
+                    txids[row] = bytes.fromhex(txn_id)
+                    vout_ids[row] = int(vout_id)
+                    address_ids[row] = self.addresses.intern(address)
+                    amounts[row] = int(amount)
+                    row += 1
+            self._compact()
+            self._merge(_CompactSegment(txids, vout_ids, address_ids, amounts))
+
+    def compact(self):
+        with self._lock:
+            self._compact()
+
+    def _compact(self):
+        if not self._delta:
+            return
+        count = len(self._delta)
+        txids = np.empty(count, dtype="S32")
+        vout_ids = np.empty(count, dtype=np.uint32)
+        address_ids = np.empty(count, dtype=np.uint32)
+        amounts = np.empty(count, dtype=np.int64)
+        for row, ((txid, vout), (address_id, amount)) in enumerate(self._delta.items()):
+            txids[row] = txid
+            vout_ids[row] = vout
+            address_ids[row] = address_id
+            amounts[row] = amount
+        self._merge(_CompactSegment(txids, vout_ids, address_ids, amounts))
+        self._delta = {}
+        self._delta_overlap = 0
+
+    def _merge(self, segment: _CompactSegment):
+        # callers compact first: merged entries are newer than the delta, which lookups would otherwise prefer
+        current = self._segment
+        txids = np.concatenate((segment.txids, current.txids))
+        vout_ids = np.concatenate((segment.vout_ids, current.vout_ids))
+        # stable sort keeps the newer entry first for duplicated outpoints
+        order = np.lexsort((vout_ids, txids))
+        txids = txids[order]
+        vout_ids = vout_ids[order]
+        unique = np.ones(len(order), dtype=bool)
+        if len(order) > 1:
+            unique[1:] = (txids[1:] != txids[:-1]) | (vout_ids[1:] != vout_ids[:-1])
+        order = order[unique]
+        self._segment = _CompactSegment(
+            txids[unique],
+            vout_ids[unique],
+            np.concatenate((segment.address_ids, current.address_ids))[order],
+            np.concatenate((segment.amounts, current.amounts))[order],
+        )
+
+
+def create_tx_out_table(engine: str = TX_OUT_TABLE_ENGINE_HASH):
+    tx_out_table_class = {
+        TX_OUT_TABLE_ENGINE_HASH: HashTxOutTable,
+        TX_OUT_TABLE_ENGINE_COMPACT: CompactTxOutTable,
+    }.get(engine)
+
+    if tx_out_table_class is None:
+        raise ValueError(f"Unsupported tx_out table engine: {engine}")
+
+    return tx_out_table_class()
+
+
+def _generate_hash_table(num_entries: int, num_addresses: int):
+    # fresh string objects for every entry, the way pickle.load materializes them
+    hash_table = initialize_tx_out_hash_table()
+    for i in range(num_entries):
+        txn_id = f"{(i // 2) * 2654435761 % (1 << 256):064x}"
+        address = f"1BenchmarkAddress{(i * 7919) % num_addresses:017d}"
+        hash_table[txn_id[:3]][(txn_id, str(i % 2))] = (address, i * 1000)
+    return hash_table
+
+
+def measure_bytes_per_entry(num_entries: int = 1000000, num_addresses: int = None):
+    """Compare the traced memory of the dict-of-tuples layout with the compact layout for synthetic tx_outs."""
+    num_addresses = num_addresses or max(num_entries // 4, 1)
+    results = {}
+
+    gc.collect()
+    tracemalloc.start()
+    hash_table = _generate_hash_table(num_entries, num_addresses)
+    results[TX_OUT_TABLE_ENGINE_HASH] = tracemalloc.get_traced_memory()[0] / num_entries
+    tracemalloc.stop()
+    del hash_table
+
+    # the hash table is rebuilt under tracing so the interned address strings are counted
+    gc.collect()
+    tracemalloc.start()
+    hash_table = _generate_hash_table(num_entries, num_addresses)
+    compact_table = CompactTxOutTable()
+    compact_table.update(hash_table)
+    del hash_table
+    gc.collect()
+    results[TX_OUT_TABLE_ENGINE_COMPACT] = tracemalloc.get_traced_memory()[0] / num_entries
+    tracemalloc.stop()
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report tx_out table bytes per entry for the hash and compact engines")
+    parser.add_argument("--entries", type=int, default=1000000, help="Number of synthetic tx_outs")
+    parser.add_argument("--addresses", type=int, default=None, help="Number of distinct addresses (default: entries / 4)")
+    args = parser.parse_args()
+
+    results = measure_bytes_per_entry(args.entries, args.addresses)
+    for engine, bytes_per_entry in results.items():
+        print(f"{engine:>8}: {bytes_per_entry:8.1f} bytes/entry")
+    print(f"   ratio: {results[TX_OUT_TABLE_ENGINE_HASH] / results[TX_OUT_TABLE_ENGINE_COMPACT]:8.1f}x")
@@ -0,0 +1,73 @@
+import threading
+import time
+
+from neurons.setup_logger import setup_logger
+from neurons.setup_logger import logger_extra_data
+
+indexlogger = setup_logger("TxOutUpdater")
+
+
+class TxOutUpdater:
+    """
+    TxOutUpdater follows the chain tip and inserts the outputs of every new block into the node's tx_out table
+    It starts right after the snapshot height and keeps track of the last block it applied
+    so lookups for recent outputs hit the table instead of falling back to RPC
+    """
+    def __init__(self, node, start_block_height: int, interval=30, confirmations=0):
+        self.node = node # bitcoin node owning the tx_out table
+        self.interval = interval # seconds between polls of the chain tip
+        self.confirmations = confirmations # blocks to stay behind the tip
+        self.last_applied_height = start_block_height - 1
+        self.lock = threading.Lock() # serializes block application between the thread and catch_up callers
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.update, daemon=True)
+        self.thread.start()
+
+    def apply_block(self, block_height: int, block=None) -> int:
+        if block is None:
+            block = self.node.get_columnar_block_by_height(block_height)
+        if block is None:
+            raise Exception(f"Failed to fetch block {block_height}")
+
+        entries = list(block.iter_tx_outs())
+        self.node.tx_out_table.insert_many(entries)
+        self.last_applied_height = block_height
+        return len(entries)
+
+    def catch_up(self) -> int:
+        target_height = self.node.get_current_block_height()
+        if target_height is None:
+            return 0
+        target_height -= self.confirmations
+
+        applied = 0
+        with self.lock:
+            # the next blocks are fetched while one is applied
+            blocks = self.node.get_blocks(self.last_applied_height + 1, target_height, fetch=self.node.get_columnar_block_by_height)
+            start_time = time.time()
+            for block_height, block in blocks:
+                if self.stop_event.is_set():
+                    break
+                num_entries = self.apply_block(block_height, block)
+                applied += 1
+                indexlogger.info(f"Applied block to tx_out table", extra = logger_extra_data(block_height = block_height, tx_outs = num_entries, time_taken = time.time() - start_time, tx_out_hit_ratio = self.node.get_tx_out_hit_ratio(), rpc = self.node.get_rpc_stats()))
+                start_time = time.time()
+        return applied
+
+    def update(self):
+        while not self.stop_event.is_set():
+            try:
+                self.catch_up()
+            except Exception as e:
+                indexlogger.error(f"Failed to update tx_out table", extra = logger_extra_data(last_applied_height = self.last_applied_height, error = {'exception_type': e.__class__.__name__,'exception_message': str(e),'exception_args': e.args}))
+            self.stop_event.wait(self.interval)  # Wait for the specified interval
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()  # Wait for the thread to finish
+            self.thread = None
@@ -1,5 +1,6 @@
 from protocols.blockchain import NETWORK_BITCOIN, NETWORK_ETHEREUM
 from neurons.nodes.bitcoin.node import BitcoinNode
+from neurons.nodes.bitcoin.async_node import AsyncBitcoinNode
 
 
 class NodeFactory:
@@ -13,4 +14,16 @@ class NodeFactory:
         if node_class is None:
             raise ValueError(f"Unsupported network: {network}")
 
-        return node_class()
\ No newline at end of file
+        return node_class()
+
+    @classmethod
+    def create_async_node(cls, network: str, node=None):
+        async_node_class = {
+            NETWORK_BITCOIN: AsyncBitcoinNode,
+            # Add other networks and their corresponding classes as needed
+        }.get(network)
+
+        if async_node_class is None:
+            raise ValueError(f"Unsupported network: {network}")
+
+        return async_node_class(node)
\ No newline at end of file
@@ -166,6 +166,9 @@ class ValidatorConfig(RemoteConfig):
         self.version = None
         self.version_update = True
         self.balance_model_diff = 849008
+        self.funds_flow_challenge_pool_size = 8
+        self.funds_flow_challenge_tier_gap = 100000
+        self.balance_tracking_cross_validation_enabled = False
 
         self.config_url = os.getenv("VALIDATOR_REMOTE_CONFIG_URL", 'https://chaininsightsaiprod.blob.core.windows.net/validatorcfg/validator.json')
 
@@ -206,6 +209,9 @@ class ValidatorConfig(RemoteConfig):
         self.sample_size = self.get_config_value('sample_size', 256)
 
         self.balance_model_diff = self.get_config_value('balance_model_diff', 849008)
+        self.funds_flow_challenge_pool_size = self.get_config_value('funds_flow_challenge_pool_size', 8)
+        self.funds_flow_challenge_tier_gap = self.get_config_value('funds_flow_challenge_tier_gap', 100000)
+        self.balance_tracking_cross_validation_enabled = self.get_config_value('balance_tracking_cross_validation_enabled', False)
 
         return self
 
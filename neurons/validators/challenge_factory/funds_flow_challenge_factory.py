@@ -0,0 +1,130 @@
+import threading
+import random
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+from insights.protocol import Challenge
+from neurons import logger
+
+class FundsFlowChallengeFactory:
+    """
+    FundsFlowChallengeFactory keeps a pool of pre-generated funds flow challenges in the background
+    The chain is split into tiers of tier_gap blocks and each tier holds up to pool_size challenges
+    Challenges are handed out once and refilled asynchronously, so cross validation does not wait for block and transaction fetches
+    Challenges taken from recent blocks are checked against the current block hash and dropped after a reorg
+    The background refill only runs between start() and stop()
+    """
+    def __init__(self, node, tier_gap=100000, pool_size=8, interval=10, confirmations=6, reorg_depth=100):
+        self.node = node # blockchain node
+        self.tier_gap = tier_gap # a block height gap between tiers
+        self.pool_size = pool_size # challenges kept per tier
+        self.interval = interval # seconds to wait once every tier is full or after a failure
+        self.confirmations = confirmations # blocks to stay behind the tip
+        self.reorg_depth = reorg_depth # challenges from blocks this close to the tip are checked against the current block hash
+        self.latest_block_height = None
+        self.challenges: Dict[int, deque] = {} # tier -> deque of (challenge, expected txn id, block height, block hash)
+        self.lock = threading.Lock()  # Lock for synchronizing access to 'challenges'
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.update, daemon=True)
+        self.thread.start()
+
+    def get_tier_range(self, tier: int) -> Tuple[int, int]:
+        return tier * self.tier_gap, min(self.latest_block_height, (tier + 1) * self.tier_gap - 1)
+
+    def get_next_tier(self) -> Optional[int]:
+        """The tier with the fewest pooled challenges, or None when all are full."""
+        with self.lock:
+            counts = {tier: len(self.challenges.get(tier, ())) for tier in range(self.latest_block_height // self.tier_gap + 1)}
+        tier = min(counts, key=counts.get)
+        return tier if counts[tier] < self.pool_size else None
+
+    def is_block_current(self, block_height: int, block_hash: str) -> bool:
+        if self.latest_block_height is not None and block_height < self.latest_block_height - self.reorg_depth:
+            return True
+        return self.node.get_block_hash(block_height) == block_hash
+
+    def drop_reorged_challenges(self):
+        with self.lock:
+            recent = [
+                (tier, entry)
+                for tier, entries in self.challenges.items()
+                for entry in entries
+                if entry[2] >= self.latest_block_height - self.reorg_depth
+            ]
+        for tier, entry in recent:
+            _, _, block_height, block_hash = entry
+            if self.node.get_block_hash(block_height) != block_hash:
+                logger.info("Dropping reorged funds flow challenge", block_height=block_height, block_hash=block_hash)
+                with self.lock:
+                    try:
+                        self.challenges[tier].remove(entry)
+                    except ValueError:
+                        pass
+
+    def refill(self) -> bool:
+        """Generate one challenge for the emptiest tier; returns False when there is nothing to do."""
+        current_block_height = self.node.get_current_block_height()
+        if current_block_height is None:
+            return False
+        self.latest_block_height = current_block_height - self.confirmations
+        self.drop_reorged_challenges()
+
+        tier = self.get_next_tier()
+        if tier is None:
+            return False
+
+        start_block_height, last_block_height = self.get_tier_range(tier)
+        challenge, txn_id, block_height, block_hash = self.node.create_funds_flow_challenge_with_block(start_block_height, last_block_height)
+        with self.lock:
+            self.challenges.setdefault(tier, deque()).append((challenge, txn_id, block_height, block_hash))
+        return True
+
+    def update(self):
+        while not self.stop_event.is_set():
+            try:
+                if self.refill():
+                    continue
+            except Exception as e:
+                logger.error("Failed to generate funds flow challenge", error={'exception_type': e.__class__.__name__, 'exception_message': str(e), 'exception_args': e.args})
+            self.stop_event.wait(self.interval)  # Wait for the specified interval
+
+    def take(self, tier: int, start_block_height: int, last_block_height: int):
+        with self.lock:
+            entries = self.challenges.get(tier, ())
+            for entry in entries:
+                if start_block_height <= entry[2] <= last_block_height:
+                    entries.remove(entry)
+                    return entry
+        return None
+
+    def get_challenge(self, start_block_height: int, last_block_height: int) -> Optional[Tuple[Challenge, str]]:
+        """
+        A pooled challenge from a block within [start_block_height, last_block_height], or None if the pool has none.
+        The tier is picked from a random block in the range so challenges stay spread like inline generated ones.
+        """
+        block_height = random.randint(start_block_height, last_block_height)
+        first_tier = block_height // self.tier_gap
+        with self.lock:
+            other_tiers = [tier for tier in self.challenges if tier != first_tier]
+        random.shuffle(other_tiers)
+
+        for tier in [first_tier] + other_tiers:
+            while True:
+                entry = self.take(tier, start_block_height, last_block_height)
+                if entry is None:
+                    break
+                challenge, txn_id, block_height, block_hash = entry
+                if self.is_block_current(block_height, block_hash):
+                    return challenge, txn_id
+                logger.info("Dropping reorged funds flow challenge", block_height=block_height, block_hash=block_hash)
+        return None
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()  # Wait for the thread to finish
+            self.thread = None
@@ -1,6 +1,7 @@
 # The MIT License (MIT)
 # Copyright © 2023 Yuma Rao
 # Copyright © 2023 aph5nt
+import asyncio
 import concurrent
 import threading
 # Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
@@ -35,6 +36,7 @@ from neurons.remote_config import ValidatorConfig
 from neurons.nodes.factory import NodeFactory
 from neurons.storage import store_validator_metadata
 from neurons.validators.benchmark import BenchmarkValidator
+from neurons.validators.challenge_factory.funds_flow_challenge_factory import FundsFlowChallengeFactory
 from neurons.validators.scoring import Scorer
 from neurons.validators.uptime import MinerUptimeManager
 from neurons.validators.utils.metadata import Metadata
@@ -107,7 +109,21 @@ class Validator(BaseValidatorNeuron):
         self.validator_config = ValidatorConfig().load_and_get_config_values()
         networks = self.validator_config.get_networks()
         self.nodes = {network : NodeFactory.create_node(network) for network in networks}
+        # the same nodes for the event loop: forward awaits their RPC instead of blocking on it
+        self.async_nodes = {network: NodeFactory.create_async_node(network, self.nodes[network]) for network in networks}
         self.block_height_cache = {network: self.nodes[network].get_current_block_height() for network in networks}
+        self.funds_flow_challenge_factories = {
+            network: FundsFlowChallengeFactory(
+                self.nodes[network],
+                tier_gap=self.validator_config.funds_flow_challenge_tier_gap,
+                pool_size=self.validator_config.funds_flow_challenge_pool_size,
+            )
+            for network in networks
+        }
+        for node in self.nodes.values():
+            node.start()
+        for funds_flow_challenge_factory in self.funds_flow_challenge_factories.values():
+            funds_flow_challenge_factory.start()
 
         super(Validator, self).__init__(config)
         self.sync_validator()
@@ -118,10 +134,16 @@ class Validator(BaseValidatorNeuron):
         logger.info("Immunity period", immunity_period=immunity_period)
         self.miner_uptime_manager.immunity_period = immunity_period
 
-    def cross_validate(self, axon, node, start_block_height, last_block_height, balance_model_last_block):
+    async def cross_validate(self, axon, node, start_block_height, last_block_height, balance_model_last_block, funds_flow_challenge_factory=None):
         try:
             logger.info("Funds flow challenge started", miner_ip = axon.ip, miner_hotkey=axon.hotkey)
-            challenge, expected_response = node.create_funds_flow_challenge(start_block_height, last_block_height)
+            pooled_challenge = None
+            if funds_flow_challenge_factory is not None:
+                # a pooled challenge near the tip is checked against bitcoind before it is handed out
+                pooled_challenge = await asyncio.to_thread(funds_flow_challenge_factory.get_challenge, start_block_height, last_block_height)
+            if pooled_challenge is None:
+                pooled_challenge = await node.create_funds_flow_challenge(start_block_height, last_block_height)
+            challenge, expected_response = pooled_challenge
 
             response = self.dendrite.query(
                 axon,
@@ -140,35 +162,34 @@ class Validator(BaseValidatorNeuron):
                 logger.info("Cross validation failed", miner_hotkey=hotkey, reason="empty", miner_ip = response.axon.ip)
                 return False, 128
 
-            if not response.output == expected_response and not node.validate_funds_flow_challenge_response_output(challenge, response.output):
+            if not response.output == expected_response and not await node.validate_funds_flow_challenge_response_output(challenge, response.output):
                 logger.info("Cross validation failed",  miner_hotkey=hotkey, reason="expected_response", response_output=response.output, expected_output=expected_response, miner_ip = response.axon.ip)
                 return False, response_time
 
-            """ TEMPORARILY DISABLED
-            logger.info("Balance tracking challenge started", miner_hotkey=hotkey, miner_ip = response.axon.ip)
-            random_balance_tracking_block = randint(1, balance_model_last_block)
-            challenge, expected_response = node.create_balance_tracking_challenge(random_balance_tracking_block)
-            response = self.dendrite.query(
-                axon,
-                challenge,
-                deserialize=False,
-                timeout=self.validator_config.challenge_timeout,
-            )
+            if self.validator_config.balance_tracking_cross_validation_enabled:
+                logger.info("Balance tracking challenge started", miner_hotkey=hotkey, miner_ip = response.axon.ip)
+                random_balance_tracking_block = randint(1, balance_model_last_block)
+                challenge, expected_response = await node.create_balance_tracking_challenge(random_balance_tracking_block)
+                response = self.dendrite.query(
+                    axon,
+                    challenge,
+                    deserialize=False,
+                    timeout=self.validator_config.challenge_timeout,
+                )
 
-            if response is not None and response.output is None:
-                logger.info("Cross validation failed", miner_hotkey=hotkey, reason="output", miner_ip = response.axon.ip)
-                return False, 128
+                if response is not None and response.output is None:
+                    logger.info("Cross validation failed", miner_hotkey=hotkey, reason="output", miner_ip = response.axon.ip)
+                    return False, 128
 
-            if response is None or response.output is None:
-                logger.info("Cross validation failed", miner_hotkey=hotkey, reason="empty", miner_ip = response.axon.ip)
-                return False, 128
+                if response is None or response.output is None:
+                    logger.info("Cross validation failed", miner_hotkey=hotkey, reason="empty", miner_ip = response.axon.ip)
+                    return False, 128
 
-            response_time += response.dendrite.process_time
+                response_time += response.dendrite.process_time
 
-            if response.output != expected_response:
-                logger.info("Cross validation failed",  miner_hotkey=hotkey, miner_ip = response.axon.ip, reason="expected_response")
-                return False, response_time
-            """
+                if response.output != expected_response:
+                    logger.info("Cross validation failed",  miner_hotkey=hotkey, miner_ip = response.axon.ip, reason="expected_response")
+                    return False, response_time
 
             logger.info("Cross validation passed", miner_hotkey=hotkey, miner_ip = response.axon.ip)
 
@@ -218,7 +239,7 @@ class Validator(BaseValidatorNeuron):
             return False
         return True
 
-    def get_reward(self, response: Discovery, uid: int, benchmarks_result):
+    async def get_reward(self, response: Discovery, uid: int, benchmarks_result):
         try:
             hotkey = response.axon.hotkey
             uid_value = int(uid) if isinstance(uid, np.ndarray) and uid.size == 1 else int(uid)
@@ -252,14 +273,14 @@ class Validator(BaseValidatorNeuron):
                 logger.info("Reward failed", miner_uid = uid_value, miner_hotkey=hotkey, miner_ip = response.axon.ip, reason="models_not_synced", score=0, balance_model_last_block=balance_model_last_block, last_block_height=last_block_height, diff=abs(balance_model_last_block - last_block_height), balance_model_diff=self.validator_config.balance_model_diff)
                 return 0
 
-            result, average_ping_time = ping(response.axon.ip, response.axon.port, attempts=10)
+            result, average_ping_time = await asyncio.to_thread(ping, response.axon.ip, response.axon.port, attempts=10)
             if not result:
                 logger.info("Ping Test failed", miner_uid = uid_value, miner_hotkey=hotkey, miner_ip = response.axon.ip, reason="ping_test_failed")
             else:
                 logger.info("Ping Test passed", miner_uid = uid_value, miner_hotkey=hotkey, miner_ip = response.axon.ip, average_ping_time=average_ping_time)
 
             logger.info("Cross validation started", miner_uid = uid_value, miner_hotkey=hotkey, miner_ip = response.axon.ip)
-            cross_validation_result, _ = self.cross_validate(response.axon, self.nodes[network], start_block_height, last_block_height, balance_model_last_block)
+            cross_validation_result, _ = await self.cross_validate(response.axon, self.async_nodes[network], start_block_height, last_block_height, balance_model_last_block, self.funds_flow_challenge_factories.get(network))
             if cross_validation_result is None or not cross_validation_result:
                 self.miner_uptime_manager.down(uid_value, hotkey)
                 logger.info("Reward failed", miner_uid = uid_value, miner_hotkey=hotkey, miner_ip = response.axon.ip, reason="cross_validation_failed", score=0)
@@ -348,9 +369,13 @@ class Validator(BaseValidatorNeuron):
             max_time_response += 0.1
         return min_time_response, max_time_response
     
+    async def get_block_heights(self):
+        block_heights = await asyncio.gather(*(self.async_nodes[network].get_current_block_height() for network in self.networks))
+        return dict(zip(self.networks, block_heights))
+
     async def forward(self):
         try:
-            self.block_height_cache = {network: self.nodes[network].get_current_block_height() for network in self.networks}
+            self.block_height_cache = await self.get_block_heights()
 
             uids = next(self.uid_batch_generator, None)
             if uids is None:
@@ -370,11 +395,12 @@ class Validator(BaseValidatorNeuron):
             benchmarks_result = self.benchmark_validator.run_benchmarks(responses_to_benchmark)
             self.update_scorer_config(benchmarks_result, responses)
 
-            self.block_height_cache = {network: self.nodes[network].get_current_block_height() for network in self.networks}
+            self.block_height_cache = await self.get_block_heights()
 
-            rewards = [
+            # the miners of the batch are cross validated concurrently, their challenges share the node's RPC limit
+            rewards = await asyncio.gather(*(
                 self.get_reward(response, uid, benchmarks_result) for response, uid in zip(responses, uids)
-            ]
+            ))
 
             filtered_data = [(reward, uid) for reward, uid in zip(rewards, uids) if reward is not None]
 
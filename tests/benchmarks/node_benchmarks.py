@@ -0,0 +1,219 @@
+"""
+Micro and macro benchmarks of the BitcoinNode hot paths, run on the recorded fixtures against FakeBitcoind.
+
+    python -m tests.benchmarks.node_benchmarks --output benchmarks.json
+    python -m tests.benchmarks.node_benchmarks --baseline benchmarks.json --max-regression 0.2
+
+Each benchmark reports the per-call time of its best, median and mean round. With --baseline the exit status is 1
+when any benchmark's best time is more than max-regression slower than in the baseline file.
+"""
+import argparse
+import datetime
+import json
+import logging
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from neurons import logger
+from neurons.nodes.bitcoin.node import BitcoinNode
+from neurons.nodes.bitcoin.node_utils import parse_block_data
+from neurons.nodes.bitcoin.rpc import decode_rpc_response
+from tests.nodes.fake_bitcoind import FakeBitcoind
+
+RESULTS_VERSION = 1
+BLOCK_HEIGHT = 1000000
+# spends outputs of the standalone fixture transactions and of the block's coinbase
+TXN_ID = "ffeb9c6f956055b66e864edb5189121e35a00e6ee5dc31b2d893713eafae0ef0"
+PREVIOUS_TXN_ID = "f4184fc596403b9d638783cf57adfe4c75c605f6356fbc91338530e9831e9e16"
+
+# name -> (setup, calls per round); setup(context) returns the function to time
+BENCHMARKS = {}
+
+
+def benchmark(name: str, number: int):
+    def register(setup):
+        BENCHMARKS[name] = (setup, number)
+        return setup
+    return register
+
+
+def decode(result):
+    """A fixture value as the node sees it after decode_rpc_response, i.e. with amounts in satoshis."""
+    return decode_rpc_response(json.dumps({"result": result, "error": None, "id": 1}).encode(), "application/json", 200, "OK")["result"]
+
+
+class BenchmarkContext:
+    """A BitcoinNode connected to a FakeBitcoind serving the fixtures."""
+    def __init__(self):
+        self.bitcoind = FakeBitcoind().start()
+        self.node = BitcoinNode(self.bitcoind.url)
+        self.node.balance_summary_store = None # always compute the balance tracking challenge
+        self.block_data = decode(self.bitcoind.getblock(self.bitcoind.getblockhash(BLOCK_HEIGHT), 2))
+        self.txn_data = decode(self.bitcoind.getrawtransaction(TXN_ID, True))
+
+    def clear_caches(self):
+        self.node.txn_cache.clear()
+        self.node.missing_txn_cache.clear()
+
+    def close(self):
+        self.node.rpc_pool.close()
+        self.bitcoind.stop()
+
+
+@benchmark("parse_block_data", number=2000)
+def bench_parse_block_data(context):
+    return lambda: parse_block_data(context.block_data)
+
+
+@benchmark("create_in_memory_txn", number=5000)
+def bench_create_in_memory_txn(context):
+    return lambda: context.node.create_in_memory_txn(context.txn_data)
+
+
+@benchmark("process_in_memory_txn_for_indexing", number=5000)
+def bench_process_in_memory_txn_for_indexing(context):
+    tx = context.node.create_in_memory_txn(context.txn_data)
+    outpoints = [(vin.tx_id, str(vin.vout_id)) for vin in tx.vins]
+    tx_outs = context.node.get_addresses_and_amounts_by_outpoints(outpoints)
+    return lambda: context.node.process_in_memory_txn_for_indexing(tx, tx_outs)
+
+
+@benchmark("get_address_and_amount_by_txn_id_and_vout_id[table_hit]", number=20000)
+def bench_tx_out_table_hit(context):
+    context.node.tx_out_table.insert(TXN_ID, "0", "1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa", 1000)
+    return lambda: context.node.get_address_and_amount_by_txn_id_and_vout_id(TXN_ID, "0")
+
+
+@benchmark("get_address_and_amount_by_txn_id_and_vout_id[rpc_miss]", number=200)
+def bench_tx_out_rpc_miss(context):
+    def run():
+        context.node.txn_cache.discard(PREVIOUS_TXN_ID)
+        return context.node.get_address_and_amount_by_txn_id_and_vout_id(PREVIOUS_TXN_ID, "1")
+    return run
+
+
+@benchmark("create_funds_flow_challenge", number=100)
+def bench_create_funds_flow_challenge(context):
+    random.seed(0)
+    def run():
+        context.clear_caches()
+        return context.node.create_funds_flow_challenge(BLOCK_HEIGHT, BLOCK_HEIGHT)
+    return run
+
+
+@benchmark("create_balance_tracking_challenge", number=100)
+def bench_create_balance_tracking_challenge(context):
+    def run():
+        context.clear_caches()
+        return context.node.create_balance_tracking_challenge(BLOCK_HEIGHT)
+    return run
+
+
+def time_benchmark(run, number: int, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        for _ in range(number):
+            run()
+        timings.append((time.perf_counter() - start_time) / number)
+    return {
+        "number": number,
+        "repeat": repeat,
+        "best": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.mean(timings),
+    }
+
+
+def get_git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(names=None, repeat: int = 5, scale: float = 1.0):
+    """
+    Results of the selected benchmarks as a JSON-serializable dict; scale multiplies the calls per round.
+    Every benchmark gets a context of its own, so what one's setup adds to the node cannot change another's timings.
+    """
+    # the challenge methods log every call, which would dominate the macro benchmarks' output
+    logging.disable(logging.INFO)
+    logger.disable("neurons")
+    try:
+        benchmarks = {}
+        for name, (setup, number) in BENCHMARKS.items():
+            if names and name not in names:
+                continue
+            context = BenchmarkContext()
+            try:
+                run = setup(context)
+                run() # warm up caches that are not reset between calls, e.g. the address LRU
+                benchmarks[name] = time_benchmark(run, max(1, int(number * scale)), repeat)
+            finally:
+                context.close()
+    finally:
+        logging.disable(logging.NOTSET)
+        logger.enable("neurons")
+    return {
+        "version": RESULTS_VERSION,
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "git_commit": get_git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "benchmarks": benchmarks,
+    }
+
+
+def compare_results(results, baseline, max_regression: float = 0.2):
+    """Per benchmark in both result sets: baseline and current best time, their ratio and ok / regression / improvement."""
+    comparison = {}
+    for name, result in results["benchmarks"].items():
+        baseline_result = baseline["benchmarks"].get(name)
+        if baseline_result is None:
+            continue
+        ratio = result["best"] / baseline_result["best"]
+        if ratio > 1 + max_regression:
+            status = "regression"
+        elif ratio < 1 / (1 + max_regression):
+            status = "improvement"
+        else:
+            status = "ok"
+        comparison[name] = {"baseline": baseline_result["best"], "current": result["best"], "ratio": ratio, "status": status}
+    return comparison
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the bitcoin node hot paths on the recorded fixtures")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare with the results in this JSON file")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Slowdown of the best time tolerated before a benchmark counts as a regression")
+    parser.add_argument("--repeat", type=int, default=5, help="Rounds per benchmark")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for the calls per round")
+    parser.add_argument("--benchmark", action="append", dest="names", choices=sorted(BENCHMARKS), help="Run only this benchmark, may be repeated")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.names, args.repeat, args.scale)
+    comparison = {}
+    if args.baseline:
+        with open(args.baseline) as file:
+            comparison = compare_results(results, json.load(file), args.max_regression)
+        results["comparison"] = comparison
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    for name, result in results["benchmarks"].items():
+        line = f"{name:<60} {result['best'] * 1e6:12.2f} us"
+        if name in comparison:
+            line += f"  {comparison[name]['ratio']:6.2f}x baseline  {comparison[name]['status']}"
+        print(line)
+    return 1 if any(entry["status"] == "regression" for entry in comparison.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
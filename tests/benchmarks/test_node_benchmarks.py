@@ -0,0 +1,53 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from tests.benchmarks.node_benchmarks import BENCHMARKS, compare_results, main, run_benchmarks
+
+
+class TestNodeBenchmarks(unittest.TestCase):
+
+    def test_runs_every_benchmark(self):
+        results = run_benchmarks(repeat=1, scale=0.01)
+        self.assertEqual(set(results["benchmarks"]), set(BENCHMARKS))
+        self.assertTrue(all(result["best"] > 0 for result in results["benchmarks"].values()))
+        json.dumps(results)
+
+    def test_benchmarks_do_not_share_a_node(self):
+        nodes = []
+        def setup(context):
+            nodes.append(context.node)
+            return lambda: context.node.tx_out_table.insert(f"{len(nodes):064x}", "0", "address", 1)
+        with patch.dict(BENCHMARKS, {"first": (setup, 1), "second": (setup, 1)}, clear=True):
+            run_benchmarks(repeat=1)
+        self.assertEqual(len(nodes), 2)
+        self.assertIsNone(nodes[1].tx_out_table.get(f"{1:064x}", "0"))
+
+    def test_compares_with_baseline(self):
+        baseline = {"benchmarks": {"fast": {"best": 1.0}, "slow": {"best": 1.0}, "same": {"best": 1.0}, "removed": {"best": 1.0}}}
+        results = {"benchmarks": {"fast": {"best": 0.5}, "slow": {"best": 1.5}, "same": {"best": 1.1}, "added": {"best": 1.0}}}
+        comparison = compare_results(results, baseline, max_regression=0.2)
+        self.assertEqual({name: entry["status"] for name, entry in comparison.items()}, {"fast": "improvement", "slow": "regression", "same": "ok"})
+
+    def test_exit_status_flags_regressions(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            baseline_path = os.path.join(tmp_dir, "baseline.json")
+            output_path = os.path.join(tmp_dir, "results.json")
+            args = ["--benchmark", "process_in_memory_txn_for_indexing", "--repeat", "1", "--scale", "0.01"]
+            self.assertEqual(main(args + ["--output", baseline_path]), 0)
+
+            with open(baseline_path) as file:
+                baseline = json.load(file)
+            baseline["benchmarks"]["process_in_memory_txn_for_indexing"]["best"] /= 100
+            with open(baseline_path, "w") as file:
+                json.dump(baseline, file)
+
+            self.assertEqual(main(args + ["--baseline", baseline_path, "--output", output_path]), 1)
+            with open(output_path) as file:
+                self.assertEqual(json.load(file)["comparison"]["process_in_memory_txn_for_indexing"]["status"], "regression")
+
+
+if __name__ == '__main__':
+    unittest.main()
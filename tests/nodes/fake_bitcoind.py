@@ -0,0 +1,263 @@
+import base64
+import copy
+import json
+import os
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from neurons.nodes.bitcoin.block_deserializer import deserialize_transaction_at, read_varint
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# bitcoind error codes
+RPC_METHOD_NOT_FOUND = -32601
+RPC_INVALID_PARAMETER = -8
+RPC_INVALID_ADDRESS_OR_KEY = -5
+
+
+def load_fixture(name: str):
+    with open(os.path.join(FIXTURES_DIR, name)) as file:
+        return json.load(file)
+
+
+def split_raw_transactions(raw_block: str):
+    """Serialized transactions of a raw block, as hex."""
+    data = bytes.fromhex(raw_block)
+    num_transactions, offset = read_varint(data, 80)
+    raw_transactions = []
+    for _ in range(num_transactions):
+        _, _, end = deserialize_transaction_at(data, offset, include_script_sig=False, include_script_pub_key=False)
+        raw_transactions.append(data[offset:end].hex())
+        offset = end
+    return raw_transactions
+
+
+class RpcError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class FakeBitcoind:
+    """
+    Local HTTP JSON-RPC server answering like bitcoind from recorded blocks (fixtures/blocks.json) and transactions
+    (fixtures/transactions.json): getblockcount, getbestblockhash, getblockhash, getblock at verbosity 0, 1 and 2 and
+    getrawtransaction, as single calls or batches, over keep-alive connections with basic auth.
+
+    To reproduce a struggling daemon, every request can be delayed by latency plus up to latency_jitter seconds,
+    fail with an HTTP 500 at error_rate, or be rejected like a full rpcworkqueue with an HTTP 503 at queue_full_rate
+    or whenever more than work_queue_depth requests are being handled at once.
+    stop() closes the open keep-alive connections like a restarting bitcoind; a new FakeBitcoind on the same port
+    takes over from a stopped one.
+    """
+    METHODS = frozenset({"getblockcount", "getbestblockhash", "getblockhash", "getblock", "getrawtransaction"})
+
+    def __init__(self, blocks=None, transactions=None, user: str = "bitcoinrpc", password: str = "rpcpassword",
+                 latency: float = 0.0, latency_jitter: float = 0.0, error_rate: float = 0.0, queue_full_rate: float = 0.0,
+                 work_queue_depth: int = None, seed: int = 0, port: int = 0):
+        blocks = load_fixture("blocks.json") if blocks is None else blocks
+        transactions = load_fixture("transactions.json") if transactions is None else transactions
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.queue_full_rate = queue_full_rate
+        self.work_queue_depth = work_queue_depth
+        self.authorization = "Basic " + base64.b64encode(f"{user}:{password}".encode("utf8")).decode("ascii")
+        self.requests = 0
+        self.calls = 0
+        self.errors = 0
+        self.rejections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.connections = 0 # connections accepted
+        self._open_connections = set()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self.block_hashes = {} # height -> hash
+        self.blocks = {} # hash -> fixture with block_height, raw and verbose
+        self.transactions = {} # txid -> (verbose transaction, raw hex or None, block fixture or None)
+        for block in blocks:
+            block_hash = block["verbose"]["hash"]
+            self.block_hashes[block["block_height"]] = block_hash
+            self.blocks[block_hash] = block
+            raw_transactions = split_raw_transactions(block["raw"]) if block.get("raw") else [None] * len(block["verbose"]["tx"])
+            for tx, raw_transaction in zip(block["verbose"]["tx"], raw_transactions):
+                self.transactions[tx["txid"]] = (tx, raw_transaction, block)
+        for tx in transactions:
+            self.transactions[tx["txid"]] = (tx, tx.get("hex"), None)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._make_handler())
+        self.server.daemon_threads = True
+        self.url = self.get_url(user, password)
+        self.thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        with self._lock:
+            open_connections = list(self._open_connections)
+        for connection in open_connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def get_url(self, user: str, password: str) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{user}:{password}@{host}:{port}"
+
+    # RPC methods
+
+    def getblockcount(self):
+        return max(self.block_hashes)
+
+    def getbestblockhash(self):
+        return self.block_hashes[max(self.block_hashes)]
+
+    def getblockhash(self, height):
+        if height not in self.block_hashes:
+            raise RpcError(RPC_INVALID_PARAMETER, "Block height out of range")
+        return self.block_hashes[height]
+
+    def getblock(self, block_hash, verbosity=1):
+        block = self.blocks.get(block_hash)
+        if block is None:
+            raise RpcError(RPC_INVALID_ADDRESS_OR_KEY, "Block not found")
+        if verbosity == 0:
+            return block["raw"]
+        verbose = copy.deepcopy(block["verbose"])
+        verbose["confirmations"] = self.getblockcount() - block["block_height"] + 1
+        if verbosity == 1:
+            verbose["tx"] = [tx["txid"] for tx in verbose["tx"]]
+        return verbose
+
+    def getrawtransaction(self, txid, verbose=False, block_hash=None):
+        if txid not in self.transactions:
+            raise RpcError(RPC_INVALID_ADDRESS_OR_KEY, "No such mempool or blockchain transaction. Use gettransaction for wallet transactions.")
+        tx, raw_transaction, block = self.transactions[txid]
+        if not verbose:
+            if raw_transaction is None:
+                raise RpcError(RPC_INVALID_ADDRESS_OR_KEY, "No such mempool or blockchain transaction. Use gettransaction for wallet transactions.")
+            return raw_transaction
+        tx = {key: value for key, value in copy.deepcopy(tx).items() if key != "fee"}
+        if raw_transaction is not None:
+            tx["hex"] = raw_transaction
+        if block is not None:
+            tx["blockhash"] = block["verbose"]["hash"]
+            tx["confirmations"] = self.getblockcount() - block["block_height"] + 1
+            tx["time"] = tx["blocktime"] = block["verbose"]["time"]
+        return tx
+
+    # HTTP handling
+
+    def _execute(self, request):
+        try:
+            if request.get("method") not in self.METHODS:
+                raise RpcError(RPC_METHOD_NOT_FOUND, "Method not found")
+            result, error = getattr(self, request["method"])(*request.get("params", [])), None
+        except RpcError as e:
+            result, error = None, {"code": e.code, "message": e.message}
+        except (TypeError, ValueError) as e:
+            result, error = None, {"code": RPC_INVALID_PARAMETER, "message": str(e)}
+        if request.get("jsonrpc") != "2.0":
+            return {"result": result, "error": error, "id": request.get("id")}
+        # JSON-RPC 2.0 responses carry either a result or an error
+        response = {"jsonrpc": "2.0", "id": request.get("id")}
+        if error is None:
+            response["result"] = result
+        else:
+            response["error"] = error
+        return response
+
+    def _make_handler(self):
+        bitcoind = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # keep-alive, like bitcoind
+            # send headers and body in one segment, or delayed acks add tens of milliseconds to every request
+            wbufsize = -1
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with bitcoind._lock:
+                    bitcoind.connections += 1
+                    bitcoind._open_connections.add(self.connection)
+
+            def finish(self):
+                with bitcoind._lock:
+                    bitcoind._open_connections.discard(self.connection)
+                super().finish()
+
+            def _send(self, status: int, body: bytes, content_type: str = "application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                payload = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.headers.get("Authorization") != bitcoind.authorization:
+                    self._send(401, b"", "text/html")
+                    return
+                with bitcoind._lock:
+                    bitcoind.requests += 1
+                    bitcoind.in_flight += 1
+                    bitcoind.max_in_flight = max(bitcoind.max_in_flight, bitcoind.in_flight)
+                    queue_full = bitcoind._rng.random() < bitcoind.queue_full_rate or (
+                        bitcoind.work_queue_depth is not None and bitcoind.in_flight > bitcoind.work_queue_depth)
+                    failed = not queue_full and bitcoind._rng.random() < bitcoind.error_rate
+                    delay = bitcoind.latency + bitcoind._rng.random() * bitcoind.latency_jitter
+                try:
+                    if queue_full:
+                        with bitcoind._lock:
+                            bitcoind.rejections += 1
+                        self._send(503, b"Work queue depth exceeded", "text/html")
+                        return
+                    time.sleep(delay)
+                    if failed:
+                        with bitcoind._lock:
+                            bitcoind.errors += 1
+                        self._send(500, b"Internal Server Error", "text/html")
+                        return
+                    request = json.loads(payload)
+                    requests = request if isinstance(request, list) else [request]
+                    with bitcoind._lock:
+                        bitcoind.calls += len(requests)
+                    responses = [bitcoind._execute(single_request) for single_request in requests]
+                    if isinstance(request, list):
+                        self._send(200, json.dumps(responses).encode("utf8"))
+                    else:
+                        # bitcoind answers failed JSON-RPC 1.x calls with HTTP 500 and the error in the body
+                        status = 500 if responses[0].get("error") is not None else 200
+                        self._send(status, json.dumps(responses[0]).encode("utf8"))
+                finally:
+                    with bitcoind._lock:
+                        bitcoind.in_flight -= 1
+
+        return Handler
@@ -0,0 +1,67 @@
+import unittest
+
+from neurons.nodes.bitcoin.address import AddressDeriver, encode_segwit_address
+from neurons.nodes.bitcoin.node_utils import (
+    construct_redeem_script,
+    create_p2sh_address,
+    hash_redeem_script,
+    pubkey_to_address,
+)
+
+GENESIS_PUBKEY = "04678afdb0fe5548271967f1a67130b7105cd6a828e03909a67962e0ea1f61deb649f6bc3f4cef38c4f35504e51ec112de5c384df7ba0b8d578a4c702b6bf11d5f"
+COMPRESSED_PUBKEY = "0279be667ef9dcbbac55a06295ce870b07029bfcdb2dce28d959f2815b16f81798"
+
+
+def push(data: bytes) -> bytes:
+    return bytes([len(data)]) + data
+
+
+class TestAddressDeriver(unittest.TestCase):
+
+    def setUp(self):
+        self.deriver = AddressDeriver(cache_size=16)
+
+    def test_standard_output_types(self):
+        cases = {
+            "76a91462e907b15cbf27d5425399ebf6f0fb50ebb88f1888ac": "1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa",
+            "a914e9c3dd0c07aac76179ebc76a6c78d4d67c6c160a87": "3P14159f73E4gFr7JterCCQh9QjiTjiZrG",
+            "0014751e76e8199196d454941c45d1b3a323f1433bd6": "bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4",
+            "00201863143c14c5166804bd19203356da136c985678cd4d27a1b8c6329604903262": "bc1qrp33g0q5c5txsp9arysrx4k6zdkfs4nce4xj0gdcccefvpysxf3qccfmv3",
+            "5120a60869f0dbcf1dc659c9cecbaf8050135ea9e8cdc487053f1dc6880949dc684c": "bc1p5cyxnuxmeuwuvkwfem96lqzszd02n6xdcjrs20cac6yqjjwudpxqkedrcr",
+            "51024e73": "bc1pfeessrawgf",
+        }
+        for script_hex, address in cases.items():
+            self.assertEqual(self.deriver.derive(bytes.fromhex(script_hex)), address)
+
+    def test_matches_legacy_pubkey_and_multisig_derivation(self):
+        for pubkey in [GENESIS_PUBKEY, COMPRESSED_PUBKEY]:
+            script = push(bytes.fromhex(pubkey)) + b"\xac"
+            self.assertEqual(self.deriver.derive(script), pubkey_to_address(pubkey))
+
+        pubkeys = [GENESIS_PUBKEY, COMPRESSED_PUBKEY]
+        script = b"\x51" + b"".join(push(bytes.fromhex(pubkey)) for pubkey in pubkeys) + b"\x52\xae"
+        expected = create_p2sh_address(hash_redeem_script(construct_redeem_script(pubkeys, 1)))
+        self.assertEqual(self.deriver.derive(script), expected)
+        self.assertEqual(self.deriver.derive_from_script_pub_key({"asm": f"1 {GENESIS_PUBKEY} {COMPRESSED_PUBKEY} 2 OP_CHECKMULTISIG"}), expected)
+
+    def test_unattributable_scripts_yield_none(self):
+        for script_hex in ["6a", "6a24aa21a9ed" + "00" * 32, "51", "6a76", "4c05"]:
+            self.assertIsNone(self.deriver.derive(bytes.fromhex(script_hex)))
+        self.assertIsNone(self.deriver.derive_from_script_pub_key({"asm": "OP_RETURN", "hex": "6a", "type": "nulldata"}))
+
+    def test_derive_many_derives_each_script_once(self):
+        p2pk = push(bytes.fromhex(COMPRESSED_PUBKEY)) + b"\xac"
+        addresses = self.deriver.derive_many([p2pk, b"\x6a", p2pk])
+        self.assertEqual(addresses, [pubkey_to_address(COMPRESSED_PUBKEY), None, pubkey_to_address(COMPRESSED_PUBKEY)])
+        self.assertEqual(self.deriver.cache.get_stats()["misses"], 2)
+
+        self.deriver.derive(p2pk)
+        self.assertEqual(self.deriver.cache.get_stats()["hits"], 1)
+
+    def test_segwit_addresses(self):
+        self.assertEqual(encode_segwit_address(0, bytes.fromhex("751e76e8199196d454941c45d1b3a323f1433bd6")), "bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4")
+        self.assertEqual(encode_segwit_address(1, bytes.fromhex("a60869f0dbcf1dc659c9cecbaf8050135ea9e8cdc487053f1dc6880949dc684c")), "bc1p5cyxnuxmeuwuvkwfem96lqzszd02n6xdcjrs20cac6yqjjwudpxqkedrcr")
+
+
+if __name__ == '__main__':
+    unittest.main()
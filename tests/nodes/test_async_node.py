@@ -0,0 +1,64 @@
+import asyncio
+import random
+import time
+import unittest
+
+from neurons.nodes.bitcoin.async_node import AsyncBitcoinNode
+from neurons.nodes.bitcoin.node import BitcoinNode
+from neurons.nodes.bitcoin.rpc_limiter import AdaptiveConcurrencyLimiter, ConcurrencyLimitedRpcPool
+from tests.nodes.fake_bitcoind import FakeBitcoind
+
+TXN_ID = "ffeb9c6f956055b66e864edb5189121e35a00e6ee5dc31b2d893713eafae0ef0" # in block 1000000
+
+
+class TestAsyncBitcoinNode(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.bitcoind = FakeBitcoind().start()
+        self.node = BitcoinNode(self.bitcoind.url)
+        self.async_node = AsyncBitcoinNode(self.node)
+
+    def tearDown(self):
+        self.async_node.close()
+        self.node.rpc_pool.close()
+        self.bitcoind.stop()
+
+    async def test_matches_blocking_node(self):
+        self.assertEqual(await self.async_node.get_current_block_height(), 1000000)
+        block = await self.async_node.get_block_by_height(1000000)
+        self.assertEqual(block["hash"], self.node.get_block_by_height(1000000)["hash"])
+        self.assertEqual((await self.async_node.get_txn_data_by_id(TXN_ID))["txid"], TXN_ID)
+
+        random.seed(0)
+        challenge, txn_id = await self.async_node.create_funds_flow_challenge(1000000, 1000000)
+        self.assertTrue(await self.async_node.validate_funds_flow_challenge_response_output(challenge, txn_id))
+        random.seed(0)
+        self.assertEqual(self.node.create_funds_flow_challenge(1000000, 1000000), (challenge, txn_id))
+
+    async def test_calls_share_the_node_concurrency_limit(self):
+        self.bitcoind.latency = 0.05
+        self.node.rpc_pool.close()
+        self.node.rpc_pool = ConcurrencyLimitedRpcPool(self.node.create_rpc_pool(), AdaptiveConcurrencyLimiter(2, latency_tolerance=float("inf")))
+
+        ticks = 0
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        start_time = time.monotonic()
+        block_heights = await asyncio.gather(*(self.async_node.get_current_block_height() for _ in range(8)))
+        elapsed = time.monotonic() - start_time
+        ticker.cancel()
+
+        self.assertEqual(block_heights, [1000000] * 8)
+        self.assertEqual(self.bitcoind.max_in_flight, 2)
+        self.assertLess(elapsed, 8 * 0.05)
+        # the event loop kept running while the calls waited on bitcoind
+        self.assertGreater(ticks, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
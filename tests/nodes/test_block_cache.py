@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+
+from neurons.nodes.bitcoin.block_cache import BlockCache
+
+# random payloads do not compress, so every cached block takes a bit over BLOCK_SIZE bytes
+BLOCK_SIZE = 1000
+
+
+def make_block(block_hash: str):
+    return {"hash": block_hash, "tx": [], "data": os.urandom(BLOCK_SIZE)}
+
+
+class TestBlockCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get_files(self):
+        return sorted(os.listdir(self.directory))
+
+    def test_round_trip(self):
+        cache = BlockCache(self.directory, max_bytes=100 * BLOCK_SIZE)
+        block = make_block("aa")
+        self.assertIsNone(cache.get(100, "aa"))
+        cache.put(100, "aa", block)
+        self.assertEqual(cache.get(100, "aa"), block)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(self.get_files(), ["100-aa.v2.pkl.z"])
+        self.assertEqual(cache.bytes, os.path.getsize(os.path.join(self.directory, "100-aa.v2.pkl.z")))
+
+        # replacing an entry does not count its size twice
+        cache.put(100, "aa", block)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.bytes, os.path.getsize(os.path.join(self.directory, "100-aa.v2.pkl.z")))
+
+    def test_evicts_least_recently_used_over_size_cap(self):
+        cache = BlockCache(self.directory, max_bytes=int(2.5 * BLOCK_SIZE))
+        blocks = {block_hash: make_block(block_hash) for block_hash in ("aa", "bb", "cc")}
+        cache.put(100, "aa", blocks["aa"])
+        cache.put(101, "bb", blocks["bb"])
+        self.assertIsNotNone(cache.get(100, "aa"))
+        cache.put(102, "cc", blocks["cc"])
+
+        self.assertEqual(len(cache), 2)
+        self.assertLessEqual(cache.bytes, cache.max_bytes)
+        self.assertIsNone(cache.get(101, "bb"))
+        self.assertEqual(cache.get(100, "aa"), blocks["aa"])
+        self.assertEqual(self.get_files(), ["100-aa.v2.pkl.z", "102-cc.v2.pkl.z"])
+
+        # a block larger than the whole cache is not stored
+        cache.put(103, "dd", {"data": os.urandom(3 * BLOCK_SIZE)})
+        self.assertEqual(len(cache), 2)
+        self.assertNotIn("103-dd.v2.pkl.z", self.get_files())
+
+    def test_rebuilds_lru_order_from_mtimes(self):
+        cache = BlockCache(self.directory, max_bytes=100 * BLOCK_SIZE)
+        blocks = {block_hash: make_block(block_hash) for block_hash in ("aa", "bb", "cc")}
+        for block_height, block_hash in ((100, "aa"), (101, "bb"), (102, "cc")):
+            cache.put(block_height, block_hash, blocks[block_hash])
+        # 101 was used last, 100 longest ago
+        for mtime, file_name in ((1000, "100-aa.v2.pkl.z"), (3000, "101-bb.v2.pkl.z"), (2000, "102-cc.v2.pkl.z")):
+            os.utime(os.path.join(self.directory, file_name), (mtime, mtime))
+        open(os.path.join(self.directory, "not-a-block.txt"), "w").close()
+
+        reopened = BlockCache(self.directory, max_bytes=int(2.5 * BLOCK_SIZE))
+        self.assertEqual(len(reopened), 2)
+        self.assertIsNone(reopened.get(100, "aa"))
+        self.assertEqual(reopened.get(101, "bb"), blocks["bb"])
+        self.assertEqual(reopened.get(102, "cc"), blocks["cc"])
+        self.assertNotIn("100-aa.v2.pkl.z", self.get_files())
+
+    def test_drops_reorged_block_of_same_height(self):
+        cache = BlockCache(self.directory, max_bytes=100 * BLOCK_SIZE)
+        reorged_block, block = make_block("aa"), make_block("bb")
+        cache.put(100, "aa", reorged_block)
+        cache.put(101, "cc", make_block("cc"))
+        self.assertIsNone(cache.get(100, "bb"))
+        self.assertEqual(self.get_files(), ["101-cc.v2.pkl.z"])
+
+        cache.put(100, "bb", block)
+        self.assertEqual(cache.get(100, "bb"), block)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.bytes, sum(os.path.getsize(os.path.join(self.directory, file_name)) for file_name in self.get_files()))
+
+    def test_removes_files_of_older_formats(self):
+        open(os.path.join(self.directory, "100-aa.pkl.z"), "wb").close()
+        cache = BlockCache(self.directory, max_bytes=100 * BLOCK_SIZE)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(self.get_files(), [])
+
+    def test_drops_unreadable_file(self):
+        cache = BlockCache(self.directory, max_bytes=100 * BLOCK_SIZE)
+        cache.put(100, "aa", make_block("aa"))
+        with open(os.path.join(self.directory, "100-aa.v2.pkl.z"), "wb") as file:
+            file.write(b"not zlib")
+        self.assertIsNone(cache.get(100, "aa"))
+        self.assertEqual((len(cache), cache.bytes), (0, 0))
+        self.assertEqual(self.get_files(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import decimal
+import json
+import os
+import unittest
+
+from neurons.nodes.bitcoin.block_deserializer import deserialize_block, get_raw_block_hash, iter_raw_block_transactions
+from neurons.nodes.bitcoin.node_utils import parse_block_data
+from neurons.nodes.bitcoin.script import get_script_type, script_to_asm
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "blocks.json")
+
+
+class TestBlockDeserializer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # each fixture holds a block in both getblock verbosity 0 and verbosity 2 form
+        with open(FIXTURES_PATH) as file:
+            cls.fixtures = json.load(file, parse_float=decimal.Decimal)
+
+    def test_matches_verbose_json_path(self):
+        for fixture in self.fixtures:
+            expected = parse_block_data(fixture["verbose"])
+            # fees need the spent outputs and are not available from the raw block
+            for tx in expected.transactions:
+                tx.fee_satoshi = 0
+
+            block = deserialize_block(fixture["raw"], fixture["block_height"])
+            self.assertEqual(block, expected)
+
+    def test_raw_block_hash(self):
+        for fixture in self.fixtures:
+            self.assertEqual(get_raw_block_hash(fixture["raw"]), fixture["verbose"]["hash"])
+            self.assertEqual(get_raw_block_hash(bytes.fromhex(fixture["raw"])), fixture["verbose"]["hash"])
+
+    def test_streams_same_transactions(self):
+        for fixture in self.fixtures:
+            block = deserialize_block(fixture["raw"], fixture["block_height"])
+            self.assertEqual(list(iter_raw_block_transactions(fixture["raw"], fixture["block_height"])), block.transactions)
+
+        transactions = list(iter_raw_block_transactions(self.fixtures[1]["raw"], 1000000, include_script_sig=False, include_script_pub_key=False))
+        self.assertEqual([vout.address for vout in transactions[1].vouts], [vout.address for vout in block.transactions[1].vouts])
+        self.assertTrue(all(vin.script_sig is None for tx in transactions for vin in tx.vins))
+        self.assertTrue(all(vout.script_pub_key is None for tx in transactions for vout in tx.vouts))
+
+    def test_skips_nonstandard_and_nulldata_outputs(self):
+        block = deserialize_block(self.fixtures[1]["raw"], self.fixtures[1]["block_height"])
+        coinbase, legacy, segwit = block.transactions
+        self.assertTrue(coinbase.is_coinbase)
+        self.assertEqual([vout.vout_id for vout in coinbase.vouts], [0])
+        self.assertEqual([vout.vout_id for vout in legacy.vouts], [0, 1, 2, 3])
+        self.assertEqual([vout.vout_id for vout in segwit.vouts], [0, 1, 2, 3])
+
+    def test_script_sig_asm_decodes_sighash_types(self):
+        sig = bytes.fromhex("304402204e45e16932b8af514961a1d3a1a25fdf3f4f7732e9d624c6c61548ab5fb8cd410220181522ec8eca07de4860a4acdd12909d831cc56cbbac4622082221a8768d1d0901")
+        script = bytes([len(sig)]) + sig
+        self.assertEqual(script_to_asm(script, attempt_sighash_decode=True), sig[:-1].hex() + "[ALL]")
+        self.assertEqual(script_to_asm(script), sig.hex())
+        self.assertEqual(script_to_asm(b"\x4c\x05\x01"), "[error]")
+
+    def test_script_types(self):
+        self.assertEqual(get_script_type(bytes.fromhex("6a")), "nulldata")
+        self.assertEqual(get_script_type(bytes.fromhex("6a76")), "nonstandard")
+        self.assertEqual(get_script_type(bytes.fromhex("5120" + "00" * 32)), "witness_v1_taproot")
+        self.assertEqual(get_script_type(bytes.fromhex("5210" + "00" * 16)), "witness_unknown")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+from neurons.nodes.bitcoin.cache import LRUCache, estimate_txn_data_size
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_evicts_least_recently_used_by_size(self):
+        cache = LRUCache(max_bytes=10, sizeof=len)
+        cache.put("a", "aaaa")
+        cache.put("b", "bbbb")
+        self.assertEqual(cache.get("a"), "aaaa")
+        cache.put("c", "cccc")
+
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+        self.assertEqual(cache.bytes, 8)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_counts_hits_and_misses(self):
+        cache = LRUCache(max_bytes=10, sizeof=len)
+        cache.put("a", "aaaa")
+        cache.get("a")
+        cache.get("b")
+
+        stats = cache.get_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hit_ratio'], 0.5)
+
+    def test_skips_values_larger_than_cache(self):
+        cache = LRUCache(max_bytes=10, sizeof=len)
+        cache.put("a", "a" * 11)
+        self.assertEqual(len(cache), 0)
+
+    def test_estimate_txn_data_size(self):
+        self.assertGreater(estimate_txn_data_size({"size": 250}), estimate_txn_data_size({"hex": "00" * 100}))
+
+
+if __name__ == '__main__':
+    unittest.main()
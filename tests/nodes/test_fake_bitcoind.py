@@ -0,0 +1,124 @@
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from bitcoinrpc.authproxy import JSONRPCException
+
+from neurons.nodes.bitcoin import rpc
+from neurons.nodes.bitcoin.block_deserializer import deserialize_block
+from neurons.nodes.bitcoin.node import BitcoinNode
+from neurons.nodes.bitcoin.node_utils import to_satoshi
+from neurons.nodes.bitcoin.rpc_limiter import AdaptiveConcurrencyLimiter, ConcurrencyLimitedRpcPool
+from tests.nodes.fake_bitcoind import FakeBitcoind, load_fixture
+
+GENESIS_HASH = "000000000019d6689c085ae165831e934ff763ae46a2a6c172b3f1b60a8ce26f"
+
+
+def get_fixture_total_balance_change(block_height: int) -> int:
+    """
+    Outputs created minus outputs spent by a fixture block, looked up directly in the fixture files.
+    Nulldata and nonstandard outputs pay no address, so they change no balance.
+    """
+    block = next(block for block in load_fixture("blocks.json") if block["block_height"] == block_height)["verbose"]
+    known_transactions = {tx["txid"]: tx for tx in load_fixture("transactions.json") + block["tx"]}
+    created = sum(
+        to_satoshi(vout["value"])
+        for tx in block["tx"] for vout in tx["vout"] if vout["scriptPubKey"]["type"] not in ("nulldata", "nonstandard")
+    )
+    spent = sum(
+        to_satoshi(known_transactions[vin["txid"]]["vout"][vin["vout"]]["value"])
+        for tx in block["tx"] for vin in tx["vin"] if "txid" in vin
+    )
+    return created - spent
+
+
+class TestFakeBitcoind(unittest.TestCase):
+
+    def setUp(self):
+        self.bitcoind = FakeBitcoind().start()
+        self.node = BitcoinNode(self.bitcoind.url)
+
+    def tearDown(self):
+        self.node.rpc_pool.close()
+        self.bitcoind.stop()
+
+    def test_serves_blocks(self):
+        self.assertEqual(self.node.get_current_block_height(), 1000000)
+        self.assertEqual(self.node.get_block_hash(0), GENESIS_HASH)
+        self.assertIsNone(self.node.get_block_hash(5))
+
+        block_hash = self.node.get_block_hash(1000000)
+        self.assertEqual(len(self.node.rpc_pool.call("getblock", block_hash, 1)["tx"]), 3)
+        with self.assertRaises(JSONRPCException) as context:
+            self.node.rpc_pool.call("getblock", "00" * 32, 2)
+        self.assertEqual(context.exception.code, rpc.RPC_INVALID_ADDRESS_OR_KEY)
+
+        verbose_block = self.node.get_parsed_block_by_height(1000000)
+        for tx in verbose_block.transactions:
+            tx.fee_satoshi = 0
+        self.node.raw_blocks = True
+        self.assertEqual(self.node.get_parsed_block_by_height(1000000), verbose_block)
+        self.assertEqual(verbose_block, deserialize_block(self.node.rpc_pool.call("getblock", block_hash, 0), 1000000))
+
+    def test_serves_transactions_in_batches(self):
+        txids = ["ffeb9c6f956055b66e864edb5189121e35a00e6ee5dc31b2d893713eafae0ef0", "ab" * 32, "f4184fc596403b9d638783cf57adfe4c75c605f6356fbc91338530e9831e9e16"]
+        in_block, missing, standalone = self.node.rpc_pool.batch([("getrawtransaction", txid, 1) for txid in txids])
+        self.assertEqual(in_block["blockhash"], self.node.get_block_hash(1000000))
+        self.assertEqual(in_block["vout"][0]["value"], 1000)
+        self.assertTrue(rpc.is_missing_txn_error(missing))
+        self.assertEqual(standalone["vout"][1]["value"], 30000000)
+        self.assertEqual(self.node.rpc_pool.call("getrawtransaction", txids[0]), in_block["hex"])
+
+    def test_balance_tracking_challenge(self):
+        _, total_balance_change = self.node.create_balance_tracking_challenge(1000000)
+        self.assertEqual(total_balance_change, get_fixture_total_balance_change(1000000))
+        self.assertLess(self.bitcoind.requests, self.bitcoind.calls)
+
+    def test_rejects_wrong_credentials(self):
+        with self.assertRaises(JSONRPCException) as context:
+            rpc.RpcConnectionPool(self.bitcoind.get_url("bitcoinrpc", "wrong")).call("getblockcount")
+        self.assertEqual(context.exception.code, rpc.RPC_NON_JSON_RESPONSE)
+
+
+class TestFakeBitcoindUnderLoad(unittest.TestCase):
+
+    def test_limiter_backs_off_full_work_queue(self):
+        with FakeBitcoind(latency=0.01, work_queue_depth=2) as bitcoind:
+            limited_pool = ConcurrencyLimitedRpcPool(rpc.RpcConnectionPool(bitcoind.url, size=8), AdaptiveConcurrencyLimiter(max_limit=8), max_retries=10)
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                block_hashes = list(executor.map(lambda _: limited_pool.call("getblockhash", 0), range(64)))
+            limited_pool.close()
+
+        self.assertEqual(block_hashes, [GENESIS_HASH] * 64)
+        stats = limited_pool.get_stats()
+        self.assertGreater(stats["rejections"], 0)
+        self.assertEqual(stats["rejections"], bitcoind.rejections)
+        self.assertLess(stats["limit"], 8)
+
+    def test_hedges_slow_backend(self):
+        with FakeBitcoind(latency=0.5) as slow, FakeBitcoind() as fast:
+            pool = rpc.MultiBackendRpcPool([slow.url, fast.url])
+            slow_backend, fast_backend = pool.backends
+            slow_backend.latency, fast_backend.latency = 0.001, 0.01
+            pool._hedge_delays["getblockcount"] = 0.02
+
+            start_time = time.monotonic()
+            self.assertEqual(pool.call("getblockcount"), 1000000)
+            self.assertLess(time.monotonic() - start_time, 0.4)
+            self.assertEqual((pool.hedged_requests, pool.hedge_wins), (1, 1))
+            pool.close()
+
+    def test_ejects_unreachable_backend(self):
+        unreachable = FakeBitcoind().start()
+        unreachable.stop()
+        with FakeBitcoind() as bitcoind:
+            pool = rpc.MultiBackendRpcPool([unreachable.url, bitcoind.url], failure_threshold=1)
+            pool.backends[1].latency = 0.01
+            self.assertEqual(pool.call("getblockhash", 0), GENESIS_HASH)
+            self.assertEqual(pool.call("getblockhash", 0), GENESIS_HASH)
+            self.assertEqual([backend["ejected"] for backend in pool.get_stats()["backends"]], [True, False])
+            self.assertEqual(pool.get_stats()["backends"][0]["requests"], 1)
+            pool.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+from unittest.mock import patch
+
+from neurons.nodes.bitcoin.node import BitcoinNode
+from tests.nodes.fake_bitcoind import FakeBitcoind
+
+TXN_ID_1 = "0437cd7f8525ceed2324359c2d0ba26006d92d856a9c20fa0241106ee5a597c9"
+TXN_ID_2 = "f4184fc596403b9d638783cf57adfe4c75c605f6356fbc91338530e9831e9e16"
+TXN_ID_3 = "ffeb9c6f956055b66e864edb5189121e35a00e6ee5dc31b2d893713eafae0ef0" # in block 1000000
+MISSING_TXN_ID = "ab" * 32
+
+
+def get_batches(batch):
+    return [[call[1] for call in batch_call.args[0]] for batch_call in batch.call_args_list]
+
+
+class TestFetchTxnsData(unittest.TestCase):
+
+    def setUp(self):
+        self.bitcoind = FakeBitcoind().start()
+        self.node = BitcoinNode(self.bitcoind.url)
+        self.node.rpc_batch_size = 2
+
+    def tearDown(self):
+        self.node.rpc_pool.close()
+        self.bitcoind.stop()
+
+    def test_batches_distinct_txids_in_chunks(self):
+        outpoints = [(TXN_ID_1, "0"), (TXN_ID_1, "2"), (TXN_ID_2, "1"), (MISSING_TXN_ID, "0"), (TXN_ID_3, "0"), (TXN_ID_1, "1")]
+        with patch.object(self.node.rpc_pool, "batch", wraps=self.node.rpc_pool.batch) as batch:
+            tx_outs = self.node.get_addresses_and_amounts_by_outpoints(outpoints)
+
+        self.assertEqual(get_batches(batch), [[TXN_ID_1, TXN_ID_2], [MISSING_TXN_ID, TXN_ID_3]])
+        self.assertEqual(batch.call_args_list[0].args[0], [("getrawtransaction", TXN_ID_1, 1), ("getrawtransaction", TXN_ID_2, 1)])
+        self.assertEqual(self.bitcoind.requests, 2)
+        self.assertEqual(tx_outs[(TXN_ID_1, "0")], ("1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa", 50000000))
+        self.assertEqual(tx_outs[(TXN_ID_1, "2")], ("3P14159f73E4gFr7JterCCQh9QjiTjiZrG", 12500000))
+        self.assertEqual(tx_outs[(TXN_ID_2, "1")], ("1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa", 30000000))
+        self.assertEqual(tx_outs[(MISSING_TXN_ID, "0")], (f"unknown-{MISSING_TXN_ID}", 0))
+        self.assertEqual(len(tx_outs), len(outpoints))
+
+    def test_missing_txn_error_in_batch_is_negative_cached(self):
+        self.node.get_addresses_and_amounts_by_outpoints([(TXN_ID_1, "0"), (MISSING_TXN_ID, "0")])
+        self.assertIn(MISSING_TXN_ID, self.node.missing_txn_cache)
+
+        with patch.object(self.node.rpc_pool, "batch", wraps=self.node.rpc_pool.batch) as batch:
+            tx_outs = self.node.get_addresses_and_amounts_by_outpoints([(TXN_ID_1, "1"), (MISSING_TXN_ID, "1")])
+            batch.assert_not_called()
+            self.assertEqual(tx_outs[(MISSING_TXN_ID, "1")], (f"unknown-{MISSING_TXN_ID}", 0))
+
+            # once the entry expires the transaction is asked for again, alone
+            self.node.missing_txn_cache_ttl = 0
+            self.node.get_addresses_and_amounts_by_outpoints([(TXN_ID_1, "1"), (MISSING_TXN_ID, "1")])
+            self.assertEqual(get_batches(batch), [[MISSING_TXN_ID]])
+
+    def test_failed_batch_is_not_negative_cached(self):
+        with patch.object(self.node.rpc_pool, "batch", side_effect=ConnectionRefusedError()):
+            tx_outs = self.node.get_addresses_and_amounts_by_outpoints([(TXN_ID_1, "0")])
+        self.assertEqual(tx_outs[(TXN_ID_1, "0")], (f"unknown-{TXN_ID_1}", 0))
+        self.assertNotIn(TXN_ID_1, self.node.missing_txn_cache)
+        self.assertEqual(self.node.get_addresses_and_amounts_by_outpoints([(TXN_ID_1, "0")])[(TXN_ID_1, "0")], ("1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa", 50000000))
+
+
+if __name__ == '__main__':
+    unittest.main()
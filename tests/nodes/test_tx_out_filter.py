@@ -0,0 +1,52 @@
+import hashlib
+import os
+import tempfile
+import unittest
+
+from neurons.nodes.bitcoin.node_utils import initialize_tx_out_hash_table
+from neurons.nodes.bitcoin.tx_out_filter import TxOutFilter, tx_out_filter_path
+from neurons.nodes.bitcoin.tx_out_index import TxOutIndex, build_tx_out_filter, write_tx_out_index
+
+
+def make_txn_id(i: int) -> str:
+    return hashlib.sha256(i.to_bytes(8, "little")).hexdigest()
+
+
+class TestTxOutFilter(unittest.TestCase):
+
+    def setUp(self):
+        self.hash_table = initialize_tx_out_hash_table()
+        self.outpoints = [(make_txn_id(i), str(i % 5)) for i in range(2000)]
+        for txn_id, vout_id in self.outpoints:
+            self.hash_table[txn_id[:3]][(txn_id, vout_id)] = ("1HLoD9E4SDFFPDiYfNYnkBLQ85Y51J3Zb1", 1)
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.index_path = os.path.join(self.tmp_dir.name, "tx_out.idx")
+        write_tx_out_index(self.hash_table, self.index_path)
+        self.index = TxOutIndex.open(self.index_path)
+        build_tx_out_filter(self.index, tx_out_filter_path(self.index_path), false_positive_rate=0.01)
+        self.tx_out_filter = TxOutFilter.open(tx_out_filter_path(self.index_path))
+
+    def tearDown(self):
+        self.tx_out_filter.close()
+        self.index.close()
+        self.tmp_dir.cleanup()
+
+    def test_has_no_false_negatives(self):
+        self.assertEqual(len(self.tx_out_filter), len(self.outpoints))
+        for outpoint in self.outpoints:
+            self.assertIn(outpoint, self.tx_out_filter)
+
+    def test_rejects_most_missing_outpoints(self):
+        missing = [(make_txn_id(i), "0") for i in range(2000, 12000)]
+        missing += [(txn_id, "7") for txn_id, _ in self.outpoints]
+        false_positives = sum(outpoint in self.tx_out_filter for outpoint in missing)
+        self.assertLess(false_positives / len(missing), 0.03)
+
+    def test_rejects_invalid_txn_ids(self):
+        self.assertNotIn(("not-a-txid", "0"), self.tx_out_filter)
+        self.assertNotIn((1, "0"), self.tx_out_filter)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+from neurons.nodes.bitcoin.node_utils import initialize_tx_out_hash_table
+from neurons.nodes.bitcoin.tx_out_index import TxOutIndex, write_tx_out_index
+
+
+TXN_ID_1 = "0437cd7f8525ceed2324359c2d0ba26006d92d856a9c20fa0241106ee5a597c9"
+TXN_ID_2 = "f4184fc596403b9d638783cf57adfe4c75c605f6356fbc91338530e9831e9e16"
+TXN_ID_3 = "0437cd7f8525ceed2324359c2d0ba26006d92d856a9c20fa0241106ee5a597ca"
+
+
+class TestTxOutIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.hash_table = initialize_tx_out_hash_table()
+        entries = {
+            (TXN_ID_1, "0"): ("1HLoD9E4SDFFPDiYfNYnkBLQ85Y51J3Zb1", 5000000000),
+            (TXN_ID_1, "2"): ("12cbQLTFMXRnSzktFkuoG3eHoMeFtpTu3S", 1000000000),
+            (TXN_ID_1, "10"): ("1HLoD9E4SDFFPDiYfNYnkBLQ85Y51J3Zb1", 4000000000),
+            (TXN_ID_2, "1"): ("12cbQLTFMXRnSzktFkuoG3eHoMeFtpTu3S", 4000000000),
+            (TXN_ID_3, "0"): ("bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdq", 1),
+        }
+        for (txn_id, vout_id), tx_out in entries.items():
+            self.hash_table[txn_id[:3]][(txn_id, vout_id)] = tx_out
+        self.entries = entries
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.index_path = os.path.join(self.tmp_dir.name, "tx_out.idx")
+        write_tx_out_index(self.hash_table, self.index_path)
+        self.index = TxOutIndex.open(self.index_path)
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp_dir.cleanup()
+
+    def test_lookup_matches_hash_table(self):
+        self.assertEqual(len(self.index), len(self.entries))
+        for (txn_id, vout_id), tx_out in self.entries.items():
+            self.assertEqual(self.index.get(txn_id, vout_id), tx_out)
+
+    def test_lookup_missing(self):
+        self.assertIsNone(self.index.get(TXN_ID_1, "1"))
+        self.assertIsNone(self.index.get(TXN_ID_2, "0"))
+        self.assertIsNone(self.index.get("ff" * 32, "0"))
+        self.assertIsNone(self.index.get("not-a-txid", "0"))
+
+    def test_addresses_are_interned(self):
+        self.assertEqual(self.index.address_count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import multiprocessing
+import os
+import pickle
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from neurons.nodes.bitcoin.node_utils import initialize_tx_out_hash_table
+from neurons.nodes.bitcoin import tx_out_loader
+from neurons.nodes.bitcoin.tx_out_loader import CHUNK_ENTRY_BYTES, estimate_shard_memory, load_tx_out_shards
+from neurons.nodes.bitcoin.tx_out_table import CompactTxOutTable, HashTxOutTable
+
+
+class TestTxOutLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.pickle_paths = []
+        self.entries = {}
+        for shard in range(3):
+            hash_table = initialize_tx_out_hash_table()
+            for i in range(shard * 100, shard * 100 + 100):
+                txn_id = f"{i * 2654435761 % (1 << 256):064x}"
+                hash_table[txn_id[:3]][(txn_id, str(i % 2))] = (f"address-{i % 7}", i)
+                self.entries[(txn_id, str(i % 2))] = (f"address-{i % 7}", i)
+            pickle_path = os.path.join(self.tmp_dir.name, f"tx_out_{shard}.pkl")
+            with open(pickle_path, 'wb') as file:
+                pickle.dump(hash_table, file)
+            self.pickle_paths.append(pickle_path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_load_shards_into_compact_table(self):
+        tx_out_table = CompactTxOutTable()
+        total_entries = load_tx_out_shards(tx_out_table, self.pickle_paths, max_workers=2, memory_limit=1, chunk_size=16)
+        self.assertEqual(total_entries, len(self.entries))
+        self.assertEqual(len(tx_out_table), len(self.entries))
+        # every worker numbers its addresses from 0, the table holds each address once
+        self.assertEqual(len(tx_out_table.addresses), 7)
+        for (txn_id, vout_id), tx_out in self.entries.items():
+            self.assertEqual(tx_out_table.get(txn_id, vout_id), tx_out)
+
+    def test_load_shards_needs_compact_table(self):
+        with self.assertRaises(ValueError):
+            load_tx_out_shards(HashTxOutTable(), self.pickle_paths, max_workers=2)
+
+    def test_memory_limit_counts_loaded_columns(self):
+        process_class = multiprocessing.Process
+        # room for the queue and two shards next to an empty table
+        memory_limit = 4 * 16 * CHUNK_ENTRY_BYTES + 2 * estimate_shard_memory(self.pickle_paths[0])
+
+        def get_alive_at_start(tx_out_table):
+            processes = []
+            alive_at_start = []
+            def start_process(*args, **kwargs):
+                alive_at_start.append(sum(process.is_alive() for process in processes))
+                processes.append(process_class(*args, **kwargs))
+                return processes[-1]
+            with patch.object(tx_out_loader.multiprocessing, "Process", side_effect=start_process):
+                load_tx_out_shards(tx_out_table, self.pickle_paths[:2], max_workers=2, memory_limit=memory_limit, chunk_size=16, max_queued_chunks=4)
+            return alive_at_start
+
+        self.assertEqual(get_alive_at_start(CompactTxOutTable()), [0, 1])
+        # the columns the table already holds leave no room for a second shard next to the first
+        tx_out_table = CompactTxOutTable()
+        tx_out_table.insert_many((f"f{i:063x}", "0", "address", i) for i in range(100))
+        tx_out_table.compact()
+        self.assertEqual(get_alive_at_start(tx_out_table), [0, 0])
+        self.assertEqual(len(tx_out_table), 100 + 200)
+
+    def test_load_missing_shard_fails(self):
+        # the missing shard is only reached once the first ones are loading
+        with self.assertRaises(FileNotFoundError):
+            load_tx_out_shards(CompactTxOutTable(), self.pickle_paths + [os.path.join(self.tmp_dir.name, "missing.pkl")], max_workers=2)
+        self.assertEqual(multiprocessing.active_children(), [])
+
+    def test_failed_worker_stops_loading(self):
+        corrupt_path = os.path.join(self.tmp_dir.name, "corrupt.pkl")
+        with open(corrupt_path, "wb") as file:
+            file.write(b"not a pickle")
+        with self.assertRaisesRegex(Exception, f"Failed to load tx_out shard {corrupt_path}: UnpicklingError"):
+            load_tx_out_shards(CompactTxOutTable(), [corrupt_path] + self.pickle_paths, max_workers=2)
+        self.assertEqual(multiprocessing.active_children(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+
+from neurons.nodes.bitcoin.node_utils import initialize_tx_out_hash_table
+from neurons.nodes.bitcoin.tx_out_table import CompactTxOutTable, HashTxOutTable, build_tx_out_columns, create_tx_out_table
+
+
+def build_entries(num_entries):
+    entries = []
+    for i in range(num_entries):
+        txn_id = f"{i * 2654435761 % (1 << 256):064x}"
+        entries.append((txn_id, str(i % 3), f"address-{i % 5}", i * 1000))
+    return entries
+
+
+class TestTxOutTable(unittest.TestCase):
+
+    def setUp(self):
+        self.entries = build_entries(50)
+        self.hash_table = initialize_tx_out_hash_table()
+        for txn_id, vout_id, address, amount in self.entries:
+            self.hash_table[txn_id[:3]][(txn_id, vout_id)] = (address, amount)
+
+    def test_create_from_engine(self):
+        self.assertIsInstance(create_tx_out_table("hash"), HashTxOutTable)
+        self.assertIsInstance(create_tx_out_table("compact"), CompactTxOutTable)
+        with self.assertRaises(ValueError):
+            create_tx_out_table("INVALID_ENGINE")
+
+    def test_compact_matches_hash_table(self):
+        hash_table = HashTxOutTable()
+        hash_table.update(self.hash_table)
+        compact_table = CompactTxOutTable()
+        compact_table.update(self.hash_table)
+
+        self.assertEqual(len(compact_table), len(self.entries))
+        self.assertEqual(len(compact_table.addresses), 5)
+        for txn_id, vout_id, address, amount in self.entries:
+            self.assertEqual(compact_table.get(txn_id, vout_id), (address, amount))
+            self.assertEqual(compact_table.get(txn_id, vout_id), hash_table.get(txn_id, vout_id))
+        self.assertIsNone(compact_table.get(self.entries[0][0], "7"))
+        self.assertIsNone(compact_table.get("ff" * 32, "0"))
+        self.assertIsNone(compact_table.get("not-a-txid", "0"))
+
+    def test_compact_inserts_are_merged(self):
+        compact_table = CompactTxOutTable(delta_limit=7)
+        compact_table.update(self.hash_table)
+        new_entries = build_entries(80)[50:]
+        compact_table.insert_many(new_entries)
+        compact_table.insert(new_entries[0][0], new_entries[0][1], "address-new", 1)
+
+        for txn_id, vout_id, address, amount in self.entries + new_entries[1:]:
+            self.assertEqual(compact_table.get(txn_id, vout_id), (address, amount))
+        compact_table.compact()
+        self.assertEqual(len(compact_table), 80)
+        self.assertEqual(compact_table.get(new_entries[0][0], new_entries[0][1]), ("address-new", 1))
+
+    def test_compact_len_counts_reinserted_keys_once(self):
+        compact_table = CompactTxOutTable()
+        compact_table.update(self.hash_table)
+        txn_id, vout_id, _, _ = self.entries[0]
+        compact_table.insert(txn_id, vout_id, "address-new", 1)
+        compact_table.insert(txn_id, vout_id, "address-newer", 2)
+        compact_table.insert("ff" * 32, "0", "address-new", 3)
+        self.assertEqual(len(compact_table), len(self.entries) + 1)
+
+        # columns merged after the insert are newer and win over it
+        compact_table.insert_columns(*build_tx_out_columns([(txn_id, vout_id, "address-columns", 4)], compact_table.addresses))
+        self.assertEqual(compact_table.get(txn_id, vout_id), ("address-columns", 4))
+        self.assertEqual(len(compact_table), len(self.entries) + 1)
+
+        compact_table.insert(txn_id, vout_id, "address-new", 1)
+        compact_table.compact()
+        self.assertEqual(len(compact_table), len(self.entries) + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+from unittest.mock import Mock
+
+from neurons.nodes.bitcoin.tx_out_table import HashTxOutTable
+from neurons.nodes.bitcoin.tx_out_updater import TxOutUpdater
+
+
+def make_block(block_height: int):
+    block = Mock()
+    block.iter_tx_outs.return_value = [(f"{block_height:064x}", "0", f"address-{block_height}", block_height)]
+    return block
+
+
+class TestTxOutUpdater(unittest.TestCase):
+
+    def setUp(self):
+        self.node = Mock()
+        self.node.tx_out_table = HashTxOutTable()
+        self.node.get_blocks.side_effect = lambda start_block_height, end_block_height, fetch: (
+            (block_height, fetch(block_height)) for block_height in range(start_block_height, end_block_height + 1))
+        self.node.get_columnar_block_by_height.side_effect = make_block
+        self.node.get_current_block_height.return_value = None
+
+    def create_updater(self, start_block_height: int, confirmations: int = 0):
+        return TxOutUpdater(self.node, start_block_height, interval=3600, confirmations=confirmations)
+
+    def get_fetched_heights(self):
+        return [call.args[0] for call in self.node.get_columnar_block_by_height.call_args_list]
+
+    def test_resumes_after_last_applied_block(self):
+        updater = self.create_updater(100)
+        self.assertEqual(updater.last_applied_height, 99)
+
+        self.node.get_current_block_height.return_value = 102
+        self.assertEqual(updater.catch_up(), 3)
+        self.assertEqual(updater.last_applied_height, 102)
+        self.assertEqual(self.node.tx_out_table.get(f"{101:064x}", "0"), ("address-101", 101))
+
+        self.assertEqual(updater.catch_up(), 0)
+        self.node.get_current_block_height.return_value = 104
+        self.assertEqual(updater.catch_up(), 2)
+        self.assertEqual(self.get_fetched_heights(), [100, 101, 102, 103, 104])
+
+    def test_stays_confirmations_behind_tip(self):
+        updater = self.create_updater(100, confirmations=3)
+        self.node.get_current_block_height.return_value = 102
+        self.assertEqual(updater.catch_up(), 0)
+        self.node.get_current_block_height.return_value = 105
+        self.assertEqual(updater.catch_up(), 3)
+        self.assertEqual(updater.last_applied_height, 102)
+        self.assertIsNone(self.node.tx_out_table.get(f"{103:064x}", "0"))
+
+    def test_retries_failed_block(self):
+        updater = self.create_updater(100)
+        failures = {101: 2} # prefetch and retry in the same round fail
+        def get_columnar_block_by_height(block_height):
+            if failures.get(block_height):
+                failures[block_height] -= 1
+                return None
+            return make_block(block_height)
+        self.node.get_columnar_block_by_height.side_effect = get_columnar_block_by_height
+        self.node.get_current_block_height.return_value = 102
+
+        with self.assertRaises(Exception):
+            updater.catch_up()
+        self.assertEqual(updater.last_applied_height, 100)
+        self.assertIsNone(self.node.tx_out_table.get(f"{101:064x}", "0"))
+
+        self.assertEqual(updater.catch_up(), 2)
+        self.assertEqual(updater.last_applied_height, 102)
+        self.assertEqual(self.node.tx_out_table.get(f"{101:064x}", "0"), ("address-101", 101))
+
+    def test_follows_tip_once_started(self):
+        updater = self.create_updater(100)
+        self.assertIsNone(updater.thread)
+        self.node.get_current_block_height.return_value = 101
+        updater.start()
+        try:
+            for _ in range(100):
+                if updater.last_applied_height == 101:
+                    break
+                updater.stop_event.wait(0.01)
+        finally:
+            updater.stop()
+        self.assertEqual(updater.last_applied_height, 101)
+        self.assertIsNone(updater.thread)
+
+
+if __name__ == '__main__':
+    unittest.main()
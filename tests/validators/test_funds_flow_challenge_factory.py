@@ -0,0 +1,61 @@
+import time
+import unittest
+from unittest.mock import Mock
+
+from neurons.validators.challenge_factory.funds_flow_challenge_factory import FundsFlowChallengeFactory
+
+
+class TestFundsFlowChallengeFactory(unittest.TestCase):
+
+    def setUp(self):
+        self.block_hashes = {}
+        self.node = Mock()
+        self.node.get_current_block_height.return_value = 306
+        self.node.get_block_hash.side_effect = lambda block_height: self.block_hashes.get(block_height, f"hash-{block_height}")
+        self.node.create_funds_flow_challenge_with_block.side_effect = lambda start, last: (f"challenge-{last}", f"txid-{last}", last, f"hash-{last}")
+
+        self.factory = FundsFlowChallengeFactory(self.node, tier_gap=100, pool_size=2, interval=3600)
+
+    def test_refills_in_background_once_started(self):
+        self.assertIsNone(self.factory.thread)
+        self.node.create_funds_flow_challenge_with_block.assert_not_called()
+
+        self.factory.start()
+        deadline = time.monotonic() + 5
+        while self.node.create_funds_flow_challenge_with_block.call_count < 8 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.factory.stop()
+        self.assertEqual({tier: len(entries) for tier, entries in self.factory.challenges.items()}, {0: 2, 1: 2, 2: 2, 3: 2})
+        self.assertIsNone(self.factory.thread)
+
+    def test_fills_every_tier_up_to_pool_size(self):
+        while self.factory.refill():
+            pass
+
+        self.assertEqual({tier: len(entries) for tier, entries in self.factory.challenges.items()}, {0: 2, 1: 2, 2: 2, 3: 2})
+        self.node.create_funds_flow_challenge_with_block.assert_any_call(300, 300)
+
+    def test_hands_out_challenges_within_range_once(self):
+        while self.factory.refill():
+            pass
+
+        self.assertEqual(self.factory.get_challenge(100, 199), ("challenge-199", "txid-199"))
+        self.assertEqual(self.factory.get_challenge(100, 199), ("challenge-199", "txid-199"))
+        self.assertIsNone(self.factory.get_challenge(100, 199))
+
+    def test_drops_challenges_from_reorged_blocks(self):
+        while self.factory.refill():
+            pass
+
+        self.block_hashes[299] = "reorged"
+        self.factory.drop_reorged_challenges()
+        self.assertEqual(len(self.factory.challenges[2]), 0)
+        self.assertEqual(len(self.factory.challenges[3]), 2)
+
+        self.block_hashes[300] = "reorged"
+        self.assertIsNone(self.factory.get_challenge(300, 300))
+        self.assertEqual(len(self.factory.challenges[3]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()